@@ -0,0 +1,589 @@
+"""
+Vizota AI Analyzer
+MobileViT 태깅, MANIQA 품질 평가, zero-shot 카테고리 분류 모델을 한 번만 로드하고
+여러 이미지를 배치 단위로 분석합니다.
+"""
+
+import os
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+import logging
+import time
+from typing import List, Optional, Dict, Any, Tuple
+
+import numpy as np
+import torch
+from transformers import (
+    AutoConfig,
+    AutoModelForSequenceClassification,
+    AutoTokenizer,
+    MobileViTFeatureExtractor,
+    MobileViTForImageClassification,
+    pipeline,
+)
+
+from config import Config
+from export_models import BACKENDS, load_runners
+from inference_process import five_point_crop
+from maniqa import MANIQA
+from metrics import stage_timer
+from preprocess import MobileViTPreprocessor
+from quality_cascade import QUALITY_CASCADE, TIER_CHEAP, TIER_MANIQA, estimate as estimate_cheap_quality
+from model_artifacts import empty_parameters, has_artifacts, load_module
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CANDIDATE_LABELS = ['Landscape', 'Animal', 'City', 'People', 'Food']
+
+MOBILEVIT_MODEL = os.getenv('MOBILEVIT_MODEL', 'apple/mobilevit-small')
+CATEGORIZER_MODEL = os.getenv('CATEGORIZER_MODEL', 'facebook/bart-large-mnli')
+MANIQA_CKPT_PATH = os.getenv(
+    'MANIQA_CKPT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ckpt_koniq10k.pt')
+)
+# 로컬 모델 캐시 (download_models.py로 미리 채움)
+MODEL_CACHE_DIR = os.getenv(
+    'MODEL_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_cache')
+)
+# True이면 Hugging Face Hub에 접근하지 않고 로컬 캐시만 사용
+MODELS_OFFLINE = os.getenv('MODELS_OFFLINE', 'true').lower() == 'true'
+# mmap으로 공유할 모델 아티팩트 디렉토리 (model_artifacts.py로 생성)
+MODEL_ARTIFACT_DIR = os.getenv(
+    'MODEL_ARTIFACT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_artifacts')
+)
+# TorchScript/ONNX 그래프 디렉토리 (export_models.py로 생성)
+MODEL_EXPORT_DIR = os.getenv(
+    'MODEL_EXPORT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_exports')
+)
+# MobileViT/MANIQA 실행 방식: eager | torchscript | onnx
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'eager').lower()
+# CPU intra-op thread 수 (0이면 라이브러리 기본값)
+INTRA_OP_THREADS = int(os.getenv('INTRA_OP_THREADS', '0'))
+# True이면 MANIQA의 ViT backbone을 timm pretrained 가중치로 초기화 (체크포인트에 ViT 가중치가 없을 때만 필요)
+MANIQA_VIT_PRETRAINED = os.getenv('MANIQA_VIT_PRETRAINED', 'false').lower() == 'true'
+
+# predict_one_image.main()과 동일한 MANIQA 설정
+MANIQA_CONFIG = Config({
+    # valid times
+    "num_crops": 20,
+    "crop_size": 224,
+    "seed": 20,
+
+    # model
+    "patch_size": 8,
+    "img_size": 224,
+    "embed_dim": 768,
+    "dim_mlp": 768,
+    "num_heads": [4, 4],
+    "window_size": 4,
+    "depths": [2, 2],
+    "num_outputs": 1,
+    "num_tab": 2,
+    "scale": 0.8,
+})
+
+# True이면 MobileViT 입력을 feature extractor 대신 배치 전처리(preprocess.py)로 만듦 (출력 동일)
+FAST_PREPROCESS = os.getenv('FAST_PREPROCESS', 'true').lower() == 'true'
+# True이면 MANIQA에 fused QKV projection과 고정된 attention bias + scaled_dot_product_attention 적용
+FUSED_ATTENTION = os.getenv('FUSED_ATTENTION', 'true').lower() == 'true'
+# CPU 추론 양자화 모드: 'int8'이면 Linear 레이어에 dynamic int8 quantization 적용 (parity.py로 정확도 확인 후 사용)
+QUANTIZE = os.getenv('QUANTIZE', '').lower() or None
+# 양자화를 적용할 모델 (Linear 비중이 큰 MANIQA, BART 분류기)
+QUANTIZE_MODELS = [name.strip() for name in os.getenv('QUANTIZE_MODELS', 'maniqa,categorizer').split(',') if name.strip()]
+
+# 한 번의 MANIQA forward에 넣는 최대 crop 수
+QUALITY_BATCH_SIZE = int(os.getenv('QUALITY_BATCH_SIZE', '40'))
+
+# 품질 평가 crop 방식
+#   fixed:      랜덤 crop num_crops(20)개 평균 (기존 방식)
+#   adaptive:   crop을 조금씩 추가하며 평균의 95% 신뢰구간 반폭이 QUALITY_CI_TOLERANCE 이하가 되면 중단
+#   five_point: inference_process.five_point_crop의 고정 위치 5개 (결정적)
+QUALITY_CROP_MODES = ('fixed', 'adaptive', 'five_point')
+QUALITY_CROP_MODE = os.getenv('QUALITY_CROP_MODE', 'fixed').lower()
+QUALITY_MIN_CROPS = int(os.getenv('QUALITY_MIN_CROPS', '4'))
+QUALITY_MAX_CROPS = int(os.getenv('QUALITY_MAX_CROPS', '20'))
+QUALITY_CROP_STEP = int(os.getenv('QUALITY_CROP_STEP', '4'))  # adaptive 모드에서 한 번에 추가하는 crop 수
+QUALITY_CI_TOLERANCE = float(os.getenv('QUALITY_CI_TOLERANCE', '0.01'))
+
+# 잘못된 값이면 adaptive 루프가 멈추지 않거나 신뢰구간을 계산할 수 없으므로 시작 시 거부
+if QUALITY_MIN_CROPS < 2:
+    raise ValueError(f"QUALITY_MIN_CROPS must be at least 2 (got {QUALITY_MIN_CROPS})")
+if QUALITY_MAX_CROPS < QUALITY_MIN_CROPS:
+    raise ValueError(
+        f"QUALITY_MAX_CROPS must be at least QUALITY_MIN_CROPS ({QUALITY_MAX_CROPS} < {QUALITY_MIN_CROPS})"
+    )
+if QUALITY_CROP_STEP < 1:
+    raise ValueError(f"QUALITY_CROP_STEP must be at least 1 (got {QUALITY_CROP_STEP})")
+if QUALITY_CI_TOLERANCE < 0:
+    raise ValueError(f"QUALITY_CI_TOLERANCE must not be negative (got {QUALITY_CI_TOLERANCE})")
+
+
+def get_device() -> Tuple[torch.device, int]:
+    """사용 가능한 디바이스와 transformers pipeline용 device id를 반환합니다."""
+    if torch.cuda.is_available():
+        return torch.device('cuda'), 0
+    elif torch.backends.mps.is_available():
+        return torch.device('mps'), 0
+    return torch.device('cpu'), -1
+
+
+def build_maniqa(pretrained: bool = False) -> MANIQA:
+    config = MANIQA_CONFIG
+    return MANIQA(embed_dim=config.embed_dim, num_outputs=config.num_outputs, dim_mlp=config.dim_mlp,
+        patch_size=config.patch_size, img_size=config.img_size, window_size=config.window_size,
+        depths=config.depths, num_heads=config.num_heads, num_tab=config.num_tab, scale=config.scale,
+        pretrained=pretrained)
+
+
+class Analyzer:
+    """세 모델을 묶어 배치 분석을 수행합니다. 이미지는 RGB uint8 (H, W, 3) numpy 배열로 받습니다."""
+
+    def __init__(
+        self,
+        device: Optional[torch.device] = None,
+        quality_batch_size: int = QUALITY_BATCH_SIZE,
+        quality_crop_mode: str = QUALITY_CROP_MODE,
+        quality_cascade: bool = QUALITY_CASCADE,
+        use_artifacts: Optional[bool] = None,
+        quantize: Optional[str] = QUANTIZE,
+        backend: str = INFERENCE_BACKEND,
+        fused_attention: bool = FUSED_ATTENTION,
+    ):
+        if device is None:
+            self.device, self.device_id = get_device()
+        else:
+            self.device = device
+            self.device_id = 0 if device.type in ('cuda', 'mps') else -1
+        self.quality_batch_size = quality_batch_size
+        if quality_crop_mode not in QUALITY_CROP_MODES:
+            raise ValueError(f"Unsupported quality crop mode: {quality_crop_mode}")
+        self.quality_crop_mode = quality_crop_mode
+        self.quality_cascade = quality_cascade
+        # mmap 공유는 CPU 추론에서만 의미가 있음
+        if use_artifacts is None:
+            use_artifacts = self.device.type == 'cpu' and has_artifacts(MODEL_ARTIFACT_DIR)
+        self.use_artifacts = use_artifacts
+        if quantize not in (None, 'int8'):
+            raise ValueError(f"Unsupported quantize mode: {quantize}")
+        # dynamic quantization은 CPU 커널만 지원
+        if quantize and self.device.type != 'cpu':
+            logger.warning(f"QUANTIZE={quantize} is ignored on {self.device}")
+            quantize = None
+        self.quantize = quantize
+        if backend not in BACKENDS:
+            raise ValueError(f"Unsupported inference backend: {backend}")
+        if backend != 'eager' and quantize:
+            raise ValueError(f"QUANTIZE={quantize} only applies to the eager backend")
+        if backend == 'onnx' and self.device.type != 'cpu':
+            raise ValueError("The onnx backend only runs on CPU")
+        self.backend = backend
+        self.fused_attention = fused_attention
+
+        self.feature_extractor = None
+        self.preprocessor: Optional[MobileViTPreprocessor] = None
+        # eager 모듈 (torchscript/onnx 백엔드에서는 로드하지 않고 내보낸 runner만 사용)
+        self.model = None
+        self.classifier = None
+        self.maniqa = None
+        # MobileViT class index → 라벨 (백엔드와 무관하게 config에서 읽음)
+        self.id2label: Optional[Dict[int, str]] = None
+        # MobileViT/MANIQA 실행 함수 (eager이면 모듈을 직접 호출)
+        self._tagger = None
+        self._quality_model = None
+        self._category_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[str, float]] = {}
+
+        # 로드/워밍업 소요 시간 (초)
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.classifier is not None and self._tagger is not None and self._quality_model is not None
+
+    def load(self) -> "Analyzer":
+        """
+        세 모델을 로드합니다.
+        CPU에서 MODEL_ARTIFACT_DIR에 아티팩트가 있으면 mmap으로 로드해 프로세스 간 가중치를 공유하고,
+        없으면 로컬 모델 캐시에서 로드합니다. MODELS_OFFLINE이면 네트워크 조회를 하지 않습니다.
+        torchscript/onnx 백엔드는 MobileViT/MANIQA eager 모듈을 만들지 않고 내보낸 모델만 메모리에 올립니다.
+        """
+        started = time.monotonic()
+        if INTRA_OP_THREADS:
+            torch.set_num_threads(INTRA_OP_THREADS)
+        if self.use_artifacts:
+            logger.info(f"Loading AI models on {self.device} from mmap artifacts ({MODEL_ARTIFACT_DIR})...")
+            categorizer_model, tokenizer = self._load_artifacts()
+        else:
+            logger.info(f"Loading AI models on {self.device} (cache={MODEL_CACHE_DIR}, offline={MODELS_OFFLINE})...")
+            categorizer_model, tokenizer = self._load_pretrained()
+
+        if FAST_PREPROCESS:
+            self.preprocessor = MobileViTPreprocessor(self.feature_extractor)
+        categorizer_model.eval()
+        if self.backend == 'eager':
+            self.model.eval()
+            self.model.to(self.device)
+            self.maniqa.eval()
+            # 양자화 전에 결합해야 fused QKV Linear도 양자화 대상이 됨
+            if self.fused_attention:
+                self.maniqa.prepare_for_inference()
+
+        if self.quantize:
+            categorizer_model = self._quantize(categorizer_model)
+
+        # Zero-shot classification pipeline 구성
+        self.classifier = pipeline(
+            "zero-shot-classification",
+            model=categorizer_model,
+            tokenizer=tokenizer,
+            device=self.device_id
+        )
+
+        if self.backend == 'eager':
+            self.maniqa.to(self.device)
+            self._tagger = self.forward_mobilevit
+            self._quality_model = self.maniqa
+        else:
+            runners = load_runners(MODEL_EXPORT_DIR, self.backend, self.device, INTRA_OP_THREADS)
+            self._tagger = runners['mobilevit']
+            self._quality_model = runners['maniqa']
+
+        self.load_seconds = time.monotonic() - started
+        logger.info(f"All models loaded successfully on {self.device} (backend={self.backend}, model_load_seconds={self.load_seconds:.2f})")
+        return self
+
+    def _load_pretrained(self):
+        hub_kwargs = {'cache_dir': MODEL_CACHE_DIR, 'local_files_only': MODELS_OFFLINE}
+
+        eager = self.backend == 'eager'
+
+        # MobileViT 모델 로드
+        self.feature_extractor = MobileViTFeatureExtractor.from_pretrained(MOBILEVIT_MODEL, **hub_kwargs)
+        if eager:
+            self.model = MobileViTForImageClassification.from_pretrained(MOBILEVIT_MODEL, **hub_kwargs)
+            self.id2label = self.model.config.id2label
+        else:
+            self.id2label = AutoConfig.from_pretrained(MOBILEVIT_MODEL, **hub_kwargs).id2label
+
+        # Zero-shot classification 모델 로드
+        categorizer_model = AutoModelForSequenceClassification.from_pretrained(CATEGORIZER_MODEL, **hub_kwargs)
+        tokenizer = AutoTokenizer.from_pretrained(CATEGORIZER_MODEL, **hub_kwargs)
+        if not eager:
+            return categorizer_model, tokenizer
+
+        # MANIQA 모델 로드 (ViT backbone 가중치도 체크포인트에서 로드)
+        self.maniqa = build_maniqa(pretrained=MANIQA_VIT_PRETRAINED)
+        missing, _ = self.maniqa.load_state_dict(torch.load(MANIQA_CKPT_PATH, map_location='cpu'), strict=False)
+        missing_vit = [key for key in missing if key.startswith('vit.')]
+        if missing_vit and not MANIQA_VIT_PRETRAINED:
+            raise RuntimeError(
+                f"MANIQA checkpoint has no ViT weights ({len(missing_vit)} keys missing). "
+                f"Set MANIQA_VIT_PRETRAINED=true to initialize the backbone from timm."
+            )
+        return categorizer_model, tokenizer
+
+    def _load_artifacts(self):
+        # parameter는 meta device에 만들고, mmap된 가중치를 복사 없이 연결
+        mobilevit_dir = os.path.join(MODEL_ARTIFACT_DIR, 'mobilevit')
+        categorizer_dir = os.path.join(MODEL_ARTIFACT_DIR, 'categorizer')
+
+        eager = self.backend == 'eager'
+        mobilevit_config = AutoConfig.from_pretrained(mobilevit_dir)
+        self.id2label = mobilevit_config.id2label
+
+        self.feature_extractor = MobileViTFeatureExtractor.from_pretrained(mobilevit_dir)
+        with empty_parameters():
+            categorizer_model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(categorizer_dir))
+            if eager:
+                self.model = MobileViTForImageClassification(mobilevit_config)
+                self.maniqa = build_maniqa(pretrained=False)
+        load_module(categorizer_model, os.path.join(MODEL_ARTIFACT_DIR, 'categorizer.pt'))
+        if eager:
+            load_module(self.model, os.path.join(MODEL_ARTIFACT_DIR, 'mobilevit.pt'))
+            load_module(self.maniqa, os.path.join(MODEL_ARTIFACT_DIR, 'maniqa.pt'))
+
+        tokenizer = AutoTokenizer.from_pretrained(categorizer_dir)
+        return categorizer_model, tokenizer
+
+    def _quantize(self, categorizer_model):
+        """
+        QUANTIZE_MODELS에 지정된 모델의 nn.Linear 가중치를 int8로 양자화하고, 양자화된 분류 모델을 반환합니다.
+        양자화된 가중치는 프로세스마다 새로 만들어지므로 mmap 아티팩트의 프로세스 간 공유 효과는 사라집니다.
+        """
+        from torch.ao.quantization import quantize_dynamic
+
+        def apply(module):
+            return quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+        if 'mobilevit' in QUANTIZE_MODELS:
+            self.model = apply(self.model)
+        if 'maniqa' in QUANTIZE_MODELS:
+            self.maniqa = apply(self.maniqa)
+        if 'categorizer' in QUANTIZE_MODELS:
+            categorizer_model = apply(categorizer_model)
+        logger.info(f"Applied dynamic {self.quantize} quantization to {', '.join(QUANTIZE_MODELS)}")
+        return categorizer_model
+
+    def warmup(self, size: int = 512) -> "Analyzer":
+        """합성 이미지로 세 모델을 한 번씩 실행해 첫 요청이 초기화 비용을 부담하지 않도록 합니다."""
+        started = time.monotonic()
+        image = np.random.RandomState(0).randint(0, 256, (size, size, 3), dtype=np.uint8)
+        self.analyze([image])
+        self.warmup_seconds = time.monotonic() - started
+        logger.info(f"Model warm-up finished (model_warmup_seconds={self.warmup_seconds:.2f})")
+        return self
+
+    def forward_mobilevit(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        MobileViTForImageClassification.forward와 같은 연산으로 logits와 pooled 특징 벡터를 함께 반환합니다.
+        forward hook과 공유 상태 없이 배치 항목별 특징을 돌려주므로 여러 thread에서 동시에 호출해도 안전합니다.
+        """
+        outputs = self.model.mobilevit(pixel_values, return_dict=True)
+        features = self.model.dropout(outputs.pooler_output)
+        logits = self.model.classifier(features)
+        return logits, features
+
+    def pixel_values(self, images: List[np.ndarray], prepared: Optional[List[np.ndarray]] = None) -> torch.Tensor:
+        """
+        MobileViT 입력 텐서를 만듭니다.
+        prepared는 preprocessor.prepare()로 미리 resize/crop한 배열이며 (파이프라인 I/O 단계에서 계산), 없으면 여기서 계산합니다.
+        """
+        if self.preprocessor is None:
+            return self.feature_extractor(images=images, return_tensors="pt")['pixel_values']
+        if prepared is None:
+            prepared = [self.preprocessor.prepare(image) for image in images]
+        return self.preprocessor.collate(prepared)
+
+    @torch.no_grad()
+    def tag(self, images: List[np.ndarray], prepared: Optional[List[np.ndarray]] = None) -> List[Dict[str, Any]]:
+        """MobileViT로 top-1 태그, 확률(%), 특징 벡터를 배치 단위로 계산합니다."""
+        with stage_timer('preprocess'):
+            pixel_values = self.pixel_values(images, prepared).to(self.device)
+        with stage_timer('mobilevit'):
+            logits, features = self._tagger(pixel_values)
+
+        top_probability, top_class_index = torch.topk(logits.softmax(dim=1) * 100, k=1)
+        top_probability = top_probability[:, 0].tolist()
+        top_class_index = top_class_index[:, 0].tolist()
+        feature_vectors = features.cpu().numpy().tolist()
+
+        results = []
+        for probability, class_index, feature_vector in zip(top_probability, top_class_index, feature_vectors):
+            # comma로 구분된 경우 첫 번째 태그만 추출
+            class_name = self.id2label[class_index].split(',')[0].strip()
+            results.append({
+                'tag_name': class_name,
+                'probability': probability,
+                'feature_vector': feature_vector,
+            })
+        return results
+
+    def crop_positions(self, image: np.ndarray, num_crops: int) -> List[Tuple[int, int]]:
+        """predict_one_image.Image와 같은 순서로 랜덤 crop 위치 (top, left)를 뽑습니다."""
+        crop_size = MANIQA_CONFIG.crop_size
+        h, w = image.shape[:2]
+        rng = np.random.RandomState(MANIQA_CONFIG.seed)
+        positions = []
+        for _ in range(num_crops):
+            top = rng.randint(0, h - crop_size)
+            left = rng.randint(0, w - crop_size)
+            positions.append((top, left))
+        return positions
+
+    @staticmethod
+    def cut_crops(image: np.ndarray, positions: List[Tuple[int, int]]) -> np.ndarray:
+        """원본 전체를 float32로 변환하지 않고 uint8 crop만 잘라 반환합니다. (num_crops, crop, crop, 3)"""
+        crop_size = MANIQA_CONFIG.crop_size
+        return np.stack([image[top: top + crop_size, left: left + crop_size] for top, left in positions])
+
+    def sample_crops(self, image: np.ndarray, num_crops: int) -> np.ndarray:
+        return self.cut_crops(image, self.crop_positions(image, num_crops))
+
+    @staticmethod
+    def five_point_crops(image: np.ndarray) -> np.ndarray:
+        """네 모서리와 중앙의 고정 위치 crop 5개를 반환합니다. (5, crop, crop, 3)"""
+        chw = image.transpose(2, 0, 1)[None]  # (1, 3, H, W) view
+        return np.stack([five_point_crop(idx, chw, MANIQA_CONFIG)[0].transpose(1, 2, 0) for idx in range(5)])
+
+    def _normalize_crops(self, crops: np.ndarray) -> torch.Tensor:
+        # Normalize(0.5, 0.5) + ToTensor 와 동일: (x / 255 - 0.5) / 0.5, NCHW
+        patches = torch.from_numpy(crops).permute(0, 3, 1, 2).float() / 255
+        return ((patches - 0.5) / 0.5).to(self.device)
+
+    @torch.no_grad()
+    def score_crops(self, crops: np.ndarray) -> torch.Tensor:
+        """uint8 crop 배열의 crop별 MANIQA 점수를 계산합니다."""
+        scores = []
+        for start in range(0, len(crops), self.quality_batch_size):
+            patches = self._normalize_crops(crops[start:start + self.quality_batch_size])
+            scores.append(self._quality_model(patches).cpu())
+        return torch.cat(scores)
+
+    def score_quality(self, images: List[np.ndarray]) -> List[Tuple[Optional[float], int, Optional[str]]]:
+        """
+        이미지별 품질 점수, 사용한 MANIQA crop 수, 점수를 만든 단계(tier0/maniqa)를 계산합니다.
+        quality_cascade이면 tier-0 추정이 애매한 이미지만 MANIQA로 평가합니다. 실패한 이미지는 (None, 0, None)입니다.
+        """
+        results: List[Tuple[Optional[float], int, Optional[str]]] = [(None, 0, None)] * len(images)
+        pending = list(range(len(images)))
+        if self.quality_cascade:
+            pending = []
+            with stage_timer('tier0'):
+                for i, image in enumerate(images):
+                    try:
+                        cheap = estimate_cheap_quality(image)
+                    except Exception as e:
+                        logger.warning(f"Tier-0 quality estimation failed: {e}")
+                        pending.append(i)
+                        continue
+                    if cheap['ambiguous']:
+                        pending.append(i)
+                    else:
+                        results[i] = (cheap['score'], 0, TIER_CHEAP)
+
+        if pending:
+            with stage_timer('maniqa'):
+                scores = self.score_maniqa([images[i] for i in pending])
+            for i, (score, crops) in zip(pending, scores):
+                results[i] = (score, crops, TIER_MANIQA if score is not None else None)
+        return results
+
+    def score_maniqa(self, images: List[np.ndarray]) -> List[Tuple[Optional[float], int]]:
+        """
+        이미지별 crop 평균 MANIQA 점수와 사용한 crop 수를 계산합니다. 실패한 이미지는 (None, 0)입니다.
+        crop 방식은 quality_crop_mode를 따릅니다.
+        """
+        if self.quality_crop_mode == 'adaptive':
+            return self._score_quality_adaptive(images)
+
+        if self.quality_crop_mode == 'five_point':
+            make_crops = self.five_point_crops
+        else:
+            make_crops = lambda image: self.sample_crops(image, MANIQA_CONFIG.num_crops)
+
+        all_crops = []
+        owners = []
+        results: List[Tuple[Optional[float], int]] = [(None, 0)] * len(images)
+        for i, image in enumerate(images):
+            try:
+                all_crops.append(make_crops(image))
+                owners.append(i)
+            except Exception as e:
+                logger.warning(f"Quality score calculation failed: {e}")
+
+        if not all_crops:
+            return results
+
+        # 여러 이미지의 crop을 한 번에 배치 처리
+        crop_scores = self.score_crops(np.concatenate(all_crops))
+        offset = 0
+        for crops, i in zip(all_crops, owners):
+            results[i] = (crop_scores[offset:offset + len(crops)].mean().item(), len(crops))
+            offset += len(crops)
+        return results
+
+    def _score_quality_adaptive(self, images: List[np.ndarray]) -> List[Tuple[Optional[float], int]]:
+        """
+        crop을 QUALITY_CROP_STEP개씩 추가하며 점수를 매기고, 이미지별로 평균이 수렴하면 중단합니다.
+        crop 위치는 fixed 모드와 같은 순서이므로 QUALITY_MAX_CROPS까지 가면 fixed 모드와 같은 결과가 됩니다.
+        """
+        positions: Dict[int, List[Tuple[int, int]]] = {}
+        for i, image in enumerate(images):
+            try:
+                positions[i] = self.crop_positions(image, QUALITY_MAX_CROPS)
+            except Exception as e:
+                logger.warning(f"Quality score calculation failed: {e}")
+
+        sampled: Dict[int, List[float]] = {i: [] for i in positions}
+        active = list(positions)
+        while active:
+            # 아직 수렴하지 않은 이미지들의 다음 crop을 한 배치로 모아 점수 계산
+            batch = []
+            for i in active:
+                done = len(sampled[i])
+                step = QUALITY_MIN_CROPS if done == 0 else QUALITY_CROP_STEP
+                batch.append((i, self.cut_crops(images[i], positions[i][done:done + step])))
+
+            crop_scores = self.score_crops(np.concatenate([crops for _, crops in batch])).tolist()
+            offset = 0
+            for i, crops in batch:
+                sampled[i].extend(crop_scores[offset:offset + len(crops)])
+                offset += len(crops)
+            active = [i for i in active if not self._quality_converged(sampled[i])]
+
+        results: List[Tuple[Optional[float], int]] = [(None, 0)] * len(images)
+        for i, values in sampled.items():
+            results[i] = (float(np.mean(values)), len(values))
+        return results
+
+    @staticmethod
+    def _quality_converged(values: List[float]) -> bool:
+        n = len(values)
+        if n >= QUALITY_MAX_CROPS:
+            return True
+        if n < QUALITY_MIN_CROPS:
+            return False
+        # 평균의 95% 신뢰구간 반폭
+        half_width = 1.96 * np.std(values, ddof=1) / np.sqrt(n)
+        return half_width <= QUALITY_CI_TOLERANCE
+
+    def categorize(self, tag_names: List[str], candidate_labels: Optional[List[str]]) -> List[Tuple[Optional[str], Optional[float]]]:
+        """zero-shot 분류로 태그별 추천 상위 카테고리와 확률(%)을 계산합니다. 같은 태그는 한 번만 계산합니다."""
+        if not candidate_labels:
+            return [(None, None)] * len(tag_names)
+
+        labels_key = tuple(candidate_labels)
+        missing = sorted({name for name in tag_names if (name, labels_key) not in self._category_cache})
+        if missing:
+            try:
+                outputs = self.classifier(missing, list(candidate_labels), multi_label=True)
+                if isinstance(outputs, dict):
+                    outputs = [outputs]
+                if len(self._category_cache) > 4096:
+                    self._category_cache.clear()
+                for name, hierar in zip(missing, outputs):
+                    self._category_cache[(name, labels_key)] = (hierar['labels'][0], hierar['scores'][0] * 100)
+            except Exception as e:
+                logger.warning(f"Hierarchical classification failed: {e}")
+
+        return [self._category_cache.get((name, labels_key), (None, None)) for name in tag_names]
+
+    def analyze(
+        self,
+        images: List[np.ndarray],
+        candidate_labels: Optional[List[str]] = None,
+        with_quality: bool = True,
+        prepared: Optional[List[np.ndarray]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        이미지 배치를 분석하여 백엔드 ImageAnalysisResult 스키마 형식의 결과 목록을 반환합니다.
+
+        Args:
+            images: RGB uint8 (H, W, 3) numpy 배열 목록
+            candidate_labels: 계층적 분류를 위한 후보 레이블 목록 (None이면 기본 레이블)
+            with_quality: MANIQA 품질 점수 계산 여부
+            prepared: (선택) 이미지별 preprocessor.prepare() 결과
+        """
+        if candidate_labels is None:
+            candidate_labels = DEFAULT_CANDIDATE_LABELS
+
+        tags = self.tag(images, prepared)
+        qualities = self.score_quality(images) if with_quality else [(None, 0, None)] * len(images)
+        with stage_timer('categorizer'):
+            categories = self.categorize([t['tag_name'] for t in tags], candidate_labels)
+
+        results = []
+        for tag, (quality_score, quality_crops, quality_tier), (category, category_probability) in zip(tags, qualities, categories):
+            results.append({
+                'tag_name': tag['tag_name'],
+                'probability': round(tag['probability'], 2),  # 태그 예측 확률 (%)
+                'category': category if category else 'Unknown',
+                'category_probability': round(category_probability, 2) if category_probability else None,
+                'quality_score': round(quality_score, 4) if quality_score else None,
+                'quality_crops': quality_crops,  # 품질 평가에 사용한 crop 수
+                'quality_tier': quality_tier,  # 품질 점수를 만든 단계 (tier0 | maniqa)
+                'feature_vector': tag['feature_vector'],
+            })
+        return results
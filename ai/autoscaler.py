@@ -0,0 +1,436 @@
+"""
+Vizota AI Autoscaler
+분석 큐 길이, 가장 오래된 작업의 대기 시간, 측정된 이미지당 처리 시간을 보고
+worker 프로세스 수와 파이프라인 배치 크기를 설정 범위 안에서 조절하는 컨트롤러
+
+    필요 worker 수 = ceil(큐 길이 x 이미지당 처리 시간 / 목표 소진 시간)
+    가장 오래된 작업이 AUTOSCALE_MAX_TASK_AGE_SECONDS를 넘으면 최소 1개 추가
+
+hysteresis:
+    - 확장은 AUTOSCALE_UP_POLLS번 연속으로 필요할 때, 축소는 AUTOSCALE_DOWN_POLLS번 연속으로 여유가 있을 때만 실행
+    - 축소는 한 번에 1개씩, 마지막 변경 후 AUTOSCALE_COOLDOWN_SECONDS 동안은 축소하지 않음
+    - 배치 크기는 worker당 대기 작업이 많으면 키우고(처리량), 큐가 비면 줄임(지연 시간)
+
+입력(QueueProbe, ServiceTimeProbe)과 실행(WorkerActuator, BatchActuator)을 분리해 두어
+로컬 Redis 대신 MemoryQueueProbe / DryRunActuator로 결정 로직만 확인할 수 있습니다.
+결정은 AUTOSCALER_METRICS_PORT의 /metrics로 노출합니다.
+
+사용 예:
+    python autoscaler.py                         # 로컬 Redis 큐를 보고 celery worker 프로세스를 직접 실행/종료
+    python autoscaler.py --dry-run --once        # 현재 상태에서의 결정만 출력
+"""
+
+import argparse
+import base64
+import json
+import logging
+import math
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.request import urlopen
+
+from prometheus_client import Counter, Gauge
+from prometheus_client.parser import text_string_to_metric_families
+
+from metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+REDIS_PORT = os.getenv('REDIS_PORT', '6379')
+REDIS_DB = os.getenv('REDIS_DB', '0')
+REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
+
+# 감시할 Celery 큐 (백엔드 send_task 기본 큐)
+AUTOSCALE_QUEUE = os.getenv('AUTOSCALE_QUEUE', 'celery')
+AUTOSCALE_POLL_SECONDS = float(os.getenv('AUTOSCALE_POLL_SECONDS', '5'))
+AUTOSCALE_MIN_WORKERS = int(os.getenv('AUTOSCALE_MIN_WORKERS', '1'))
+AUTOSCALE_MAX_WORKERS = int(os.getenv('AUTOSCALE_MAX_WORKERS', '4'))
+# 큐에 쌓인 작업을 이 시간 안에 처리할 수 있도록 worker 수를 정함
+AUTOSCALE_TARGET_DRAIN_SECONDS = float(os.getenv('AUTOSCALE_TARGET_DRAIN_SECONDS', '60'))
+AUTOSCALE_MAX_TASK_AGE_SECONDS = float(os.getenv('AUTOSCALE_MAX_TASK_AGE_SECONDS', '120'))
+AUTOSCALE_UP_POLLS = int(os.getenv('AUTOSCALE_UP_POLLS', '2'))
+AUTOSCALE_DOWN_POLLS = int(os.getenv('AUTOSCALE_DOWN_POLLS', '12'))
+AUTOSCALE_COOLDOWN_SECONDS = float(os.getenv('AUTOSCALE_COOLDOWN_SECONDS', '60'))
+AUTOSCALE_MIN_BATCH = int(os.getenv('AUTOSCALE_MIN_BATCH', '1'))
+AUTOSCALE_MAX_BATCH = int(os.getenv('AUTOSCALE_MAX_BATCH', '16'))
+# 처리 시간을 아직 측정하지 못했을 때 사용하는 이미지당 처리 시간 (초)
+AUTOSCALE_DEFAULT_SERVICE_SECONDS = float(os.getenv('AUTOSCALE_DEFAULT_SERVICE_SECONDS', '1.0'))
+# actuator가 띄운 worker i는 METRICS_PORT = AUTOSCALE_WORKER_METRICS_PORT + i 로 metrics를 노출
+AUTOSCALE_WORKER_METRICS_PORT = int(os.getenv('AUTOSCALE_WORKER_METRICS_PORT', '9100'))
+# 처리 시간을 읽을 worker metrics 주소 (쉼표로 구분, 없으면 위 포트 범위의 localhost)
+AUTOSCALE_METRICS_URLS = [u for u in os.getenv('AUTOSCALE_METRICS_URLS', '').split(',') if u] or [
+    f'http://localhost:{AUTOSCALE_WORKER_METRICS_PORT + i}/metrics' for i in range(AUTOSCALE_MAX_WORKERS)
+]
+AUTOSCALER_METRICS_PORT = int(os.getenv('AUTOSCALER_METRICS_PORT', '9101'))
+# 프로세스 actuator가 실행할 worker 명령 ({index}는 worker 번호)
+AUTOSCALE_WORKER_COMMAND = os.getenv(
+    'AUTOSCALE_WORKER_COMMAND',
+    'celery -A server_redis worker --loglevel=info --pool=threads --concurrency=4 -n autoscaled-{index}@%h'
+)
+
+QUEUE_LENGTH = Gauge('vizota_autoscaler_queue_length', 'Tasks waiting in the analysis queue')
+OLDEST_TASK_AGE = Gauge('vizota_autoscaler_oldest_task_age_seconds', 'Age of the oldest queued task')
+SERVICE_SECONDS = Gauge('vizota_autoscaler_service_seconds', 'Measured inference time per image')
+WORKERS = Gauge('vizota_autoscaler_workers', 'Current worker processes')
+DESIRED_WORKERS = Gauge('vizota_autoscaler_desired_workers', 'Workers required by the current load (before hysteresis)')
+BATCH = Gauge('vizota_autoscaler_batch_size', 'Pipeline max batch size set by the autoscaler')
+DECISIONS = Counter('vizota_autoscaler_decisions_total', 'Scaling actions taken', ['action'])
+
+
+@dataclass
+class Observation:
+    queue_length: int
+    oldest_age: Optional[float]
+    service_seconds: Optional[float]
+
+
+@dataclass
+class Decision:
+    workers: int
+    batch_size: int
+    desired_workers: int
+    action: str  # scale_up | scale_down | hold
+
+
+# 입력
+class QueueProbe:
+    def queue_length(self) -> int:
+        raise NotImplementedError
+
+    def oldest_age(self) -> Optional[float]:
+        """가장 오래된 작업의 대기 시간 (초). 알 수 없으면 None"""
+        raise NotImplementedError
+
+
+class RedisQueueProbe(QueueProbe):
+    """Celery Redis broker 큐를 조회합니다. (kombu는 LPUSH로 넣고 BRPOP으로 꺼내므로 가장 오래된 작업은 끝에 있음)"""
+
+    def __init__(self, redis_url: str = REDIS_URL, queue: str = AUTOSCALE_QUEUE):
+        import redis
+        self.client = redis.Redis.from_url(redis_url)
+        self.queue = queue
+
+    def queue_length(self) -> int:
+        return int(self.client.llen(self.queue))
+
+    def oldest_age(self) -> Optional[float]:
+        raw = self.client.lindex(self.queue, -1)
+        if raw is None:
+            return None
+        try:
+            message = json.loads(raw)
+            body = message['body']
+            if message.get('properties', {}).get('body_encoding') == 'base64':
+                body = base64.b64decode(body)
+            _, kwargs, _ = json.loads(body)
+            # 백엔드가 send_task에 기록한 전송 시각 (metrics.py의 queue_wait와 같은 기준)
+            enqueued_at = kwargs.get('enqueued_at')
+        except Exception:
+            return None
+        return max(0.0, time.time() - enqueued_at) if enqueued_at else None
+
+
+class MemoryQueueProbe(QueueProbe):
+    """테스트/시뮬레이션용: 큐에 넣은 시각 목록을 메모리에 보관합니다."""
+
+    def __init__(self):
+        self.enqueued: List[float] = []
+
+    def push(self, count: int = 1, enqueued_at: Optional[float] = None) -> None:
+        self.enqueued.extend([enqueued_at or time.time()] * count)
+
+    def pop(self, count: int = 1) -> None:
+        del self.enqueued[:count]
+
+    def queue_length(self) -> int:
+        return len(self.enqueued)
+
+    def oldest_age(self) -> Optional[float]:
+        return time.time() - self.enqueued[0] if self.enqueued else None
+
+
+class ServiceTimeProbe:
+    """
+    worker metrics의 inference 단계 누적 시간과 처리 이미지 수 증가량으로 이미지당 처리 시간을 계산합니다.
+    (vizota_ai_stage_seconds{stage="inference"} / vizota_ai_images_total{status="ok"})
+    """
+
+    def __init__(self, urls: List[str] = AUTOSCALE_METRICS_URLS, timeout: float = 2.0):
+        self.urls = urls
+        self.timeout = timeout
+        self._previous: Dict[str, tuple] = {}
+        self._last: Optional[float] = None
+
+    def _scrape(self, url: str) -> Optional[tuple]:
+        try:
+            with urlopen(url, timeout=self.timeout) as response:
+                text = response.read().decode()
+        except Exception as e:
+            logger.debug(f"Failed to scrape {url}: {e}")
+            return None
+        seconds = images = 0.0
+        for family in text_string_to_metric_families(text):
+            for sample in family.samples:
+                if sample.name == 'vizota_ai_stage_seconds_sum' and sample.labels.get('stage') == 'inference':
+                    seconds = sample.value
+                elif sample.name == 'vizota_ai_images_total' and sample.labels.get('status') == 'ok':
+                    images = sample.value
+        return seconds, images
+
+    def service_seconds(self) -> Optional[float]:
+        busy = done = 0.0
+        for url in self.urls:
+            current = self._scrape(url)
+            if current is None:
+                continue
+            previous = self._previous.get(url)
+            self._previous[url] = current
+            # worker가 재시작되면 counter가 줄어드므로 그 구간은 건너뜀
+            if previous and current[1] >= previous[1]:
+                busy += current[0] - previous[0]
+                done += current[1] - previous[1]
+        if done > 0:
+            self._last = busy / done
+        return self._last
+
+
+# 실행
+class WorkerActuator:
+    def current(self) -> int:
+        raise NotImplementedError
+
+    def scale_to(self, workers: int) -> None:
+        raise NotImplementedError
+
+
+class BatchActuator:
+    def set_batch_size(self, batch_size: int) -> None:
+        raise NotImplementedError
+
+
+class DryRunActuator(WorkerActuator, BatchActuator):
+    """실제 프로세스를 건드리지 않고 결정만 기록합니다."""
+
+    def __init__(self, workers: int = AUTOSCALE_MIN_WORKERS, batch_size: int = AUTOSCALE_MIN_BATCH):
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def current(self) -> int:
+        return self.workers
+
+    def scale_to(self, workers: int) -> None:
+        logger.info(f"[dry-run] scale workers {self.workers} -> {workers}")
+        self.workers = workers
+
+    def set_batch_size(self, batch_size: int) -> None:
+        logger.info(f"[dry-run] set pipeline batch size {self.batch_size} -> {batch_size}")
+        self.batch_size = batch_size
+
+
+class SubprocessWorkerActuator(WorkerActuator):
+    """
+    같은 호스트에서 celery worker 프로세스를 실행/종료합니다.
+    종료는 가장 최근에 띄운 worker부터 SIGTERM(warm shutdown)으로 진행해 처리 중인 작업을 마치게 합니다.
+    """
+
+    def __init__(self, command: str = AUTOSCALE_WORKER_COMMAND, cwd: Optional[str] = None):
+        self.command = command
+        self.cwd = cwd or os.path.dirname(os.path.abspath(__file__))
+        self.processes: List[subprocess.Popen] = []
+
+    def _reap(self) -> None:
+        self.processes = [p for p in self.processes if p.poll() is None]
+
+    def current(self) -> int:
+        self._reap()
+        return len(self.processes)
+
+    def scale_to(self, workers: int) -> None:
+        self._reap()
+        while len(self.processes) < workers:
+            index = len(self.processes)
+            env = {**os.environ, 'METRICS_PORT': str(AUTOSCALE_WORKER_METRICS_PORT + index)}
+            self.processes.append(subprocess.Popen(shlex.split(self.command.format(index=index)), cwd=self.cwd, env=env))
+            logger.info(f"Started worker {index} (pid={self.processes[-1].pid})")
+        while len(self.processes) > workers:
+            process = self.processes.pop()
+            process.send_signal(signal.SIGTERM)
+            logger.info(f"Stopping worker pid={process.pid}")
+
+    def stop_all(self) -> None:
+        self.scale_to(0)
+
+
+class CeleryBatchActuator(BatchActuator):
+    """실행 중인 모든 worker에 set_pipeline_batch 원격 명령(server_redis.py)을 보냅니다."""
+
+    def __init__(self, redis_url: str = REDIS_URL):
+        from celery import Celery
+        self.app = Celery('vizota_ai_autoscaler', broker=redis_url)
+
+    def set_batch_size(self, batch_size: int) -> None:
+        self.app.control.broadcast('set_pipeline_batch', arguments={'max_batch_size': batch_size})
+
+
+# 결정
+@dataclass
+class ScalingPolicy:
+    min_workers: int = AUTOSCALE_MIN_WORKERS
+    max_workers: int = AUTOSCALE_MAX_WORKERS
+    target_drain_seconds: float = AUTOSCALE_TARGET_DRAIN_SECONDS
+    max_task_age_seconds: float = AUTOSCALE_MAX_TASK_AGE_SECONDS
+    up_polls: int = AUTOSCALE_UP_POLLS
+    down_polls: int = AUTOSCALE_DOWN_POLLS
+    cooldown_seconds: float = AUTOSCALE_COOLDOWN_SECONDS
+    min_batch: int = AUTOSCALE_MIN_BATCH
+    max_batch: int = AUTOSCALE_MAX_BATCH
+    default_service_seconds: float = AUTOSCALE_DEFAULT_SERVICE_SECONDS
+
+    _up_streak: int = field(default=0, init=False)
+    _down_streak: int = field(default=0, init=False)
+    _last_change: float = field(default=float('-inf'), init=False)
+
+    def desired_workers(self, observation: Observation, current: int) -> int:
+        service = observation.service_seconds or self.default_service_seconds
+        desired = math.ceil(observation.queue_length * service / self.target_drain_seconds)
+        if observation.oldest_age is not None and observation.oldest_age > self.max_task_age_seconds:
+            desired = max(desired, current + 1)
+        return min(self.max_workers, max(self.min_workers, desired))
+
+    def batch_size(self, observation: Observation, workers: int) -> int:
+        """worker당 대기 작업 수를 배치 크기로 사용 (큐가 비면 최소 배치로 지연 시간 우선)"""
+        backlog = observation.queue_length / max(1, workers)
+        return min(self.max_batch, max(self.min_batch, 2 ** int(math.log2(backlog)) if backlog >= 1 else self.min_batch))
+
+    def decide(self, observation: Observation, current: int, now: Optional[float] = None) -> Decision:
+        now = time.monotonic() if now is None else now
+        desired = self.desired_workers(observation, current)
+        target, action = current, 'hold'
+
+        if desired > current:
+            self._up_streak += 1
+            self._down_streak = 0
+            if self._up_streak >= self.up_polls:
+                target, action = desired, 'scale_up'
+        elif desired < current:
+            self._down_streak += 1
+            self._up_streak = 0
+            if self._down_streak >= self.down_polls and now - self._last_change >= self.cooldown_seconds:
+                target, action = current - 1, 'scale_down'
+        else:
+            self._up_streak = self._down_streak = 0
+
+        if action != 'hold':
+            self._up_streak = self._down_streak = 0
+            self._last_change = now
+        return Decision(workers=target, batch_size=self.batch_size(observation, target), desired_workers=desired, action=action)
+
+
+class Autoscaler:
+    def __init__(
+        self,
+        queue_probe: QueueProbe,
+        worker_actuator: WorkerActuator,
+        batch_actuator: Optional[BatchActuator] = None,
+        service_probe: Optional[ServiceTimeProbe] = None,
+        policy: Optional[ScalingPolicy] = None,
+    ):
+        self.queue_probe = queue_probe
+        self.worker_actuator = worker_actuator
+        self.batch_actuator = batch_actuator
+        self.service_probe = service_probe
+        self.policy = policy or ScalingPolicy()
+        self.batch_size: Optional[int] = None
+        self.last_observation: Optional[Observation] = None
+
+    def observe(self) -> Observation:
+        return Observation(
+            queue_length=self.queue_probe.queue_length(),
+            oldest_age=self.queue_probe.oldest_age(),
+            service_seconds=self.service_probe.service_seconds() if self.service_probe else None,
+        )
+
+    def step(self) -> Decision:
+        observation = self.last_observation = self.observe()
+        current = self.worker_actuator.current()
+        # 최소 worker 수는 hysteresis 없이 바로 맞춤 (시작 직후, worker 비정상 종료)
+        if current < self.policy.min_workers:
+            self.worker_actuator.scale_to(self.policy.min_workers)
+            current = self.policy.min_workers
+
+        decision = self.policy.decide(observation, current)
+        if decision.workers != current:
+            self.worker_actuator.scale_to(decision.workers)
+        if self.batch_actuator is not None and decision.batch_size != self.batch_size:
+            self.batch_actuator.set_batch_size(decision.batch_size)
+            self.batch_size = decision.batch_size
+
+        QUEUE_LENGTH.set(observation.queue_length)
+        OLDEST_TASK_AGE.set(observation.oldest_age or 0)
+        if observation.service_seconds is not None:
+            SERVICE_SECONDS.set(observation.service_seconds)
+        WORKERS.set(decision.workers)
+        DESIRED_WORKERS.set(decision.desired_workers)
+        BATCH.set(decision.batch_size)
+        DECISIONS.labels(decision.action).inc()
+        if decision.action != 'hold':
+            logger.info(
+                f"{decision.action}: workers {current} -> {decision.workers} "
+                f"(queue={observation.queue_length}, oldest_age={observation.oldest_age}, service_seconds={observation.service_seconds})"
+            )
+        return decision
+
+    def run(self, poll_seconds: float = AUTOSCALE_POLL_SECONDS) -> None:
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Autoscaler step failed: {e}")
+            time.sleep(poll_seconds)
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Scale AI worker processes and batch size from queue depth.")
+    parser.add_argument("--dry-run", action="store_true", help="worker/배치 크기를 바꾸지 않고 결정만 기록")
+    parser.add_argument("--once", action="store_true", help="한 번만 관측하고 결정을 출력")
+    parser.add_argument("--no-batch", action="store_true", help="배치 크기는 조절하지 않음")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        worker_actuator = batch_actuator = DryRunActuator()
+    else:
+        worker_actuator = SubprocessWorkerActuator()
+        batch_actuator = CeleryBatchActuator()
+
+    autoscaler = Autoscaler(
+        RedisQueueProbe(),
+        worker_actuator,
+        batch_actuator=None if args.no_batch else batch_actuator,
+        service_probe=ServiceTimeProbe(),
+    )
+    if args.once:
+        decision = autoscaler.step()
+        print(json.dumps({**autoscaler.last_observation.__dict__, **decision.__dict__}, indent=2))
+        return 0
+
+    start_metrics_server(AUTOSCALER_METRICS_PORT)
+    try:
+        autoscaler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if isinstance(worker_actuator, SubprocessWorkerActuator):
+            worker_actuator.stop_all()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Vizota AI CPU Benchmark
+네트워크 없이 합성 이미지로 AI worker의 추론 지연 시간과 처리량을 측정합니다.
+worker 성능 변경은 이 결과를 커밋 간 비교해 판단합니다.
+
+    mobilevit    해상도 x 배치 크기별 MobileViT 태깅 (전처리 포함)
+    maniqa       crop 수 x 배치 크기별 MANIQA crop 점수 계산
+    quality      해상도별 품질 평가 전체 (crop 추출 + MANIQA, 현재 crop 모드/cascade 설정)
+    categorizer  태그 수별 zero-shot 분류 (캐시 비움)
+    task         해상도별 작업 전체: JPEG 디코딩 → 파이프라인 추론 → 결과 콜백 (다운로드/백엔드 POST 없음)
+
+해상도는 4:3 비율의 1 ~ 48 MP 합성 이미지(고정 seed)를 사용합니다.
+결과는 커밋, 환경, 측정값을 담은 JSON으로 저장하며, --baseline으로 이전 결과와 비교합니다.
+
+사용 예:
+    python benchmark.py --output bench-$(git rev-parse --short HEAD).json
+    python benchmark.py --suites mobilevit maniqa --threads 4
+    python benchmark.py --mode int8 --baseline bench-abc1234.json
+"""
+
+import os
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from io import BytesIO
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import torch
+from PIL import Image
+
+from analyzer import DEFAULT_CANDIDATE_LABELS, MANIQA_CONFIG, Analyzer
+from parity import MODES
+from pipeline import AnalysisJob, StagedPipeline
+
+logger = logging.getLogger(__name__)
+
+SUITES = ('mobilevit', 'maniqa', 'quality', 'categorizer', 'task')
+DEFAULT_MEGAPIXELS = [1, 4, 12, 24, 48]
+DEFAULT_BATCH_SIZES = [1, 8]
+DEFAULT_CROP_COUNTS = [5, 10, 20]
+DEFAULT_TAG_COUNTS = [1, 8, 32]
+
+
+def synthetic_image(megapixels: float, seed: int = 0) -> np.ndarray:
+    """4:3 비율의 RGB uint8 합성 이미지 (그라디언트 + 노이즈, 실제 사진과 비슷한 JPEG 크기)"""
+    height = int(round(np.sqrt(megapixels * 1e6 * 3 / 4)))
+    width = int(round(height * 4 / 3))
+    rng = np.random.RandomState(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    phase = rng.uniform(0, 2 * np.pi, size=(1, 1, 3)).astype(np.float32)
+    base = 127 + 100 * np.sin(6 * x + 4 * y + phase)
+    image = base + rng.normal(0, 12, size=(height, width, 3)).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(image: np.ndarray, quality: int = 90) -> bytes:
+    buffer = BytesIO()
+    Image.fromarray(image).save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int, items: int = 1) -> Dict[str, float]:
+    """fn을 warmup회 실행한 뒤 repeat회 측정해 지연 시간 통계(ms)와 처리량(items/s)을 반환합니다."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings)
+    return {
+        'repeat': repeat,
+        'items': items,
+        'mean_ms': float(timings.mean() * 1000),
+        'p50_ms': float(np.percentile(timings, 50) * 1000),
+        'p90_ms': float(np.percentile(timings, 90) * 1000),
+        'min_ms': float(timings.min() * 1000),
+        'items_per_second': float(items / np.median(timings)),
+    }
+
+
+def bench_mobilevit(analyzer: Analyzer, images: Dict[float, np.ndarray], batch_sizes: List[int], repeat: int, warmup: int):
+    rows = []
+    for mp, image in images.items():
+        for batch_size in batch_sizes:
+            batch = [image] * batch_size
+            stats = measure(lambda: analyzer.tag(batch), repeat, warmup, batch_size)
+            rows.append({'megapixels': mp, 'batch_size': batch_size, **stats})
+    return rows
+
+
+def bench_maniqa(analyzer: Analyzer, image: np.ndarray, crop_counts: List[int], batch_sizes: List[int], repeat: int, warmup: int):
+    rows = []
+    original_batch_size = analyzer.quality_batch_size
+    try:
+        for num_crops in crop_counts:
+            crops = analyzer.sample_crops(image, num_crops)
+            for batch_size in batch_sizes:
+                analyzer.quality_batch_size = batch_size
+                stats = measure(lambda: analyzer.score_crops(crops), repeat, warmup, num_crops)
+                rows.append({'crops': num_crops, 'batch_size': batch_size, **stats})
+    finally:
+        analyzer.quality_batch_size = original_batch_size
+    return rows
+
+
+def bench_quality(analyzer: Analyzer, images: Dict[float, np.ndarray], repeat: int, warmup: int):
+    rows = []
+    for mp, image in images.items():
+        stats = measure(lambda: analyzer.score_quality([image]), repeat, warmup)
+        rows.append({'megapixels': mp, 'crop_mode': analyzer.quality_crop_mode, 'cascade': analyzer.quality_cascade, **stats})
+    return rows
+
+
+def bench_categorizer(analyzer: Analyzer, tag_counts: List[int], repeat: int, warmup: int):
+    names = [label.split(',')[0].strip() for label in analyzer.id2label.values()]
+    rows = []
+    for count in tag_counts:
+        tags = names[:count]
+
+        def run():
+            analyzer._category_cache.clear()
+            analyzer.categorize(tags, DEFAULT_CANDIDATE_LABELS)
+
+        stats = measure(run, repeat, warmup, count)
+        rows.append({'tags': count, **stats})
+    return rows
+
+
+def bench_task(analyzer: Analyzer, images: Dict[float, np.ndarray], concurrency: int, repeat: int, warmup: int):
+    """JPEG 바이트를 파이프라인에 동시에 concurrency개 제출하고 모두 끝날 때까지의 시간을 측정합니다."""
+    pipeline = StagedPipeline(analyzer, prefetch=concurrency, max_batch_size=concurrency, post_workers=1)
+    # 백엔드 POST 대신 결과를 직렬화만 하는 콜백
+    on_result = lambda result, job: json.dumps(result)
+    rows = []
+    try:
+        for mp, image in images.items():
+            data = encode_jpeg(image)
+
+            def run():
+                jobs = [AnalysisJob(image_bytes=data, on_result=on_result) for _ in range(concurrency)]
+                for future in [pipeline.submit(job) for job in jobs]:
+                    future.result()
+
+            stats = measure(run, repeat, warmup, concurrency)
+            rows.append({'megapixels': mp, 'jpeg_bytes': len(data), 'concurrency': concurrency, **stats})
+    finally:
+        pipeline.shutdown()
+    return rows
+
+
+def environment(analyzer: Analyzer, args) -> Dict[str, Any]:
+    def git(*cmd):
+        try:
+            return subprocess.check_output(['git', *cmd], cwd=os.path.dirname(os.path.abspath(__file__)), text=True).strip()
+        except Exception:
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'torch_threads': torch.get_num_threads(),
+        'mode': args.mode,
+        'backend': analyzer.backend,
+        'quantize': analyzer.quantize,
+        'fused_attention': analyzer.fused_attention,
+        'quality_crop_mode': analyzer.quality_crop_mode,
+        'quality_cascade': analyzer.quality_cascade,
+        'fast_preprocess': analyzer.preprocessor is not None,
+        'maniqa_crop_size': MANIQA_CONFIG.crop_size,
+    }
+
+
+def _key(suite: str, row: Dict[str, Any]) -> tuple:
+    return (suite,) + tuple((k, v) for k, v in sorted(row.items()) if k in ('megapixels', 'batch_size', 'crops', 'tags', 'concurrency'))
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """같은 측정 항목의 p50 지연 시간 비율(current / baseline)을 계산합니다."""
+    previous = {_key(suite, row): row for suite, rows in baseline['results'].items() for row in rows}
+    changes = []
+    for suite, rows in current['results'].items():
+        for row in rows:
+            old = previous.get(_key(suite, row))
+            if old:
+                changes.append({
+                    'case': ' '.join(f"{k}={v}" for k, v in _key(suite, row)[1:]) or suite,
+                    'suite': suite,
+                    'baseline_p50_ms': old['p50_ms'],
+                    'p50_ms': row['p50_ms'],
+                    'ratio': row['p50_ms'] / old['p50_ms'] if old['p50_ms'] else None,
+                })
+    return changes
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Offline CPU benchmark for the AI worker.")
+    parser.add_argument("--suites", nargs="*", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--megapixels", nargs="*", type=float, default=DEFAULT_MEGAPIXELS)
+    parser.add_argument("--batch-sizes", nargs="*", type=int, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--crop-counts", nargs="*", type=int, default=DEFAULT_CROP_COUNTS)
+    parser.add_argument("--tag-counts", nargs="*", type=int, default=DEFAULT_TAG_COUNTS)
+    parser.add_argument("--concurrency", type=int, default=4, help="task suite의 동시 작업 수")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op thread 수")
+    parser.add_argument("--mode", choices=sorted(MODES), help="parity.py 최적화 모드 (없으면 환경 변수 설정 사용)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    parser.add_argument("--baseline", help="비교할 이전 결과 JSON 파일 경로")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    analyzer = Analyzer(device=torch.device('cpu'), **(MODES[args.mode] if args.mode else {})).load().warmup()
+    images = {mp: synthetic_image(mp, seed=i) for i, mp in enumerate(args.megapixels)}
+
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    for suite in args.suites:
+        logger.info(f"Running {suite} benchmark...")
+        if suite == 'mobilevit':
+            results[suite] = bench_mobilevit(analyzer, images, args.batch_sizes, args.repeat, args.warmup)
+        elif suite == 'maniqa':
+            results[suite] = bench_maniqa(analyzer, images[min(images)], args.crop_counts, args.batch_sizes, args.repeat, args.warmup)
+        elif suite == 'quality':
+            results[suite] = bench_quality(analyzer, images, args.repeat, args.warmup)
+        elif suite == 'categorizer':
+            results[suite] = bench_categorizer(analyzer, args.tag_counts, args.repeat, args.warmup)
+        elif suite == 'task':
+            results[suite] = bench_task(analyzer, images, args.concurrency, args.repeat, args.warmup)
+
+    report: Dict[str, Any] = {
+        'environment': environment(analyzer, args),
+        'model_load_seconds': analyzer.load_seconds,
+        'model_warmup_seconds': analyzer.warmup_seconds,
+        'results': results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'] = compare(json.load(f), report)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
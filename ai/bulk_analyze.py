@@ -0,0 +1,204 @@
+"""
+Vizota AI Bulk Analysis
+로컬 매니페스트(JSONL 또는 CSV)에 적힌 이미지들을 DataLoader로 병렬 디코딩하고
+MobileViT, MANIQA, zero-shot 분류를 큰 배치로 실행합니다.
+결과는 Parquet 파일로 저장하거나 백엔드 일괄 수신 API로 바로 전송합니다.
+
+매니페스트 형식 (열 이름):
+    image_id: 이미지 식별자
+    path 또는 url: 로컬 파일 경로 또는 HTTP(S) URL
+
+사용 예:
+    python bulk_analyze.py manifest.jsonl --output results.parquet --workers 8 --batch-size 32
+    python bulk_analyze.py manifest.csv --post-url http://localhost:8000/api/images/analysis-results/bulk
+"""
+
+import os
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+import argparse
+import csv
+import json
+import logging
+import time
+from typing import List, Dict, Any, Optional
+from urllib.parse import unquote, urlsplit
+
+import requests
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from analyzer import Analyzer, DEFAULT_CANDIDATE_LABELS
+from image_cache import get_cache
+from pipeline import decode_image
+from profiling import maybe_profile
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(path: str) -> List[Dict[str, str]]:
+    """JSONL 또는 CSV 매니페스트를 읽어 {'image_id', 'source'} 목록을 반환합니다."""
+    if path.endswith('.csv'):
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    entries = []
+    for row in rows:
+        source = row.get('path') or row.get('url') or row.get('image_url')
+        if not source:
+            raise ValueError(f"Manifest row has no path/url: {row}")
+        # image_id가 없으면 결과를 어느 이미지에도 기록할 수 없고 일괄 전송 요청 전체가 검증에 실패함
+        image_id = str(row.get('image_id') or '').strip()
+        if not image_id:
+            raise ValueError(f"Manifest row has no image_id: {row}")
+        entries.append({'image_id': image_id, 'source': source})
+    return entries
+
+
+class ManifestDataset(Dataset):
+    """매니페스트 항목을 읽어 RGB uint8 배열로 디코딩합니다. DataLoader worker 프로세스에서 실행됩니다."""
+
+    def __init__(self, entries: List[Dict[str, str]], timeout: int = 30):
+        self.entries = entries
+        self.timeout = timeout
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _read_bytes(self, source: str) -> bytes:
+        if source.startswith(('http://', 'https://')):
+            # backfill은 같은 이미지를 반복해서 받는 경우가 많으므로 worker와 같은 로컬 캐시 사용
+            cache = get_cache()
+            data = cache.get(source)
+            if data is None:
+                response = requests.get(source, timeout=self.timeout)
+                response.raise_for_status()
+                data = response.content
+                cache.put(source, data)
+            return data
+        if source.startswith('file://'):
+            source = unquote(urlsplit(source).path)
+        with open(source, 'rb') as f:
+            return f.read()
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        entry = self.entries[idx]
+        try:
+            data = self._read_bytes(entry['source'])
+            # worker와 같은 디코딩 경로
+            image = decode_image(data)
+            return {**entry, 'image': image, 'error': None}
+        except Exception as e:
+            return {**entry, 'image': None, 'error': str(e)}
+
+
+def collate_samples(samples: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # 이미지 크기가 서로 다르므로 텐서로 쌓지 않고 목록 그대로 전달
+    return samples
+
+
+def write_parquet(rows: List[Dict[str, Any]], path: str) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is required for parquet output: pip install pyarrow")
+    pq.write_table(pa.Table.from_pylist(rows), path)
+
+
+def post_results(rows: List[Dict[str, Any]], post_url: str, chunk_size: int = 200) -> int:
+    """성공한 결과를 백엔드 일괄 수신 API로 전송하고 전송 건수를 반환합니다."""
+    sent = 0
+    payload_rows = [row for row in rows if not row.get('error')]
+    for start in range(0, len(payload_rows), chunk_size):
+        chunk = payload_rows[start:start + chunk_size]
+        response = requests.post(post_url, json={'results': chunk}, timeout=120)
+        response.raise_for_status()
+        sent += len(chunk)
+    return sent
+
+
+def run(
+    manifest: str,
+    output: Optional[str] = None,
+    post_url: Optional[str] = None,
+    batch_size: int = 32,
+    workers: int = 4,
+    candidate_labels: Optional[List[str]] = None,
+    with_quality: bool = True,
+) -> List[Dict[str, Any]]:
+    entries = read_manifest(manifest)
+    logger.info(f"Loaded manifest with {len(entries)} images")
+
+    analyzer = Analyzer().load()
+    loader = DataLoader(
+        ManifestDataset(entries),
+        batch_size=batch_size,
+        num_workers=workers,
+        collate_fn=collate_samples,
+        prefetch_factor=2 if workers > 0 else None,
+        persistent_workers=False,
+    )
+
+    rows: List[Dict[str, Any]] = []
+    started = time.monotonic()
+    for batch in loader:
+        decoded = [s for s in batch if s['image'] is not None]
+        for sample in batch:
+            if sample['image'] is None:
+                logger.warning(f"Failed to load image {sample['image_id']}: {sample['error']}")
+                rows.append({'image_id': sample['image_id'], 'image_url': sample['source'], 'error': sample['error']})
+
+        if decoded:
+            try:
+                images = [s['image'] for s in decoded]
+                with maybe_profile('bulk', [s['image_id'] for s in decoded], images):
+                    results = analyzer.analyze(images, candidate_labels, with_quality=with_quality)
+                for sample, result in zip(decoded, results):
+                    rows.append({'image_id': sample['image_id'], 'image_url': sample['source'], 'error': None, **result})
+            except Exception as e:
+                logger.error(f"Batch analysis failed: {e}")
+                for sample in decoded:
+                    rows.append({'image_id': sample['image_id'], 'image_url': sample['source'], 'error': str(e)})
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Processed {len(rows)}/{len(entries)} images ({len(rows) / elapsed:.2f} img/s)")
+
+    if output:
+        write_parquet(rows, output)
+        logger.info(f"Wrote {len(rows)} rows to {output}")
+    if post_url:
+        sent = post_results(rows, post_url)
+        logger.info(f"Sent {sent} results to {post_url}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline bulk image analysis over a local manifest.")
+    parser.add_argument("manifest", help="JSONL 또는 CSV 매니페스트 경로")
+    parser.add_argument("--output", help="결과를 저장할 Parquet 파일 경로")
+    parser.add_argument("--post-url", help="백엔드 일괄 수신 API URL (예: .../api/images/analysis-results/bulk)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4, help="DataLoader 디코딩 worker 수")
+    parser.add_argument("--labels", nargs="*", default=DEFAULT_CANDIDATE_LABELS, help="카테고리 후보 레이블")
+    parser.add_argument("--no-quality", action="store_true", help="MANIQA 품질 점수 계산 생략")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op thread 수")
+    args = parser.parse_args()
+
+    if not args.output and not args.post_url:
+        parser.error("--output 또는 --post-url 중 하나 이상이 필요합니다.")
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    run(
+        args.manifest,
+        output=args.output,
+        post_url=args.post_url,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        candidate_labels=args.labels,
+        with_quality=not args.no_quality,
+    )
@@ -0,0 +1,142 @@
+"""
+Vizota AI Derivatives
+분석을 위해 디코딩한 이미지로 갤러리용 축소본(파생 이미지)을 만들어 저장소에 업로드합니다.
+앱 그리드/화면 보기는 원본 대신 이 축소본을 받으므로 타일당 수 MB 대신 수십 KB만 전송합니다.
+
+백엔드는 분석 작업에 파생 이미지 목록을 함께 보냅니다.
+    derivatives=[{'name': 'grid', 'max_size': 256, 'format': 'webp', 'url': <presigned PUT URL>}, ...]
+
+    - 인코딩: I/O 단계에서 디코딩 직후 실행 (큰 크기부터 줄여 가며 이전 결과를 다시 축소, EXIF 방향 적용)
+    - 업로드: 전송 단계에서 결과 콜백 전에 presigned URL로 PUT, 성공한 항목의 크기를 결과에 포함
+원본보다 큰 max_size는 원본 크기로 인코딩합니다.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import requests
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_QUALITY = int(os.getenv('DERIVATIVE_QUALITY', '80'))
+# WebP method (0 빠름 ~ 6 작음). 기본 4는 Pillow 기본값
+DERIVATIVE_WEBP_METHOD = int(os.getenv('DERIVATIVE_WEBP_METHOD', '4'))
+DERIVATIVE_UPLOAD_TIMEOUT = int(os.getenv('DERIVATIVE_UPLOAD_TIMEOUT', '30'))
+
+_CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# EXIF Orientation → PIL transpose (ImageOps.exif_transpose와 같은 표)
+_ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+@dataclass
+class Derivative:
+    name: str
+    url: str
+    content_type: str
+    data: bytes
+    width: int
+    height: int
+
+
+def read_orientation(data: Union[bytes, Any]) -> int:
+    """이미지 헤더의 EXIF Orientation 값을 읽습니다. (픽셀은 디코딩하지 않음, 없으면 1)"""
+    try:
+        with Image.open(data if hasattr(data, 'read') else BytesIO(data)) as image:
+            return int(image.getexif().get(0x0112, 1))
+    except Exception:
+        return 1
+    finally:
+        if hasattr(data, 'seek'):
+            data.seek(0)
+
+
+def apply_orientation(image: Image.Image, orientation: int) -> Image.Image:
+    """EXIF Orientation을 적용해 화면에 보이는 방향으로 돌립니다."""
+    if orientation in _ORIENTATION_TRANSPOSE:
+        return image.transpose(_ORIENTATION_TRANSPOSE[orientation])
+    return image
+
+
+def _encode(image: Image.Image, fmt: str) -> bytes:
+    buffer = BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, format='WEBP', quality=DERIVATIVE_QUALITY, method=DERIVATIVE_WEBP_METHOD)
+    else:
+        image.save(buffer, format='JPEG', quality=DERIVATIVE_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def make_derivatives(image: np.ndarray, specs: List[Dict[str, Any]], orientation: int = 1) -> List[Derivative]:
+    """
+    RGB uint8 이미지로 specs의 파생 이미지를 인코딩합니다.
+
+    Args:
+        image: decode_image() 결과 (H, W, 3)
+        specs: [{'name', 'max_size', 'format', 'url'}, ...]
+        orientation: EXIF Orientation (read_orientation)
+    """
+    current = Image.fromarray(image)
+    derivatives = []
+    # 큰 크기부터 만들고 작은 크기는 직전 결과를 다시 줄여서 전체 resize 비용을 줄임
+    for spec in sorted(specs, key=lambda s: s['max_size'], reverse=True):
+        fmt = spec.get('format', 'webp')
+        if fmt not in _CONTENT_TYPES:
+            logger.warning(f"Unsupported derivative format '{fmt}', skipping {spec['name']}")
+            continue
+        scale = spec['max_size'] / max(current.size)
+        if scale < 1:
+            size = (max(1, round(current.width * scale)), max(1, round(current.height * scale)))
+            current = current.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+        output = apply_orientation(current, orientation)
+        derivatives.append(Derivative(
+            name=spec['name'],
+            url=spec['url'],
+            content_type=_CONTENT_TYPES[fmt],
+            data=_encode(output, fmt),
+            width=output.width,
+            height=output.height,
+        ))
+    return derivatives
+
+
+def upload_derivatives(derivatives: Optional[List[Derivative]]) -> Dict[str, Dict[str, int]]:
+    """
+    파생 이미지를 presigned URL로 업로드합니다.
+
+    Returns:
+        Dict: 업로드에 성공한 항목 {name: {'width', 'height', 'size'}}
+    """
+    uploaded = {}
+    for derivative in derivatives or []:
+        try:
+            response = requests.put(
+                derivative.url,
+                data=derivative.data,
+                headers={'Content-Type': derivative.content_type},
+                timeout=DERIVATIVE_UPLOAD_TIMEOUT,
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to upload derivative '{derivative.name}': {e}")
+            continue
+        uploaded[derivative.name] = {
+            'width': derivative.width,
+            'height': derivative.height,
+            'size': len(derivative.data),
+        }
+    return uploaded
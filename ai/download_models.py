@@ -0,0 +1,42 @@
+"""
+Vizota AI Model Cache
+Worker가 네트워크 조회 없이 시작할 수 있도록 Hugging Face 모델을 로컬 모델 캐시(MODEL_CACHE_DIR)에 미리 내려받습니다.
+이미지 빌드 단계나 배포 전에 한 번 실행합니다.
+
+사용 예:
+    python download_models.py
+"""
+
+import logging
+import os
+import sys
+
+from huggingface_hub import snapshot_download
+
+from analyzer import CATEGORIZER_MODEL, MANIQA_CKPT_PATH, MOBILEVIT_MODEL, MODEL_CACHE_DIR
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> int:
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    for repo_id in (MOBILEVIT_MODEL, CATEGORIZER_MODEL):
+        logger.info(f"Downloading {repo_id} into {MODEL_CACHE_DIR}...")
+        # 추론에 필요 없는 다른 프레임워크 가중치는 제외
+        snapshot_download(
+            repo_id,
+            cache_dir=MODEL_CACHE_DIR,
+            ignore_patterns=['*.h5', '*.msgpack', '*.onnx', 'tf_model*', 'flax_model*', 'rust_model*'],
+        )
+
+    if not os.path.exists(MANIQA_CKPT_PATH):
+        logger.error(f"MANIQA checkpoint not found: {MANIQA_CKPT_PATH} (set MANIQA_CKPT_PATH)")
+        return 1
+
+    logger.info("Model cache is ready.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
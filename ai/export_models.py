@@ -0,0 +1,174 @@
+"""
+Vizota AI Graph Export
+MobileViT 태거와 MANIQA 품질 모델을 TorchScript(trace) 또는 ONNX 그래프로 내보내고,
+worker에서 eager PyTorch 대신 실행할 수 있는 runtime backend를 제공합니다.
+
+내보내기 후에는 eager 모델과 출력이 허용 오차 안에서 일치하는지 바로 확인합니다.
+(trace에 사용한 것과 다른 배치 크기로 확인해 배치 차원이 고정되지 않았는지도 검사)
+
+출력 디렉토리 구조:
+    mobilevit.ts, maniqa.ts       (TorchScript)
+    mobilevit.onnx, maniqa.onnx   (ONNX)
+
+사용 예:
+    python export_models.py --format torchscript
+    python export_models.py --format onnx --check-only
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import Dict, Tuple
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('eager', 'torchscript', 'onnx')
+FILE_EXTENSIONS = {'torchscript': 'ts', 'onnx': 'onnx'}
+
+
+class MobileViTTagger(nn.Module):
+    """logits와 pooled 특징 벡터를 함께 반환하는 export용 MobileViT 래퍼 (Analyzer.forward_mobilevit와 동일)"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        outputs = self.model.mobilevit(pixel_values, return_dict=False)
+        features = self.model.dropout(outputs[1])
+        logits = self.model.classifier(features)
+        return logits, features
+
+
+def example_inputs(analyzer, batch_size: int) -> Dict[str, torch.Tensor]:
+    """모델별 export/검증 입력. MobileViT는 feature extractor 출력 크기, MANIQA는 crop 크기를 사용합니다."""
+    from analyzer import MANIQA_CONFIG
+
+    crop_size = analyzer.feature_extractor.crop_size
+    if isinstance(crop_size, dict):
+        crop_size = crop_size['height']
+    generator = torch.Generator().manual_seed(0)
+    return {
+        'mobilevit': torch.rand(batch_size, 3, crop_size, crop_size, generator=generator),
+        'maniqa': torch.rand(batch_size, 3, MANIQA_CONFIG.crop_size, MANIQA_CONFIG.crop_size, generator=generator) * 2 - 1,
+    }
+
+
+def export_modules(analyzer) -> Dict[str, nn.Module]:
+    return {'mobilevit': MobileViTTagger(analyzer.model).eval(), 'maniqa': analyzer.maniqa.eval()}
+
+
+@torch.no_grad()
+def export(analyzer, export_dir: str, fmt: str) -> None:
+    """로드된 (CPU) Analyzer의 MobileViT와 MANIQA를 지정한 형식으로 내보냅니다."""
+    os.makedirs(export_dir, exist_ok=True)
+    inputs = example_inputs(analyzer, batch_size=2)
+    for name, module in export_modules(analyzer).items():
+        path = os.path.join(export_dir, f"{name}.{FILE_EXTENSIONS[fmt]}")
+        if fmt == 'torchscript':
+            traced = torch.jit.trace(module, inputs[name], check_trace=False)
+            torch.jit.save(torch.jit.freeze(traced), path)
+        else:
+            output_names = ['logits', 'features'] if name == 'mobilevit' else ['score']
+            torch.onnx.export(
+                module, (inputs[name],), path,
+                input_names=['pixel_values'],
+                output_names=output_names,
+                dynamic_axes={'pixel_values': {0: 'batch'}, **{out: {0: 'batch'} for out in output_names}},
+                opset_version=17,
+            )
+        logger.info(f"Exported {name} -> {path}")
+
+
+class TorchScriptRunner:
+    """TorchScript 그래프를 실행합니다. 출력은 eager 모듈과 같은 텐서 (또는 튜플)입니다."""
+
+    def __init__(self, path: str, device: torch.device):
+        self.module = torch.jit.load(path, map_location=device)
+        self.module.eval()
+
+    def __call__(self, pixel_values: torch.Tensor):
+        return self.module(pixel_values)
+
+
+class OnnxRunner:
+    """ONNX Runtime 세션을 실행합니다. (CPU 전용, onnxruntime 필요)"""
+
+    def __init__(self, path: str, intra_op_threads: int = 0):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("INFERENCE_BACKEND=onnx requires onnxruntime (pip install onnxruntime)")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, pixel_values: torch.Tensor):
+        outputs = self.session.run(None, {'pixel_values': pixel_values.cpu().numpy()})
+        tensors = tuple(torch.from_numpy(output) for output in outputs)
+        return tensors[0] if len(tensors) == 1 else tensors
+
+
+def load_runners(export_dir: str, backend: str, device: torch.device, intra_op_threads: int = 0) -> Dict[str, object]:
+    """내보낸 그래프를 모델 이름별 runner로 로드합니다."""
+    runners = {}
+    for name in ('mobilevit', 'maniqa'):
+        path = os.path.join(export_dir, f"{name}.{FILE_EXTENSIONS[backend]}")
+        if not os.path.exists(path):
+            raise RuntimeError(f"{path} not found. Run: python export_models.py --format {backend}")
+        if backend == 'torchscript':
+            runners[name] = TorchScriptRunner(path, device)
+        else:
+            runners[name] = OnnxRunner(path, intra_op_threads)
+    return runners
+
+
+@torch.no_grad()
+def check_parity(analyzer, export_dir: str, fmt: str, atol: float = 1e-3) -> Dict[str, float]:
+    """eager 모델과 내보낸 그래프의 출력 최대 오차를 반환합니다. trace와 다른 배치 크기(3)로 검사합니다."""
+    runners = load_runners(export_dir, fmt, torch.device('cpu'))
+    inputs = example_inputs(analyzer, batch_size=3)
+    errors = {}
+    for name, module in export_modules(analyzer).items():
+        expected = module(inputs[name])
+        actual = runners[name](inputs[name])
+        if isinstance(expected, torch.Tensor):
+            expected, actual = (expected,), (actual,)
+        errors[name] = max((e - a).abs().max().item() for e, a in zip(expected, actual))
+        logger.info(f"{name} ({fmt}) max abs error: {errors[name]:.2e} (atol={atol})")
+    return errors
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    from analyzer import Analyzer, MODEL_EXPORT_DIR
+
+    parser = argparse.ArgumentParser(description="Export MobileViT and MANIQA as TorchScript or ONNX graphs.")
+    parser.add_argument("--format", choices=sorted(FILE_EXTENSIONS), default='torchscript')
+    parser.add_argument("--output", default=MODEL_EXPORT_DIR, help="그래프를 저장할 디렉토리")
+    parser.add_argument("--atol", type=float, default=1e-3, help="eager 대비 허용 최대 절대 오차")
+    parser.add_argument("--check-only", action="store_true", help="내보내지 않고 기존 그래프만 검증")
+    args = parser.parse_args()
+
+    # 원본 float32 가중치에서 내보냄 (양자화 모델은 export 대상이 아님)
+    analyzer = Analyzer(device=torch.device('cpu'), use_artifacts=False, quantize=None, backend='eager').load()
+    if not args.check_only:
+        export(analyzer, args.output, args.format)
+
+    errors = check_parity(analyzer, args.output, args.format, args.atol)
+    failed = [name for name, error in errors.items() if error > args.atol]
+    if failed:
+        logger.error(f"Parity check failed for {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Vizota AI Image Cache
+다운로드한 이미지 바이트를 worker 호스트의 로컬 디스크에 보관하는 크기 제한 LRU 캐시
+(재분석, 콜백 실패 후 재시도, backfill이 같은 CloudFront 객체를 다시 받지 않도록 함)
+
+    - 키: query string을 뺀 URL의 SHA-256. 백엔드는 업로드마다 새 객체 키(uuid)를 만들고 덮어쓰지 않으므로
+      같은 키는 항상 같은 내용 (내용 hash 대신 URL로 키를 정해 다운로드 전에 조회할 수 있음)
+    - 저장: 같은 디렉토리의 임시 파일에 쓴 뒤 os.link로 연결 → 다른 프로세스가 쓰다 만 파일을 읽지 않고,
+      같은 키를 동시에 저장해도 새로 만든 한 프로세스만 크기를 더함
+    - LRU: 조회 시 mtime 갱신, 전체 크기가 IMAGE_CACHE_MAX_BYTES를 넘으면 mtime이 오래된 파일부터 삭제
+    - 같은 호스트의 worker 프로세스들은 IMAGE_CACHE_DIR을 공유하며, 전체 크기는 flock을 잡고 공유 파일(.size)에 누적
+      최대 크기를 넘으면 같은 lock 안에서 디렉토리를 훑어 실제 크기를 다시 잰 뒤 정리
+    - 권한: IMAGE_CACHE_FILE_MODE (기본 0644, 같은 호스트의 다른 사용자 worker도 읽을 수 있도록)
+
+IMAGE_CACHE_MAX_BYTES가 0이면 캐시를 사용하지 않습니다.
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'vizota-image-cache'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+# 정리 후 목표 크기 (최대 크기 대비 비율) - 매 저장마다 정리하지 않도록 여유를 둠
+IMAGE_CACHE_LOW_WATERMARK = float(os.getenv('IMAGE_CACHE_LOW_WATERMARK', '0.9'))
+# 캐시 파일 권한 (8진수, mkstemp 기본값 0600 대신 적용)
+IMAGE_CACHE_FILE_MODE = int(os.getenv('IMAGE_CACHE_FILE_MODE', '644'), 8)
+
+_LOCK_FILE = '.lock'
+# 모든 프로세스가 추가한 바이트를 누적한 전체 크기 (flock을 잡고 읽고 씀)
+_SIZE_FILE = '.size'
+
+
+class ImageCache:
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, max_bytes: int = IMAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(url: str) -> str:
+        parts = urlsplit(url)
+        # presigned URL 등의 서명 query는 내용과 무관하므로 키에서 제외
+        normalized = urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, url: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        path = self._path(self.key(url))
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # LRU 순서 갱신
+        except FileNotFoundError:
+            metrics.IMAGE_CACHE_REQUESTS.labels('miss').inc()
+            return None
+        except OSError as e:
+            logger.warning(f"Image cache read failed for {path}: {e}")
+            metrics.IMAGE_CACHE_REQUESTS.labels('miss').inc()
+            return None
+        metrics.IMAGE_CACHE_REQUESTS.labels('hit').inc()
+        metrics.IMAGE_CACHE_HIT_BYTES.inc(len(data))
+        return data
+
+    def put(self, url: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        path = self._path(self.key(url))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            try:
+                os.fchmod(fd, IMAGE_CACHE_FILE_MODE)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                # 이미 있으면 실패 (다른 프로세스가 먼저 저장한 같은 내용이므로 크기를 더하지 않음)
+                os.link(tmp_path, path)
+            finally:
+                os.unlink(tmp_path)
+        except FileExistsError:
+            return
+        except OSError as e:
+            logger.warning(f"Image cache write failed for {path}: {e}")
+            return
+
+        try:
+            with self._lock:
+                self._account(len(data))
+        except OSError as e:
+            logger.warning(f"Image cache size accounting failed: {e}")
+
+    def _account(self, added: int) -> None:
+        """
+        공유 전체 크기에 added를 더하고, 최대 크기를 넘거나 모르면 디렉토리를 훑어 실제 크기로 정리합니다.
+        같은 호스트의 모든 worker 프로세스가 같은 flock 아래에서 실행합니다.
+        """
+        size_path = os.path.join(self.directory, _SIZE_FILE)
+        with open(os.path.join(self.directory, _LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(size_path) as f:
+                        total: Optional[int] = int(f.read()) + added
+                except (FileNotFoundError, ValueError):
+                    total = None
+                if total is None or total > self.max_bytes:
+                    total = self._evict()
+                with open(size_path, 'w') as f:
+                    f.write(str(total))
+                metrics.IMAGE_CACHE_BYTES.set(total)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _evict(self) -> int:
+        """
+        디렉토리를 훑어 실제 전체 크기를 재고, 최대 크기를 넘으면 mtime이 오래된 파일부터 low watermark까지 삭제합니다.
+        _account()가 flock을 잡은 상태에서 호출하며 정리 후 전체 크기를 반환합니다.
+        """
+        entries = []
+        total = 0
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total > self.max_bytes:
+            target = self.max_bytes * IMAGE_CACHE_LOW_WATERMARK
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                total -= size
+                metrics.IMAGE_CACHE_EVICTED_BYTES.inc(size)
+        return total
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ImageCache:
+    """프로세스 공용 캐시 인스턴스를 반환합니다."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
@@ -1,8 +1,7 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import timm
-from timm.models.vision_transformer import Block
-from einops import rearrange
 
 from swin import SwinTransformer
 
@@ -16,7 +15,18 @@ class TABlock(nn.Module):
         self.softmax = nn.Softmax(dim=-1)
         self.proj_drop = nn.Dropout(drop)
 
+    @torch.no_grad()
+    def prepare_for_inference(self):
+        """q/k/v projection을 하나의 Linear(c_qkv)로 합칩니다. 합친 뒤에는 c_q/c_k/c_v를 사용하지 않습니다."""
+        self.c_qkv = nn.Linear(self.c_q.in_features, self.c_q.out_features * 3).to(self.c_q.weight.device)
+        self.c_qkv.weight.copy_(torch.cat([self.c_q.weight, self.c_k.weight, self.c_v.weight]))
+        self.c_qkv.bias.copy_(torch.cat([self.c_q.bias, self.c_k.bias, self.c_v.bias]))
+        del self.c_q, self.c_k, self.c_v
+
     def forward(self, x):
+        if hasattr(self, 'c_qkv') and not self.training:
+            return self.forward_fused(x)
+
         _x = x
         B, C, N = x.shape
         q = self.c_q(x)
@@ -30,35 +40,29 @@ class TABlock(nn.Module):
         x = x + _x
         return x
 
-
-class SaveOutput:
-    def __init__(self):
-        self.outputs = []
-    
-    def __call__(self, module, module_in, module_out):
-        self.outputs.append(module_out)
-    
-    def clear(self):
-        self.outputs = []
+    def forward_fused(self, x):
+        _x = x
+        B, C, N = x.shape
+        q, k, v = self.c_qkv(x).chunk(3, dim=-1)
+        x = F.scaled_dot_product_attention(q, k, v, scale=self.norm_fact)
+        x = x.transpose(1, 2).reshape(B, C, N)
+        x = self.proj_drop(x)
+        x = x + _x
+        return x
 
 
 class MANIQA(nn.Module):
     def __init__(self, embed_dim=72, num_outputs=1, patch_size=8, drop=0.1, 
                     depths=[2, 2], window_size=4, dim_mlp=768, num_heads=[4, 4],
-                    img_size=224, num_tab=2, scale=0.8, **kwargs):
+                    img_size=224, num_tab=2, scale=0.8, pretrained=True, **kwargs):
         super().__init__()
         self.img_size = img_size
         self.patch_size = patch_size
         self.input_size = img_size // patch_size
         self.patches_resolution = (img_size // patch_size, img_size // patch_size)
         
-        self.vit = timm.create_model('vit_base_patch8_224', pretrained=True)
-        self.save_output = SaveOutput()
-        hook_handles = []
-        for layer in self.vit.modules():
-            if isinstance(layer, Block):
-                handle = layer.register_forward_hook(self.save_output)
-                hook_handles.append(handle)
+        # 학습된 체크포인트가 ViT 가중치를 포함하므로, 체크포인트를 로드할 때는 pretrained=False로 Hub 다운로드 생략 가능
+        self.vit = timm.create_model('vit_base_patch8_224', pretrained=pretrained)
 
         self.tablock1 = nn.ModuleList()
         for i in range(num_tab):
@@ -107,40 +111,65 @@ class MANIQA(nn.Module):
             nn.Sigmoid()
         )
     
-    def extract_feature(self, save_output):
-        x6 = save_output.outputs[6][:, 1:]
-        x7 = save_output.outputs[7][:, 1:]
-        x8 = save_output.outputs[8][:, 1:]
-        x9 = save_output.outputs[9][:, 1:]
-        x = torch.cat((x6, x7, x8, x9), dim=2)
-        return x
+    def prepare_for_inference(self):
+        """
+        eval 전용 최적화를 적용합니다: TABlock q/k/v projection 결합, swin attention bias 고정.
+        가중치를 로드하고 디바이스로 옮긴 뒤에 호출해야 하며, 이후 fused attention 경로를 사용합니다.
+        """
+        self.eval()
+        for module in list(self.modules()):
+            if module is not self and hasattr(module, 'prepare_for_inference'):
+                module.prepare_for_inference()
+        return self
+
+    def extract_feature(self, x):
+        """
+        ViT 6~9번째 block 출력(cls token 제외)을 이어 붙입니다.
+        forward hook 대신 block을 직접 실행하므로 호출 간 공유 상태가 없고, 사용하지 않는 10번째 이후 block과 head는 건너뜁니다.
+        """
+        vit = self.vit
+        x = vit.patch_embed(x)
+        if hasattr(vit, '_pos_embed'):
+            x = vit._pos_embed(x)
+        else:
+            cls_token = vit.cls_token.expand(x.shape[0], -1, -1)
+            x = vit.pos_drop(torch.cat((cls_token, x), dim=1) + vit.pos_embed)
+        if hasattr(vit, 'patch_drop'):
+            x = vit.patch_drop(x)
+        if hasattr(vit, 'norm_pre'):
+            x = vit.norm_pre(x)
+
+        outputs = []
+        for i, blk in enumerate(vit.blocks[:10]):
+            x = blk(x)
+            if i >= 6:
+                outputs.append(x[:, 1:])
+        return torch.cat(outputs, dim=2)
 
     def forward(self, x):
-        _x = self.vit(x)
-        x = self.extract_feature(self.save_output)
-        self.save_output.outputs.clear()
+        x = self.extract_feature(x)
 
         # stage 1
-        x = rearrange(x, 'b (h w) c -> b c (h w)', h=self.input_size, w=self.input_size)
+        # einops.rearrange 대신 native reshape/transpose를 사용 (Python dispatch 감소, 그래프 export 시 배치 차원 유지)
+        h = w = self.input_size
+        x = x.transpose(1, 2)                           # b (h w) c -> b c (h w)
         for tab in self.tablock1:
             x = tab(x)
-        x = rearrange(x, 'b c (h w) -> b c h w', h=self.input_size, w=self.input_size)
+        x = x.unflatten(2, (h, w))                      # b c (h w) -> b c h w
         x = self.conv1(x)
         x = self.swintransformer1(x)
 
         # stage2
-        x = rearrange(x, 'b c h w -> b c (h w)', h=self.input_size, w=self.input_size)
+        x = x.flatten(2)                                # b c h w -> b c (h w)
         for tab in self.tablock2:
             x = tab(x)
-        x = rearrange(x, 'b c (h w) -> b c h w', h=self.input_size, w=self.input_size)
+        x = x.unflatten(2, (h, w))                      # b c (h w) -> b c h w
         x = self.conv2(x)
         x = self.swintransformer2(x)
 
-        x = rearrange(x, 'b c h w -> b (h w) c', h=self.input_size, w=self.input_size)
-        score = torch.tensor([]).to(x.device)
-        for i in range(x.shape[0]):
-            f = self.fc_score(x[i])
-            w = self.fc_weight(x[i])
-            _s = torch.sum(f * w) / torch.sum(w)
-            score = torch.cat((score, _s.unsqueeze(0)), 0)
+        x = x.flatten(2).transpose(1, 2)                # b c h w -> b (h w) c
+        # patch별 점수의 가중 평균을 배치 전체에 대해 한 번에 계산
+        f = self.fc_score(x)
+        w = self.fc_weight(x)
+        score = (f * w).sum(dim=(1, 2)) / w.sum(dim=(1, 2))
         return score
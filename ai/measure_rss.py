@@ -0,0 +1,80 @@
+"""
+Vizota AI RSS Measurement
+여러 worker 프로세스가 모델을 로드했을 때 프로세스별 메모리 사용량을 측정합니다.
+
+RSS는 공유 page cache(mmap 가중치)를 프로세스마다 중복 집계하므로,
+실제 점유량은 공유 페이지를 프로세스 수로 나눠 계산하는 PSS로 비교합니다.
+
+사용 예:
+    python measure_rss.py --processes 4               # mmap 아티팩트 사용 (있는 경우)
+    python measure_rss.py --processes 4 --no-mmap     # 프로세스별 가중치 복사본과 비교
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+from typing import Dict
+
+
+def read_memory_stats() -> Dict[str, float]:
+    """/proc/self/smaps_rollup에서 메모리 통계를 MB 단위로 읽습니다. (Linux)"""
+    stats = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == 'kB':
+                stats[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': stats.get('Rss', 0.0),
+        'pss_mb': stats.get('Pss', 0.0),
+        'shared_mb': stats.get('Shared_Clean', 0.0) + stats.get('Shared_Dirty', 0.0),
+        'private_mb': stats.get('Private_Clean', 0.0) + stats.get('Private_Dirty', 0.0),
+    }
+
+
+def _worker(use_artifacts: bool, ready, release, results) -> None:
+    import torch
+    from analyzer import Analyzer
+
+    analyzer = Analyzer(device=torch.device('cpu'), use_artifacts=use_artifacts).load().warmup()
+    ready.wait()
+    # 모든 프로세스가 로드를 마친 뒤 측정해야 공유 페이지가 올바르게 나뉨
+    results.put({'pid': os.getpid(), 'load_seconds': analyzer.load_seconds, **read_memory_stats()})
+    release.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure per-process memory of AI worker processes.")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--no-mmap", action="store_true", help="mmap 아티팩트 대신 일반 로드 사용")
+    args = parser.parse_args()
+
+    ctx = mp.get_context('spawn')
+    ready = ctx.Barrier(args.processes + 1)
+    release = ctx.Barrier(args.processes + 1)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(not args.no_mmap, ready, release, results))
+        for _ in range(args.processes)
+    ]
+    for p in processes:
+        p.start()
+
+    ready.wait()
+    rows = [results.get() for _ in processes]
+    release.wait()
+    for p in processes:
+        p.join()
+
+    summary = {
+        'mode': 'eager-copy' if args.no_mmap else 'mmap',
+        'processes': rows,
+        'total_rss_mb': sum(r['rss_mb'] for r in rows),
+        'total_pss_mb': sum(r['pss_mb'] for r in rows),
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
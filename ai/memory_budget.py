@@ -0,0 +1,184 @@
+"""
+Vizota AI Memory Budget
+큰 합성 이미지로 분석 경로 전체를 단계별로 실행하며 최대 메모리 사용량을 측정하고,
+설정한 상한을 넘으면 exit code 1을 반환합니다. 이미지 경로를 바꾸는 변경은 이 상한으로 확인합니다.
+
+단계별로 다음 값을 기록합니다.
+    - peak_rss_mb:     단계 중 최대 RSS (/proc/self/status VmHWM, 단계마다 clear_refs로 초기화)
+    - rss_delta_mb:    단계 시작 시 RSS 대비 증가량
+    - python_peak_mb:  tracemalloc으로 추적한 Python/numpy 할당 최대량 (torch 내부 할당 제외)
+
+작업당 메모리 상한(task_ceiling_mb)은 모델 로드 후 RSS 대비 가장 큰 단계 증가량이며,
+노드 RAM(--node-ram-mb)을 주면 (모델 RSS + 작업 상한) 기준으로 실행 가능한 worker 프로세스 수를 계산합니다.
+
+사용 예:
+    python memory_budget.py --megapixels 12 48 --max-task-mb 2048
+    python memory_budget.py --megapixels 48 64 --budget quality=600 --node-ram-mb 16384
+"""
+
+import os
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+import argparse
+import gc
+import json
+import logging
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+
+from analyzer import DEFAULT_CANDIDATE_LABELS, Analyzer
+from benchmark import encode_jpeg, synthetic_image
+from pipeline import decode_image
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('decode', 'preprocess', 'tag', 'quality', 'categorize', 'analyze')
+
+
+def _read_status_mb(field: str) -> float:
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def current_rss_mb() -> float:
+    return _read_status_mb('VmRSS')
+
+
+def peak_rss_mb() -> float:
+    return _read_status_mb('VmHWM')
+
+
+def reset_peak_rss() -> bool:
+    """VmHWM(최대 RSS)을 현재 RSS로 초기화합니다. (Linux 4.0+, 실패 시 False)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def measure_stage(fn: Callable[[], Any]) -> Dict[str, Any]:
+    """fn 실행 중 최대 RSS와 Python 할당 최대량을 측정합니다. 반환값은 'value'에 담습니다."""
+    gc.collect()
+    peak_reset = reset_peak_rss()
+    start_rss = current_rss_mb()
+    tracemalloc.reset_peak()
+    value = fn()
+    _, python_peak = tracemalloc.get_traced_memory()
+    peak = peak_rss_mb()
+    return {
+        'value': value,
+        'peak_rss_mb': round(peak, 1),
+        'rss_delta_mb': round(peak - start_rss, 1) if peak_reset else None,
+        'python_peak_mb': round(python_peak / 2 ** 20, 1),
+    }
+
+
+def profile_image(analyzer: Analyzer, megapixels: float, baseline_rss: float) -> Dict[str, Any]:
+    """합성 이미지 한 장으로 각 단계를 순서대로 실행하며 메모리를 측정합니다."""
+    data = encode_jpeg(synthetic_image(megapixels))
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    def record(stage: str, fn: Callable[[], Any]) -> Any:
+        result = measure_stage(fn)
+        value = result.pop('value')
+        result['task_delta_mb'] = round(result['peak_rss_mb'] - baseline_rss, 1)
+        stages[stage] = result
+        return value
+
+    image = record('decode', lambda: decode_image(data))
+    if analyzer.preprocessor is not None:
+        prepared = record('preprocess', lambda: [analyzer.preprocessor.prepare(image)])
+    else:
+        prepared = None
+        record('preprocess', lambda: analyzer.pixel_values([image]))
+    tags = record('tag', lambda: analyzer.tag([image], prepared))
+    record('quality', lambda: analyzer.score_quality([image]))
+    record('categorize', lambda: analyzer.categorize([t['tag_name'] for t in tags], DEFAULT_CANDIDATE_LABELS))
+    record('analyze', lambda: analyzer.analyze([decode_image(data)]))
+
+    return {
+        'megapixels': megapixels,
+        'shape': list(image.shape),
+        'jpeg_bytes': len(data),
+        'stages': stages,
+        'task_peak_delta_mb': max(stage['task_delta_mb'] for stage in stages.values()),
+    }
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = {}
+    for value in values:
+        stage, _, limit = value.partition('=')
+        if stage not in STAGES or not limit:
+            raise argparse.ArgumentTypeError(f"Invalid budget '{value}' (expected <stage>=<MB>, stage in {STAGES})")
+        budgets[stage] = float(limit)
+    return budgets
+
+
+def check_budgets(report: Dict[str, Any], max_task_mb: Optional[float], stage_budgets: Dict[str, float]) -> List[str]:
+    """상한을 넘은 항목 목록을 반환합니다. stage 상한은 모델 로드 후 RSS 대비 증가량(task_delta_mb) 기준입니다."""
+    violations = []
+    for entry in report['images']:
+        label = f"{entry['megapixels']} MP"
+        if max_task_mb is not None and entry['task_peak_delta_mb'] > max_task_mb:
+            violations.append(f"{label}: task peak {entry['task_peak_delta_mb']} MB > {max_task_mb} MB")
+        for stage, limit in stage_budgets.items():
+            used = entry['stages'][stage]['task_delta_mb']
+            if used > limit:
+                violations.append(f"{label}: {stage} {used} MB > {limit} MB")
+    return violations
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Measure per-stage peak memory of the analysis path on large images.")
+    parser.add_argument("--megapixels", nargs="*", type=float, default=[12, 24, 48])
+    parser.add_argument("--max-task-mb", type=float, default=2048, help="작업당 최대 메모리 증가량 (모델 로드 후 RSS 대비)")
+    parser.add_argument("--budget", nargs="*", default=[], help="단계별 상한 <stage>=<MB> (예: quality=600)")
+    parser.add_argument("--node-ram-mb", type=float, help="노드 RAM (MB), 주면 실행 가능한 worker 프로세스 수 계산")
+    parser.add_argument("--output", help="보고서를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+    stage_budgets = parse_budgets(args.budget)
+
+    tracemalloc.start()
+    analyzer = Analyzer(device=torch.device('cpu')).load().warmup()
+    gc.collect()
+    model_rss = current_rss_mb()
+    logger.info(f"RSS after model load: {model_rss:.1f} MB")
+
+    images = []
+    for megapixels in args.megapixels:
+        logger.info(f"Profiling {megapixels} MP image...")
+        images.append(profile_image(analyzer, megapixels, model_rss))
+
+    ceiling = max(entry['task_peak_delta_mb'] for entry in images) if images else 0.0
+    report: Dict[str, Any] = {
+        'model_rss_mb': round(model_rss, 1),
+        'task_ceiling_mb': ceiling,
+        'images': images,
+    }
+    if args.node_ram_mb:
+        # 프로세스마다 모델 사본 + 작업 1개 (mmap 아티팩트를 쓰면 모델 RSS 일부는 공유됨)
+        report['max_worker_processes'] = int(args.node_ram_mb // (model_rss + ceiling))
+
+    violations = check_budgets(report, args.max_task_mb, stage_budgets)
+    report['violations'] = violations
+    report['passed'] = not violations
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    return 0 if report['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Vizota AI Metrics
+AI worker / HTTP 추론 서버의 단계별 지연 시간과 처리량을 Prometheus 형식으로 노출합니다.
+
+    vizota_ai_stage_seconds{stage}       단계별 소요 시간 histogram
+        queue_wait   백엔드 전송(enqueued_at) ~ worker 작업 시작
+        download     이미지 다운로드
+        decode       디코딩 (RGB uint8)
+        preprocess   MobileViT 입력 전처리 (I/O 단계 resize/crop + 배치 변환)
+        derivatives  갤러리용 축소본 인코딩 (I/O 단계)
+        batch_wait   디코딩 완료 ~ 추론 배치 시작
+        mobilevit    MobileViT 태깅 (배치)
+        tier0        저비용 품질 추정 (배치)
+        maniqa       MANIQA 품질 평가 (배치)
+        categorizer  zero-shot 분류 (배치)
+        inference    추론 배치 전체 (추론 thread 점유 시간, autoscaler의 이미지당 처리 시간 계산에 사용)
+        derivative_upload  축소본 업로드 (presigned PUT)
+        callback     결과 전송 (백엔드 POST)
+    vizota_ai_batch_size                 추론 배치 크기 histogram
+    vizota_ai_images_total{status}       처리한 이미지 수 (ok | error)
+    vizota_ai_downloaded_bytes_total     다운로드한 이미지 바이트 수
+    vizota_ai_model_load_seconds         모델 로드/워밍업 소요 시간 gauge
+    vizota_ai_image_cache_*              로컬 이미지 캐시 조회(hit | miss), hit 바이트, 삭제 바이트, 전체 크기
+
+배치 단계(mobilevit, maniqa 등)는 배치당 한 번 기록하므로 이미지당 시간은 batch_size로 나눠 봅니다.
+Celery worker는 METRICS_PORT(기본 9100, 0이면 비활성화)에서, HTTP 추론 서버는 /metrics에서 노출합니다.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# 5ms ~ 5분 (queue_wait 포함)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    'vizota_ai_stage_seconds', 'Time spent in each analysis stage', ['stage'], buckets=LATENCY_BUCKETS
+)
+BATCH_SIZE = Histogram(
+    'vizota_ai_batch_size', 'Number of images per inference batch', buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+IMAGES = Counter('vizota_ai_images_total', 'Images processed by the pipeline', ['status'])
+DOWNLOADED_BYTES = Counter('vizota_ai_downloaded_bytes_total', 'Image bytes downloaded')
+MODEL_LOAD_SECONDS = Gauge('vizota_ai_model_load_seconds', 'Model load and warm-up time', ['phase'])
+IMAGE_CACHE_REQUESTS = Counter('vizota_ai_image_cache_requests_total', 'Local image cache lookups', ['result'])
+IMAGE_CACHE_HIT_BYTES = Counter('vizota_ai_image_cache_hit_bytes_total', 'Image bytes served from the local cache')
+IMAGE_CACHE_EVICTED_BYTES = Counter('vizota_ai_image_cache_evicted_bytes_total', 'Image bytes evicted from the local cache')
+IMAGE_CACHE_BYTES = Gauge('vizota_ai_image_cache_bytes', 'Local image cache size at the last eviction scan')
+
+_server_started = False
+
+
+def observe(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """with 블록의 소요 시간을 stage 단계로 기록합니다."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def observe_queue_wait(enqueued_at: Optional[float]) -> None:
+    """백엔드가 작업에 기록한 전송 시각(epoch 초)부터 현재까지를 queue_wait로 기록합니다."""
+    if enqueued_at is not None:
+        STAGE_SECONDS.labels('queue_wait').observe(max(0.0, time.time() - enqueued_at))
+
+
+def record_model_load(load_seconds: Optional[float], warmup_seconds: Optional[float]) -> None:
+    if load_seconds is not None:
+        MODEL_LOAD_SECONDS.labels('load').set(load_seconds)
+    if warmup_seconds is not None:
+        MODEL_LOAD_SECONDS.labels('warmup').set(warmup_seconds)
+
+
+def start_metrics_server(port: int = METRICS_PORT) -> None:
+    """metrics HTTP 서버를 프로세스당 한 번 시작합니다. port가 0이면 시작하지 않습니다."""
+    global _server_started
+    if _server_started or not port:
+        return
+    try:
+        start_http_server(port)
+        _server_started = True
+        logger.info(f"Metrics available on :{port}/metrics")
+    except OSError as e:
+        # prefork 자식 프로세스 등에서 포트가 이미 사용 중이면 metrics 없이 계속 실행
+        logger.warning(f"Could not start metrics server on port {port}: {e}")
@@ -0,0 +1,120 @@
+"""
+Vizota AI Model Artifacts
+모델 가중치를 mmap 가능한 torch 직렬화 파일로 내보내고, 메모리 매핑으로 로드합니다.
+
+mmap으로 로드한 읽기 전용 가중치는 page cache를 통해 같은 호스트의 모든 worker 프로세스가 공유하므로,
+프로세스 수가 늘어도 가중치 메모리는 한 번만 사용됩니다.
+
+아티팩트 디렉토리 구조:
+    manifest.json
+    mobilevit.pt, mobilevit/      (가중치, config + preprocessor config)
+    categorizer.pt, categorizer/  (가중치, config + tokenizer)
+    maniqa.pt                     (가중치)
+
+사용 예:
+    python model_artifacts.py --output model_artifacts
+"""
+
+import argparse
+import json
+import logging
+import os
+from contextlib import contextmanager
+from itertools import chain
+from typing import Dict
+
+import torch
+import torch.nn as nn
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_VERSION = 1
+
+
+@contextmanager
+def empty_parameters():
+    """
+    모듈 생성 중 등록되는 parameter를 meta device로 옮겨 실제 메모리를 할당하지 않도록 합니다.
+    buffer와 그 밖의 텐서 연산은 CPU에서 그대로 실행됩니다.
+    """
+    original = nn.Module.register_parameter
+
+    def register_parameter(module, name, param):
+        original(module, name, param)
+        if param is not None:
+            param_cls = type(module._parameters[name])
+            module._parameters[name] = param_cls(module._parameters[name].to('meta'), requires_grad=param.requires_grad)
+
+    nn.Module.register_parameter = register_parameter
+    try:
+        yield
+    finally:
+        nn.Module.register_parameter = original
+
+
+def save_module(module: nn.Module, path: str) -> None:
+    """모듈의 모든 parameter와 buffer(공유/비영속 포함)를 이름별로 저장합니다."""
+    tensors: Dict[str, torch.Tensor] = {}
+    for name, tensor in chain(module.named_parameters(remove_duplicate=False), module.named_buffers(remove_duplicate=False)):
+        tensors[name] = tensor.detach().cpu()
+    torch.save(tensors, path)
+
+
+def load_module(module: nn.Module, path: str) -> nn.Module:
+    """
+    저장된 텐서를 mmap으로 열어 복사 없이 모듈의 parameter/buffer로 연결합니다.
+    module은 empty_parameters()로 생성된 모델이어야 합니다.
+    """
+    tensors = torch.load(path, mmap=True, map_location='cpu', weights_only=True)
+    for name, tensor in tensors.items():
+        owner_name, _, leaf = name.rpartition('.')
+        owner = module.get_submodule(owner_name) if owner_name else module
+        if leaf in owner._parameters:
+            owner._parameters[leaf] = nn.Parameter(tensor, requires_grad=False)
+        else:
+            owner._buffers[leaf] = tensor
+
+    leftover = [name for name, t in chain(module.named_parameters(), module.named_buffers()) if t.is_meta]
+    if leftover:
+        raise RuntimeError(f"{path} is missing {len(leftover)} tensors, e.g. {leftover[:3]}")
+    return module
+
+
+def has_artifacts(artifact_dir: str) -> bool:
+    return os.path.exists(os.path.join(artifact_dir, MANIFEST_FILE))
+
+
+def export_artifacts(analyzer, artifact_dir: str) -> None:
+    """로드된 Analyzer의 세 모델을 아티팩트 디렉토리로 내보냅니다."""
+    os.makedirs(artifact_dir, exist_ok=True)
+
+    analyzer.model.config.save_pretrained(os.path.join(artifact_dir, 'mobilevit'))
+    analyzer.feature_extractor.save_pretrained(os.path.join(artifact_dir, 'mobilevit'))
+    save_module(analyzer.model, os.path.join(artifact_dir, 'mobilevit.pt'))
+
+    analyzer.classifier.model.config.save_pretrained(os.path.join(artifact_dir, 'categorizer'))
+    analyzer.classifier.tokenizer.save_pretrained(os.path.join(artifact_dir, 'categorizer'))
+    save_module(analyzer.classifier.model, os.path.join(artifact_dir, 'categorizer.pt'))
+
+    save_module(analyzer.maniqa, os.path.join(artifact_dir, 'maniqa.pt'))
+
+    with open(os.path.join(artifact_dir, MANIFEST_FILE), 'w') as f:
+        json.dump({'version': ARTIFACT_VERSION, 'models': ['mobilevit', 'categorizer', 'maniqa']}, f, indent=2)
+    logger.info(f"Model artifacts written to {artifact_dir}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    from analyzer import Analyzer, MODEL_ARTIFACT_DIR
+
+    parser = argparse.ArgumentParser(description="Export model weights as mmap-able artifacts.")
+    parser.add_argument("--output", default=MODEL_ARTIFACT_DIR, help="아티팩트 디렉토리")
+    args = parser.parse_args()
+
+    # 원본(Hub 캐시 + MANIQA 체크포인트)에서 로드한 뒤 내보냄
+    # 아티팩트는 원래 모듈 구조로 저장해야 하므로 추론 전용 변환(양자화, fused attention)은 적용하지 않음
+    analyzer = Analyzer(
+        device=torch.device('cpu'), use_artifacts=False, quantize=None, backend='eager', fused_attention=False
+    )
+    export_artifacts(analyzer.load(), args.output)
@@ -0,0 +1,163 @@
+"""
+Vizota AI Parity Check
+고정된 이미지 세트를 기준(float32) 경로와 최적화 경로로 각각 분석하고 결과 차이를 비교합니다.
+최적화 모드를 배포하기 전에 정확도 drift가 허용 범위 안에 있는지 확인하는 용도입니다.
+
+    - top-1 태그 일치율
+    - 카테고리 일치율
+    - 품질 점수 오차 (MAE, 최대 오차)
+    - feature vector cosine 유사도 (최소값)
+
+허용 범위를 벗어나면 exit code 1을 반환합니다.
+
+사용 예:
+    python parity.py ./parity_images --mode int8
+    python parity.py ./parity_images --mode torchscript
+    python parity.py ./parity_images --mode fused
+    python parity.py ./parity_images --mode cascade
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+
+from analyzer import Analyzer
+from pipeline import decode_image
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+# 기준 경로: 모든 최적화를 끈 eager float32
+REFERENCE_OPTIONS: Dict[str, Any] = {
+    'quantize': None,
+    'backend': 'eager',
+    'fused_attention': False,
+    'quality_crop_mode': 'fixed',
+    'quality_cascade': False,
+}
+
+# 비교 대상 모드: 이름 -> 기준 경로에서 바꿀 Analyzer 옵션
+MODES: Dict[str, Dict[str, Any]] = {
+    'int8': {'quantize': 'int8'},
+    'torchscript': {'backend': 'torchscript'},
+    'onnx': {'backend': 'onnx'},
+    'fused': {'fused_attention': True},
+    'adaptive': {'quality_crop_mode': 'adaptive'},
+    'five_point': {'quality_crop_mode': 'five_point'},
+    'cascade': {'quality_cascade': True},
+}
+
+
+def build_analyzer(options: Dict[str, Any]) -> Analyzer:
+    # 두 경로 모두 같은 CPU float32 가중치에서 시작하도록 아티팩트 대신 원본을 로드
+    return Analyzer(device=torch.device('cpu'), use_artifacts=False, **{**REFERENCE_OPTIONS, **options}).load()
+
+
+def load_images(image_dir: str, limit: int) -> List[np.ndarray]:
+    paths = sorted(
+        os.path.join(image_dir, name) for name in os.listdir(image_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )[:limit]
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(decode_image(f.read()))
+    return images
+
+
+def run_analyzer(analyzer, images: List[np.ndarray], batch_size: int) -> List[Dict[str, Any]]:
+    results = []
+    for start in range(0, len(images), batch_size):
+        results.extend(analyzer.analyze(images[start:start + batch_size]))
+    return results
+
+
+def compare(reference: List[Dict[str, Any]], candidate: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """두 결과 목록의 일치율과 오차를 계산합니다."""
+    n = len(reference)
+    tag_matches = sum(r['tag_name'] == c['tag_name'] for r, c in zip(reference, candidate))
+    category_matches = sum(r['category'] == c['category'] for r, c in zip(reference, candidate))
+
+    quality_errors = [
+        abs(r['quality_score'] - c['quality_score'])
+        for r, c in zip(reference, candidate)
+        if r['quality_score'] is not None and c['quality_score'] is not None
+    ]
+
+    cosines = []
+    for r, c in zip(reference, candidate):
+        a, b = np.asarray(r['feature_vector']), np.asarray(c['feature_vector'])
+        if a.size and b.size:
+            cosines.append(float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-12)))
+
+    return {
+        'images': n,
+        'tag_agreement': tag_matches / n if n else None,
+        'category_agreement': category_matches / n if n else None,
+        'quality_mae': float(np.mean(quality_errors)) if quality_errors else None,
+        'quality_max_error': float(np.max(quality_errors)) if quality_errors else None,
+        'feature_cosine_min': min(cosines) if cosines else None,
+        'mean_quality_crops': float(np.mean([c.get('quality_crops', 0) for c in candidate])) if n else None,
+        'maniqa_fraction': sum(c.get('quality_tier') == 'maniqa' for c in candidate) / n if n else None,
+    }
+
+
+def check_budget(report: Dict[str, Any], args) -> List[str]:
+    """허용 범위를 벗어난 항목 목록을 반환합니다."""
+    violations = []
+    if report['tag_agreement'] is not None and report['tag_agreement'] < args.min_tag_agreement:
+        violations.append(f"tag_agreement {report['tag_agreement']:.3f} < {args.min_tag_agreement}")
+    if report['category_agreement'] is not None and report['category_agreement'] < args.min_category_agreement:
+        violations.append(f"category_agreement {report['category_agreement']:.3f} < {args.min_category_agreement}")
+    if report['quality_mae'] is not None and report['quality_mae'] > args.max_quality_mae:
+        violations.append(f"quality_mae {report['quality_mae']:.4f} > {args.max_quality_mae}")
+    if report['quality_max_error'] is not None and report['quality_max_error'] > args.max_quality_error:
+        violations.append(f"quality_max_error {report['quality_max_error']:.4f} > {args.max_quality_error}")
+    return violations
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Compare optimized inference against the float32 reference.")
+    parser.add_argument("image_dir", help="비교에 사용할 고정 이미지 디렉토리")
+    parser.add_argument("--mode", choices=sorted(MODES), default='int8')
+    parser.add_argument("--limit", type=int, default=200, help="사용할 최대 이미지 수")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-tag-agreement", type=float, default=0.95)
+    parser.add_argument("--min-category-agreement", type=float, default=0.95)
+    parser.add_argument("--max-quality-mae", type=float, default=0.02)
+    parser.add_argument("--max-quality-error", type=float, default=0.08)
+    parser.add_argument("--output", help="보고서를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir, args.limit)
+    if not images:
+        logger.error(f"No images found in {args.image_dir}")
+        return 1
+
+    reference = run_analyzer(build_analyzer({}), images, args.batch_size)
+    candidate = run_analyzer(build_analyzer(MODES[args.mode]), images, args.batch_size)
+
+    report = {'mode': args.mode, **compare(reference, candidate)}
+    violations = check_budget(report, args)
+    report['violations'] = violations
+    report['passed'] = not violations
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    return 0 if report['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
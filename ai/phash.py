@@ -0,0 +1,62 @@
+"""
+Vizota AI Perceptual Hash
+재인코딩/리사이즈/재내보내기한 사본을 찾기 위한 64-bit dHash
+
+    1. 그레이스케일 변환 (PIL 'L', ITU-R 601-2 luma)
+    2. 32x32로 BOX 축소 후 EXIF 방향 적용 (화면에 보이는 방향 기준)
+    3. 9x8(가로 9, 세로 8)로 BOX 축소
+    4. 각 행에서 왼쪽 픽셀이 오른쪽보다 밝으면 1 → 64 bit (행 우선, 첫 bit가 최상위 bit)
+    5. 16자리 소문자 hex
+
+앱도 같은 방식으로 계산해 업로드 요청에 보낼 수 있으며, 구현 차이로 생기는 몇 bit의 차이는
+백엔드의 Hamming 거리 검색(PHASH_MAX_DISTANCE)이 흡수합니다.
+
+사용 예:
+    python phash.py photo.jpg photo_resized.webp
+"""
+
+import argparse
+import sys
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+from derivatives import apply_orientation, read_orientation
+
+
+def dhash(image: np.ndarray, orientation: int = 1) -> str:
+    """RGB uint8 (H, W, 3) 이미지의 dHash를 16자리 hex로 반환합니다."""
+    gray = Image.fromarray(image).convert('L').resize((32, 32), Image.Resampling.BOX)
+    gray = apply_orientation(gray, orientation).resize((9, 8), Image.Resampling.BOX)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, :-1] > pixels[:, 1:]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:016x}"
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
+
+def main(paths: List[str]) -> int:
+    from pipeline import decode_image
+
+    hashes = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        value = dhash(decode_image(data), read_orientation(data))
+        hashes.append(value)
+        print(f"{value}  {path}")
+    if len(hashes) > 1:
+        print(f"distance to first: {[hamming_distance(hashes[0], h) for h in hashes[1:]]}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute dHash of images.")
+    parser.add_argument("paths", nargs="+")
+    sys.exit(main(parser.parse_args().paths))
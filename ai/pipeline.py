@@ -0,0 +1,296 @@
+"""
+Vizota AI Staged Pipeline
+Worker 프로세스 안에서 다운로드/디코딩, 추론, 결과 전송 단계를 겹쳐 실행합니다.
+
+    [I/O 단계]   thread pool이 다음 K개 이미지를 미리 다운로드하고 디코딩
+    [추론 단계]  전용 thread 하나가 준비된 이미지를 배치로 모아 모델 실행
+    [전송 단계]  thread pool이 결과 콜백(백엔드 POST 등)을 비동기로 실행
+
+정상 상태의 처리량은 각 단계 소요 시간의 합이 아니라 모델 연산 시간에 의해 결정됩니다.
+"""
+
+import logging
+import mmap
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Callable, Dict, List, Optional, Union
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
+import requests
+from PIL import Image
+
+import metrics
+from analyzer import Analyzer
+from derivatives import Derivative, make_derivatives, read_orientation
+from phash import dhash
+from image_cache import get_cache
+from profiling import maybe_profile
+
+logger = logging.getLogger(__name__)
+
+# 디코딩을 허용할 최대 픽셀 수 (기본 100 MP, 0이면 제한 없음)
+# RGB uint8 디코딩 결과만 픽셀당 3바이트이므로 worker 메모리 상한(memory_budget.py)과 함께 정합니다.
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', '100000000'))
+# PIL의 decompression bomb 검사도 같은 기준을 사용
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS or None
+
+# file:// URL로 읽을 수 있는 디렉토리 (worker에서 본 백엔드 LOCAL_STORAGE_DIR 경로, 비어 있으면 file:// 거부)
+LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', '')
+
+
+class ImageLoadError(Exception):
+    """이미지를 받거나 디코딩하지 못함 (요청한 이미지의 문제, 서버 오류와 구분)"""
+
+
+@dataclass
+class AnalysisJob:
+    """파이프라인에 제출하는 분석 작업. image_url 또는 image_bytes 중 하나가 필요합니다."""
+    image_url: Optional[str] = None
+    image_bytes: Optional[bytes] = None
+    candidate_labels: Optional[List[str]] = None
+    # False이면 MANIQA 품질 평가를 생략 (지연 품질 평가 모드)
+    with_quality: bool = True
+    # True이면 태깅/분류 없이 품질 점수만 계산 ({'quality_score', 'quality_crops', 'quality_tier'})
+    quality_only: bool = False
+    image_id: Optional[str] = None
+    task_id: Optional[str] = None
+    # 디코딩 후 만들 갤러리용 축소본 [{'name', 'max_size', 'format', 'url'}] (derivatives.py)
+    derivative_specs: Optional[List[Dict[str, Any]]] = None
+    # 추론 완료 후 전송 단계에서 호출 (result, job)
+    on_result: Optional[Callable[[Dict[str, Any], "AnalysisJob"], Any]] = None
+    # 실패 시 전송 단계에서 호출 (exception, job)
+    on_error: Optional[Callable[[Exception, "AnalysisJob"], Any]] = None
+
+    image: Optional[np.ndarray] = None
+    # I/O 단계에서 미리 resize/crop한 MobileViT 입력 (Analyzer.preprocessor.prepare)
+    prepared: Optional[np.ndarray] = None
+    # 추론 대기열에 들어간 시각 (time.perf_counter, batch_wait 측정용)
+    ready_at: Optional[float] = None
+    # I/O 단계에서 인코딩한 축소본 (결과 콜백에서 업로드)
+    derivatives: Optional[List[Derivative]] = None
+    # 근접 중복 검색용 dHash (phash.py, 분석 결과의 'phash')
+    phash: Optional[str] = None
+    future: Future = field(default_factory=Future)
+
+
+def download_image(url: str, timeout: int = 30) -> bytes:
+    response = requests.get(url, verify=False, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def map_local_image(url: str) -> mmap.mmap:
+    """
+    file:// URL의 이미지를 읽기 전용 mmap으로 엽니다.
+    백엔드가 로컬 저장소(STORAGE_BACKEND=local)를 같은 파일시스템으로 공유할 때 사용하며,
+    파일을 복사하지 않고 page cache를 그대로 디코더에 넘깁니다.
+    심볼릭 링크를 따라간 실제 경로가 LOCAL_STORAGE_ROOT 아래인 파일만 엽니다.
+    """
+    if not LOCAL_STORAGE_ROOT:
+        raise ValueError("file:// URLs are disabled (LOCAL_STORAGE_ROOT is not set)")
+    root = os.path.realpath(LOCAL_STORAGE_ROOT)
+    path = os.path.realpath(unquote(urlsplit(url).path))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Local image path is outside LOCAL_STORAGE_ROOT: {path}")
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def fetch_image(url: str) -> Union[bytes, mmap.mmap]:
+    """
+    로컬 이미지 캐시(image_cache.py)에 있으면 캐시에서, 없으면 다운로드 후 캐시에 저장합니다.
+    file:// URL은 캐시와 다운로드 없이 mmap으로 반환하므로 사용 후 close()해야 합니다.
+    """
+    if url.startswith('file://'):
+        return map_local_image(url)
+    cache = get_cache()
+    data = cache.get(url)
+    if data is not None:
+        return data
+    with metrics.stage_timer('download'):
+        data = download_image(url)
+    metrics.DOWNLOADED_BYTES.inc(len(data))
+    cache.put(url, data)
+    return data
+
+
+def decode_image(data: Union[bytes, mmap.mmap]) -> np.ndarray:
+    """
+    이미지 바이트(또는 mmap)를 RGB uint8 (H, W, 3) 배열로 디코딩합니다.
+    MAX_IMAGE_PIXELS를 넘으면 디코딩 전에 거부합니다.
+    """
+    image = Image.open(data if isinstance(data, mmap.mmap) else BytesIO(data))
+    width, height = image.size
+    if MAX_IMAGE_PIXELS and width * height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Image too large: {width}x{height} exceeds MAX_IMAGE_PIXELS={MAX_IMAGE_PIXELS}")
+    return np.asarray(image.convert('RGB'))
+
+
+class StagedPipeline:
+    def __init__(
+        self,
+        analyzer: Analyzer,
+        prefetch: int = 4,
+        max_batch_size: int = 8,
+        max_batch_wait: float = 0.02,
+        post_workers: int = 2,
+    ):
+        """
+        Args:
+            analyzer: 로드된 Analyzer
+            prefetch: 추론과 동시에 미리 다운로드/디코딩할 최대 이미지 수 (K)
+            max_batch_size: 한 번의 추론 배치에 넣을 최대 이미지 수
+            max_batch_wait: 첫 이미지 이후 배치를 채우기 위해 기다리는 최대 시간 (초)
+            post_workers: 결과 콜백을 실행할 thread 수
+        """
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait = max_batch_wait
+
+        self._fetch_executor = ThreadPoolExecutor(max_workers=prefetch, thread_name_prefix='pipeline-fetch')
+        self._post_executor = ThreadPoolExecutor(max_workers=post_workers, thread_name_prefix='pipeline-post')
+        # 디코딩된 이미지는 메모리를 많이 차지하므로 대기열 크기를 prefetch로 제한
+        self._ready: "queue.Queue[AnalysisJob]" = queue.Queue(maxsize=prefetch)
+        self._stopped = threading.Event()
+        self._inference_thread = threading.Thread(target=self._inference_loop, name='pipeline-inference', daemon=True)
+        self._inference_thread.start()
+
+    def submit(self, job: AnalysisJob) -> Future:
+        """작업을 I/O 단계에 넣고, 추론 결과가 담길 Future를 반환합니다."""
+        self._fetch_executor.submit(self._fetch, job)
+        return job.future
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._stopped.set()
+        self._fetch_executor.shutdown(wait=wait)
+        if wait:
+            self._inference_thread.join()
+        self._post_executor.shutdown(wait=wait)
+
+    # I/O 단계
+    def _fetch(self, job: AnalysisJob) -> None:
+        try:
+            data = job.image_bytes if job.image_bytes is not None else fetch_image(job.image_url)
+            try:
+                with metrics.stage_timer('decode'):
+                    job.image = decode_image(data)
+                if not job.quality_only or job.derivative_specs:
+                    orientation = read_orientation(data)
+                    if not job.quality_only:
+                        job.phash = dhash(job.image, orientation)
+                    if job.derivative_specs:
+                        self._make_derivatives(job, orientation)
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+            job.image_bytes = None
+            # PIL resize는 GIL을 놓으므로 추론 thread 대신 I/O thread에서 전처리
+            if self.analyzer.preprocessor is not None and not job.quality_only:
+                with metrics.stage_timer('preprocess'):
+                    job.prepared = self.analyzer.preprocessor.prepare(job.image)
+        except Exception as e:
+            self._fail(job, ImageLoadError(f"Failed to load image: {e}"))
+            return
+        job.ready_at = time.perf_counter()
+        self._ready.put(job)
+
+    @staticmethod
+    def _make_derivatives(job: AnalysisJob, orientation: int) -> None:
+        # 축소본 실패는 분석 결과에 영향을 주지 않음 (해당 이미지는 원본으로 표시)
+        try:
+            with metrics.stage_timer('derivatives'):
+                job.derivatives = make_derivatives(job.image, job.derivative_specs, orientation)
+        except Exception as e:
+            logger.error(f"[Task {job.task_id}] Failed to create derivatives: {e}")
+
+    # 추론 단계
+    def _next_batch(self) -> List[AnalysisJob]:
+        try:
+            batch = [self._ready.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_batch_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._ready.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _inference_loop(self) -> None:
+        while not self._stopped.is_set() or not self._ready.empty():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            # 작업 종류와 후보 레이블이 같은 작업끼리 묶어서 추론
+            groups: Dict[Any, List[AnalysisJob]] = {}
+            for job in batch:
+                labels = tuple(job.candidate_labels) if job.candidate_labels is not None else None
+                groups.setdefault((job.quality_only, job.with_quality, labels), []).append(job)
+
+            started = time.perf_counter()
+            for job in batch:
+                metrics.observe('batch_wait', started - job.ready_at)
+
+            for jobs in groups.values():
+                metrics.BATCH_SIZE.observe(len(jobs))
+                try:
+                    # PROFILE_SAMPLE_RATE 비율의 배치만 torch profiler로 기록
+                    with maybe_profile('pipeline', [job.task_id for job in jobs], [job.image for job in jobs]):
+                        with metrics.stage_timer('inference'):
+                            results = self._run(jobs)
+                except Exception as e:
+                    for job in jobs:
+                        self._fail(job, e)
+                    continue
+                for job, result in zip(jobs, results):
+                    job.image = None
+                    job.prepared = None
+                    job.future.set_result(result)
+                    metrics.IMAGES.labels('ok').inc()
+                    if job.on_result is not None:
+                        self._post_executor.submit(self._run_callback, job.on_result, dict(result), job)
+
+    def _run(self, jobs: List[AnalysisJob]) -> List[Dict[str, Any]]:
+        images = [job.image for job in jobs]
+        if jobs[0].quality_only:
+            return [
+                {'quality_score': round(score, 4) if score else None, 'quality_crops': crops, 'quality_tier': tier}
+                for score, crops, tier in self.analyzer.score_quality(images)
+            ]
+        prepared = [job.prepared for job in jobs]
+        results = self.analyzer.analyze(
+            images, jobs[0].candidate_labels, with_quality=jobs[0].with_quality,
+            prepared=prepared if all(p is not None for p in prepared) else None,
+        )
+        for job, result in zip(jobs, results):
+            result['phash'] = job.phash
+        return results
+
+    # 전송 단계
+    def _fail(self, job: AnalysisJob, error: Exception) -> None:
+        job.image = None
+        job.prepared = None
+        job.derivatives = None
+        job.future.set_exception(error)
+        metrics.IMAGES.labels('error').inc()
+        if job.on_error is not None:
+            self._post_executor.submit(self._run_callback, job.on_error, error, job)
+
+    @staticmethod
+    def _run_callback(callback, value, job: AnalysisJob) -> None:
+        try:
+            with metrics.stage_timer('callback'):
+                callback(value, job)
+        except Exception as e:
+            logger.error(f"[Task {job.task_id}] Result callback failed: {e}")
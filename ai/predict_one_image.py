@@ -35,7 +35,7 @@ class Image(torch.utils.data.Dataset):
             from PIL import Image as PILImage
             self.img_name = "pil_image.jpg"
             pil_img = image_path_or_array
-            self.img = np.array(pil_img).astype('float32') / 255
+            self.img = np.asarray(pil_img.convert('RGB'))
             self.img = np.transpose(self.img, (2, 0, 1))
         
         # URL인 경우
@@ -48,12 +48,10 @@ class Image(torch.utils.data.Dataset):
                 image_bytes = np.frombuffer(response.content, np.uint8)
 
                 self.img = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)
+                if self.img is None:
+                    raise ValueError(f"Failed to decode image: {image_path_or_array}")
                 self.img = cv2.cvtColor(self.img, cv2.COLOR_BGR2RGB)
-                self.img = np.array(self.img).astype('float32') / 255
                 self.img = np.transpose(self.img, (2, 0, 1))
-                
-                if self.img is None:
-                    raise
             except requests.exceptions.RequestException as e:
                 raise
         
@@ -62,9 +60,9 @@ class Image(torch.utils.data.Dataset):
             self.img_name = image_path_or_array.split('/')[-1]
             self.img = cv2.imread(image_path_or_array, cv2.IMREAD_COLOR)
             self.img = cv2.cvtColor(self.img, cv2.COLOR_BGR2RGB)
-            self.img = np.array(self.img).astype('float32') / 255
             self.img = np.transpose(self.img, (2, 0, 1))
 
+        # 원본은 uint8로 두고 crop만 float32로 변환 (48 MP 이미지의 전체 float32 사본은 약 580MB)
         self.transform = transform
 
         c, h, w = self.img.shape
@@ -76,7 +74,7 @@ class Image(torch.utils.data.Dataset):
         for i in range(num_crops):
                 top = np.random.randint(0, h - new_h)
                 left = np.random.randint(0, w - new_w)
-                patch = self.img[:, top: top + new_h, left: left + new_w]
+                patch = self.img[:, top: top + new_h, left: left + new_w].astype('float32') / 255
                 self.img_patches.append(patch)
             
         self.img_patches = np.array(self.img_patches)
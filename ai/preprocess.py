@@ -0,0 +1,110 @@
+"""
+Vizota AI MobileViT Preprocessing
+MobileViTFeatureExtractor와 같은 결과를 내는 배치 전처리
+
+    prepare(): 이미지별 shortest-edge resize(PIL, uint8) + center crop  → I/O 단계 thread에서 실행 가능
+    collate(): uint8 crop 배치를 한 번에 텐서로 변환, rescale(1/255), RGB→BGR
+
+resize는 feature extractor와 같은 PIL resample로 수행해 출력이 bit 단위로 동일하며,
+rescale/채널 변환은 배치 텐서 연산 한 번으로 처리합니다. 같은 디코딩 결과(RGB uint8)를 MANIQA crop과 공유합니다.
+
+사용 예 (feature extractor와 출력 비교):
+    python preprocess.py ./parity_images
+"""
+
+import argparse
+import logging
+import sys
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def _size_pair(size) -> Tuple[int, int]:
+    if isinstance(size, dict):
+        return size['height'], size['width']
+    if isinstance(size, int):
+        return size, size
+    return tuple(size)
+
+
+class MobileViTPreprocessor:
+    def __init__(self, feature_extractor):
+        """feature extractor(preprocessor config)의 크기/보간/rescale 설정을 그대로 사용합니다."""
+        size = feature_extractor.size
+        self.do_resize = feature_extractor.do_resize
+        self.shortest_edge = size['shortest_edge'] if isinstance(size, dict) else size
+        self.resample = Image.Resampling(int(feature_extractor.resample))
+        self.do_center_crop = feature_extractor.do_center_crop
+        self.crop_height, self.crop_width = _size_pair(feature_extractor.crop_size)
+        self.do_rescale = feature_extractor.do_rescale
+        self.rescale_factor = feature_extractor.rescale_factor
+        self.do_flip_channel_order = getattr(feature_extractor, 'do_flip_channel_order', True)
+
+    def output_size(self, height: int, width: int) -> Tuple[int, int]:
+        """transformers get_resize_output_image_size(default_to_square=False)와 같은 (height, width)"""
+        short, long = (width, height) if width <= height else (height, width)
+        new_short, new_long = self.shortest_edge, int(self.shortest_edge * long / short)
+        return (new_long, new_short) if width <= height else (new_short, new_long)
+
+    def prepare(self, image: np.ndarray) -> np.ndarray:
+        """RGB uint8 (H, W, 3) 이미지를 resize + center crop 한 uint8 배열로 반환합니다."""
+        if self.do_resize:
+            height, width = self.output_size(*image.shape[:2])
+            image = np.asarray(Image.fromarray(image).resize((width, height), resample=self.resample))
+        if self.do_center_crop:
+            h, w = image.shape[:2]
+            top = (h - self.crop_height) // 2
+            left = (w - self.crop_width) // 2
+            image = image[top:top + self.crop_height, left:left + self.crop_width]
+        return image
+
+    def collate(self, prepared: List[np.ndarray]) -> torch.Tensor:
+        """prepare() 결과 배치를 (N, 3, H, W) float32 텐서로 변환합니다."""
+        batch = torch.from_numpy(np.stack(prepared)).permute(0, 3, 1, 2)
+        if self.do_flip_channel_order:
+            batch = batch.flip(1)  # RGB -> BGR
+        if self.do_rescale:
+            # feature extractor와 같이 float64로 rescale한 뒤 float32로 변환
+            return (batch.double() * self.rescale_factor).float()
+        return batch.float()
+
+    def __call__(self, images: List[np.ndarray]) -> torch.Tensor:
+        return self.collate([self.prepare(image) for image in images])
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    from analyzer import Analyzer
+    from parity import load_images
+
+    parser = argparse.ArgumentParser(description="Compare batched preprocessing with MobileViTFeatureExtractor.")
+    parser.add_argument("image_dir", help="비교에 사용할 이미지 디렉토리")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir, args.limit)
+    if not images:
+        logger.error(f"No images found in {args.image_dir}")
+        return 1
+
+    analyzer = Analyzer(device=torch.device('cpu')).load()
+    preprocessor = MobileViTPreprocessor(analyzer.feature_extractor)
+    mismatched = 0
+    for i, image in enumerate(images):
+        expected = analyzer.feature_extractor(images=[image], return_tensors="pt")['pixel_values']
+        actual = preprocessor([image])
+        error = (expected - actual).abs().max().item() if expected.shape == actual.shape else float('inf')
+        if error > 0:
+            mismatched += 1
+            logger.warning(f"Image {i} {image.shape}: max abs error {error}")
+    logger.info(f"{len(images) - mismatched}/{len(images)} images identical")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
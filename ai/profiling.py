@@ -0,0 +1,104 @@
+"""
+Vizota AI Sampled Profiling
+운영 중인 worker에서 일부 추론 배치만 torch profiler로 기록합니다. (재배포 없이 환경 변수로 활성화)
+
+    - PROFILE_SAMPLE_RATE 비율의 배치를 operator 단위 CPU 시간/메모리와 함께 기록
+    - PROFILE_DIR에 Chrome trace(.json, chrome://tracing 또는 Perfetto)와 operator 요약(.txt) 저장
+    - 최신 PROFILE_MAX_FILES개 trace만 유지
+    - trace에 task id와 이미지 크기를 메타데이터로 기록
+
+한 프로세스에서 동시에 하나의 profiler만 실행되므로, 다른 배치를 기록 중이면 샘플링하지 않습니다.
+"""
+
+import glob
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+import numpy as np
+import torch
+from torch.profiler import ProfilerActivity, profile
+
+logger = logging.getLogger(__name__)
+
+# 기록할 배치 비율 (0이면 비활성화, 1이면 모든 배치)
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '20'))
+# True이면 operator 입력 shape도 기록 (trace 크기 증가)
+PROFILE_RECORD_SHAPES = os.getenv('PROFILE_RECORD_SHAPES', 'false').lower() == 'true'
+
+_profile_lock = threading.Lock()
+
+
+def _should_sample(sample_rate: float) -> bool:
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+def _rotate(directory: str, max_files: int) -> None:
+    """오래된 trace와 요약 파일을 지워 최신 max_files개만 남깁니다."""
+    traces = sorted(glob.glob(os.path.join(directory, '*.json')), key=os.path.getmtime, reverse=True)
+    for path in traces[max_files:]:
+        for stale in (path, path[:-len('.json')] + '.txt'):
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+
+@contextmanager
+def maybe_profile(
+    name: str,
+    task_ids: Sequence[Optional[str]] = (),
+    images: Sequence[np.ndarray] = (),
+    sample_rate: Optional[float] = None,
+):
+    """
+    샘플링된 경우 with 블록을 torch profiler로 감싸 trace를 저장합니다.
+
+    Args:
+        name: trace 파일 이름 접두사 (예: 'pipeline', 'bulk')
+        task_ids: 배치에 포함된 작업의 task id
+        images: 배치의 RGB uint8 이미지 (크기만 기록)
+        sample_rate: 기록 비율 (None이면 PROFILE_SAMPLE_RATE)
+    """
+    rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if not _should_sample(rate) or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+
+    activities = [ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(ProfilerActivity.CUDA)
+    try:
+        with profile(activities=activities, profile_memory=True, record_shapes=PROFILE_RECORD_SHAPES) as prof:
+            yield
+        _export(prof, name, [str(task_id) for task_id in task_ids if task_id], [image.shape[:2] for image in images])
+    finally:
+        _profile_lock.release()
+
+
+def _export(prof, name: str, task_ids: List[str], sizes: List[tuple]) -> None:
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stem = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{task_ids[0] if task_ids else os.getpid()}"
+        base = os.path.join(PROFILE_DIR, stem)
+
+        prof.add_metadata_json('task_ids', json.dumps(task_ids))
+        prof.add_metadata_json('image_sizes', json.dumps([[int(h), int(w)] for h, w in sizes]))
+        prof.export_chrome_trace(base + '.json')
+
+        sort_by = 'self_cuda_time_total' if torch.cuda.is_available() else 'self_cpu_time_total'
+        with open(base + '.txt', 'w') as f:
+            f.write(f"task_ids: {task_ids}\nimage_sizes: {sizes}\n\n")
+            f.write(prof.key_averages().table(sort_by=sort_by, row_limit=40))
+
+        _rotate(PROFILE_DIR, PROFILE_MAX_FILES)
+        logger.info(f"Saved profiler trace {base}.json ({len(sizes)} images)")
+    except Exception as e:
+        logger.warning(f"Failed to save profiler trace: {e}")
@@ -0,0 +1,110 @@
+"""
+Vizota AI Quality Cascade Calibration
+샘플 이미지 세트에서 tier-0 추정치와 MANIQA 점수를 비교해 cascade 설정을 정하기 위한 보고서를 만듭니다.
+
+    - raw 추정치와 MANIQA 점수의 상관 (Pearson, Spearman)
+    - MANIQA 점수에 대한 선형 보정 계수 제안 (QUALITY_TIER0_SLOPE / QUALITY_TIER0_INTERCEPT)
+    - 후보 구간 [LOW, HIGH]별 MANIQA 생략 비율과, 생략된 이미지의 보정 점수 오차 (MAE, 최대 오차)
+    - 현재 설정(QUALITY_CASCADE_LOW / HIGH)의 결과
+
+사용 예:
+    python quality_calibration.py ./calibration_images --output calibration.json
+"""
+
+import argparse
+import json
+import logging
+import sys
+from typing import Any, Dict, List
+
+import numpy as np
+import torch
+
+import quality_cascade
+from analyzer import Analyzer
+from parity import load_images
+
+logger = logging.getLogger(__name__)
+
+# 보고서에 포함할 후보 구간
+CANDIDATE_BANDS = [(0.1, 0.9), (0.2, 0.8), (0.25, 0.75), (0.3, 0.7), (0.4, 0.6)]
+
+
+def _rank(values: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values)] = np.arange(len(values))
+    return ranks
+
+
+def evaluate_band(raw: np.ndarray, maniqa: np.ndarray, low: float, high: float, slope: float, intercept: float) -> Dict[str, Any]:
+    """구간 밖(MANIQA 생략) 이미지의 비율과 보정 점수 오차를 계산합니다."""
+    skipped = (raw <= low) | (raw >= high)
+    errors = np.abs(np.clip(slope * raw[skipped] + intercept, 0, 1) - maniqa[skipped])
+    return {
+        'low': low,
+        'high': high,
+        'maniqa_skipped_fraction': float(skipped.mean()),
+        'tier0_mae': float(errors.mean()) if errors.size else None,
+        'tier0_max_error': float(errors.max()) if errors.size else None,
+    }
+
+
+def build_report(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    raw = np.array([row['raw'] for row in rows])
+    maniqa = np.array([row['maniqa'] for row in rows])
+
+    slope, intercept = np.polyfit(raw, maniqa, 1) if len(rows) > 1 else (quality_cascade.QUALITY_TIER0_SLOPE, 0.0)
+    configured = (quality_cascade.QUALITY_TIER0_SLOPE, quality_cascade.QUALITY_TIER0_INTERCEPT)
+    return {
+        'images': len(rows),
+        'pearson': float(np.corrcoef(raw, maniqa)[0, 1]) if len(rows) > 1 else None,
+        'spearman': float(np.corrcoef(_rank(raw), _rank(maniqa))[0, 1]) if len(rows) > 1 else None,
+        'suggested_slope': float(slope),
+        'suggested_intercept': float(intercept),
+        'current': evaluate_band(
+            raw, maniqa, quality_cascade.QUALITY_CASCADE_LOW, quality_cascade.QUALITY_CASCADE_HIGH, *configured
+        ),
+        'bands': [evaluate_band(raw, maniqa, low, high, slope, intercept) for low, high in CANDIDATE_BANDS],
+    }
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Compare tier-0 quality estimates with MANIQA scores.")
+    parser.add_argument("image_dir", help="보정에 사용할 샘플 이미지 디렉토리")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--output", help="보고서를 저장할 JSON 파일 경로")
+    parser.add_argument("--rows", help="이미지별 신호와 점수를 저장할 JSONL 파일 경로")
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir, args.limit)
+    if not images:
+        logger.error(f"No images found in {args.image_dir}")
+        return 1
+
+    # MANIQA는 기본(fixed) crop 방식의 점수를 기준으로 사용
+    analyzer = Analyzer(device=torch.device('cpu'), quality_crop_mode='fixed', quality_cascade=False).load()
+    rows = []
+    for start in range(0, len(images), args.batch_size):
+        batch = images[start:start + args.batch_size]
+        for image, (score, _) in zip(batch, analyzer.score_maniqa(batch)):
+            if score is None:
+                continue
+            rows.append({**quality_cascade.estimate(image), 'maniqa': score})
+
+    report = build_report(rows)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    if args.rows:
+        with open(args.rows, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Vizota AI Quality Cascade
+MANIQA 앞단에서 저비용 신호로 품질을 먼저 추정하는 tier-0 평가기
+
+축소한 grayscale 이미지에서 다음 신호를 vectorized 연산으로 계산합니다.
+    - sharpness: Laplacian 분산 (흐림/모션 블러)
+    - clipping:  히스토그램 양 끝(암부/명부)에 몰린 픽셀 비율 (노출)
+    - noise:     Immerkær 방식의 노이즈 표준편차 추정
+
+신호를 0-1 추정치(raw)로 합친 뒤, 명백히 좋거나 나쁜 이미지(raw가 LOW 이하 또는 HIGH 이상)는
+보정식(slope * raw + intercept)으로 점수를 매기고, 애매한 구간의 이미지만 MANIQA로 평가합니다.
+구간과 보정 계수는 quality_calibration.py 보고서로 정합니다.
+"""
+
+import os
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+import cv2
+import numpy as np
+
+# True이면 tier-0 추정이 애매한 이미지만 MANIQA로 평가
+QUALITY_CASCADE = os.getenv('QUALITY_CASCADE', 'false').lower() == 'true'
+# raw 추정치의 애매한 구간 [LOW, HIGH] - 이 구간의 이미지만 MANIQA 실행
+QUALITY_CASCADE_LOW = float(os.getenv('QUALITY_CASCADE_LOW', '0.2'))
+QUALITY_CASCADE_HIGH = float(os.getenv('QUALITY_CASCADE_HIGH', '0.8'))
+# raw 추정치를 MANIQA 점수 척도로 옮기는 선형 보정 계수
+QUALITY_TIER0_SLOPE = float(os.getenv('QUALITY_TIER0_SLOPE', '0.6'))
+QUALITY_TIER0_INTERCEPT = float(os.getenv('QUALITY_TIER0_INTERCEPT', '0.15'))
+
+# 신호 계산용 축소 크기 (긴 변)
+SIGNAL_MAX_SIDE = 512
+# sharpness 정규화: log10(1 + Laplacian 분산)이 이 값이면 1
+SHARPNESS_LOG_SCALE = 3.0
+# 노출 정규화: 클리핑 비율이 이 값 이상이면 0
+CLIPPING_LIMIT = 0.5
+# 노이즈 정규화: 표준편차가 이 값 이상이면 최대 감점
+NOISE_LIMIT = 20.0
+
+TIER_CHEAP = 'tier0'
+TIER_MANIQA = 'maniqa'
+
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+
+@dataclass
+class QualitySignals:
+    sharpness: float
+    clipped_dark: float
+    clipped_bright: float
+    brightness: float
+    noise: float
+
+
+def compute_signals(image: np.ndarray) -> QualitySignals:
+    """RGB uint8 (H, W, 3) 이미지의 저비용 품질 신호를 계산합니다."""
+    h, w = image.shape[:2]
+    scale = SIGNAL_MAX_SIDE / max(h, w)
+    if scale < 1:
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+    sharpness = cv2.Laplacian(gray, cv2.CV_32F).var()
+
+    histogram = np.bincount(gray.ravel(), minlength=256) / gray.size
+    clipped_dark = histogram[:8].sum()
+    clipped_bright = histogram[248:].sum()
+
+    # Immerkær (1996) fast noise variance estimation
+    gh, gw = gray.shape
+    residual = np.abs(cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL))[1:-1, 1:-1]
+    noise = np.sqrt(np.pi / 2) * residual.sum() / (6 * max(1, gh - 2) * max(1, gw - 2))
+
+    return QualitySignals(
+        sharpness=float(sharpness),
+        clipped_dark=float(clipped_dark),
+        clipped_bright=float(clipped_bright),
+        brightness=float(gray.mean() / 255),
+        noise=float(noise),
+    )
+
+
+def raw_estimate(signals: QualitySignals) -> float:
+    """신호를 0(명백히 나쁨) ~ 1(명백히 좋음) 추정치로 합칩니다."""
+    sharpness = np.clip(np.log10(1 + signals.sharpness) / SHARPNESS_LOG_SCALE, 0, 1)
+    exposure = 1 - np.clip((signals.clipped_dark + signals.clipped_bright) / CLIPPING_LIMIT, 0, 1)
+    noise_penalty = np.clip(signals.noise / NOISE_LIMIT, 0, 1)
+    return float(sharpness * exposure * (1 - 0.5 * noise_penalty))
+
+
+def calibrated_score(raw: float) -> float:
+    """raw 추정치를 MANIQA 점수 척도(0-1)로 변환합니다."""
+    return float(np.clip(QUALITY_TIER0_SLOPE * raw + QUALITY_TIER0_INTERCEPT, 0, 1))
+
+
+def is_ambiguous(raw: float) -> bool:
+    return QUALITY_CASCADE_LOW < raw < QUALITY_CASCADE_HIGH
+
+
+def estimate(image: np.ndarray) -> Dict[str, float]:
+    """tier-0 평가 결과 (신호, raw 추정치, 보정 점수, MANIQA 필요 여부)를 반환합니다."""
+    signals = compute_signals(image)
+    raw = raw_estimate(signals)
+    return {**asdict(signals), 'raw': raw, 'score': calibrated_score(raw), 'ambiguous': is_ambiguous(raw)}
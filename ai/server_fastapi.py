@@ -0,0 +1,246 @@
+"""
+Vizota AI HTTP Inference Server
+Celery 큐를 거치지 않고 HTTP로 바로 이미지를 분석하는 저지연 추론 서버
+(사용자가 기다리는 태깅 요청, Redis와 분리된 모델 부하 테스트 용도)
+
+모델은 프로세스 시작 시 한 번 로드하고 워밍업하며, 동시에 들어온 요청은
+StagedPipeline이 최대 배치 크기 또는 대기 시간까지 모아 한 번에 추론합니다.
+"""
+
+import os
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile, status
+from prometheus_client import make_asgi_app
+from pydantic import BaseModel
+
+import metrics
+from analyzer import Analyzer
+from pipeline import AnalysisJob, ImageLoadError, StagedPipeline
+
+# 환경 변수 로드
+from dotenv import load_dotenv
+load_dotenv()
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 서버 설정 (환경 변수로 설정 가능)
+HTTP_HOST = os.getenv('HTTP_HOST', '0.0.0.0')
+HTTP_PORT = int(os.getenv('HTTP_PORT', '8001'))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv('REQUEST_TIMEOUT_SECONDS', '60'))
+MAX_BATCH_ITEMS = int(os.getenv('MAX_BATCH_ITEMS', '32'))  # /analyze/batch 한 요청의 최대 이미지 수
+
+# 요청 배치 설정 - 지연 시간이 중요하므로 worker보다 대기 시간을 짧게 둠
+PIPELINE_PREFETCH = int(os.getenv('PIPELINE_PREFETCH', '8'))
+PIPELINE_MAX_BATCH = int(os.getenv('PIPELINE_MAX_BATCH', '8'))
+PIPELINE_BATCH_WAIT_MS = float(os.getenv('PIPELINE_BATCH_WAIT_MS', '10'))
+
+
+class AnalysisResponse(BaseModel):
+    tag_name: str
+    probability: float
+    category: str
+    category_probability: Optional[float] = None
+    quality_score: Optional[float] = None
+    quality_crops: int = 0
+    quality_tier: Optional[str] = None
+    feature_vector: List[float]
+
+
+class BatchItemResponse(BaseModel):
+    index: int
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+
+class BatchAnalysisResponse(BaseModel):
+    results: List[BatchItemResponse]
+
+
+class ModelState:
+    """로드 상태와 분석 파이프라인을 보관합니다."""
+
+    def __init__(self):
+        self.analyzer: Optional[Analyzer] = None
+        self.pipeline: Optional[StagedPipeline] = None
+        self.error: Optional[str] = None
+        # 종료 후 로드가 끝나면 파이프라인을 바로 닫도록 close()와 load()의 파이프라인 설정을 직렬화
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def ready(self) -> bool:
+        return self.pipeline is not None and self.analyzer.warmup_seconds is not None
+
+    def load(self) -> None:
+        try:
+            self.analyzer = Analyzer().load().warmup()
+            metrics.record_model_load(self.analyzer.load_seconds, self.analyzer.warmup_seconds)
+            with self._lock:
+                if self._closed:
+                    logger.info("Server shut down while loading models, discarding pipeline")
+                    return
+                self.pipeline = StagedPipeline(
+                    self.analyzer,
+                    prefetch=PIPELINE_PREFETCH,
+                    max_batch_size=PIPELINE_MAX_BATCH,
+                    max_batch_wait=PIPELINE_BATCH_WAIT_MS / 1000,
+                    post_workers=1,
+                )
+            logger.info(
+                f"Inference server ready on {self.analyzer.device} "
+                f"(model_load_seconds={self.analyzer.load_seconds:.2f}, model_warmup_seconds={self.analyzer.warmup_seconds:.2f})"
+            )
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Error loading models: {e}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self.pipeline is not None:
+                self.pipeline.shutdown(wait=False)
+
+
+state = ModelState()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 로드 중에도 /health가 응답하도록 모델 로드는 별도 thread에서 실행
+    load_task = asyncio.create_task(asyncio.to_thread(state.load))
+    yield
+    # 로드 중에 종료하면 기다리지 않음 (로드 thread는 끝나는 대로 결과를 버림)
+    load_task.cancel()
+    state.close()
+
+
+app = FastAPI(title="Vizota AI Inference", lifespan=lifespan)
+# 단계별 지연 시간/처리량 (metrics.py)
+app.mount("/metrics", make_asgi_app())
+
+
+def _require_ready() -> StagedPipeline:
+    if not state.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=state.error or "Models are still loading"
+        )
+    return state.pipeline
+
+
+def _require_http_urls(urls: List[str]) -> None:
+    """요청으로 받은 이미지 URL은 http(s)만 허용합니다. (file:// 등으로 서버의 파일을 읽지 못하도록)"""
+    for url in urls:
+        if urlsplit(url).scheme.lower() not in ('http', 'https'):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unsupported image URL: {url}")
+
+
+async def _analyze(pipeline: StagedPipeline, job: AnalysisJob) -> dict:
+    return await asyncio.wait_for(asyncio.wrap_future(pipeline.submit(job)), timeout=REQUEST_TIMEOUT_SECONDS)
+
+
+@app.get("/health")
+async def health():
+    """프로세스 생존 여부와 모델 로드/워밍업 상태를 반환합니다."""
+    analyzer = state.analyzer
+    return {
+        "status": "ok",
+        "ready": state.ready,
+        "device": str(analyzer.device) if analyzer else None,
+        "model_load_seconds": analyzer.load_seconds if analyzer else None,
+        "model_warmup_seconds": analyzer.warmup_seconds if analyzer else None,
+        "error": state.error,
+    }
+
+
+@app.get("/ready")
+async def ready():
+    """모델 로드와 워밍업이 끝났을 때만 200을 반환합니다. (readiness probe)"""
+    _require_ready()
+    return {"status": "ready"}
+
+
+@app.post("/analyze", response_model=AnalysisResponse)
+async def analyze(
+    file: Optional[UploadFile] = File(None),
+    image_url: Optional[str] = Form(None),
+    candidate_labels: Optional[List[str]] = Form(None),
+):
+    """
+    이미지 한 장을 분석합니다. 업로드 파일(file) 또는 이미지 URL(image_url) 중 하나를 받습니다.
+    """
+    pipeline = _require_ready()
+    if (file is None) == (image_url is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Provide exactly one of file or image_url")
+    if image_url is not None:
+        _require_http_urls([image_url])
+
+    job = AnalysisJob(
+        image_url=image_url,
+        image_bytes=await file.read() if file is not None else None,
+        candidate_labels=candidate_labels,
+    )
+    try:
+        return await _analyze(pipeline, job)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Analysis timed out")
+    except ImageLoadError as e:
+        # 받거나 디코딩할 수 없는 이미지만 요청 오류
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except Exception as e:
+        logger.exception("Analysis failed")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@app.post("/analyze/batch", response_model=BatchAnalysisResponse)
+async def analyze_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    image_urls: Optional[List[str]] = Form(None),
+    candidate_labels: Optional[List[str]] = Form(None),
+):
+    """
+    여러 이미지를 분석합니다. 업로드 파일(files)과 URL(image_urls)을 함께 받을 수 있으며,
+    결과는 files 다음 image_urls 순서의 index로 반환됩니다. 개별 이미지 실패는 error로 표시합니다.
+    """
+    pipeline = _require_ready()
+    files = files or []
+    image_urls = image_urls or []
+    if not files and not image_urls:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No images provided")
+    if len(files) + len(image_urls) > MAX_BATCH_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {MAX_BATCH_ITEMS} images per request"
+        )
+    _require_http_urls(image_urls)
+
+    jobs = [AnalysisJob(image_bytes=await f.read(), candidate_labels=candidate_labels) for f in files]
+    jobs += [AnalysisJob(image_url=url, candidate_labels=candidate_labels) for url in image_urls]
+
+    outcomes = await asyncio.gather(*(_analyze(pipeline, job) for job in jobs), return_exceptions=True)
+
+    results = []
+    for index, outcome in enumerate(outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            results.append(BatchItemResponse(index=index, error="Analysis timed out"))
+        elif isinstance(outcome, Exception):
+            results.append(BatchItemResponse(index=index, error=str(outcome)))
+        else:
+            results.append(BatchItemResponse(index=index, result=outcome))
+    return BatchAnalysisResponse(results=results)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # 모델 사본이 프로세스마다 생기므로 단일 프로세스로 실행하고, 동시성은 내부 배치로 처리
+    uvicorn.run(app, host=HTTP_HOST, port=HTTP_PORT)
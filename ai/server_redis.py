@@ -8,19 +8,17 @@ import os
 os.environ["TF_USE_LEGACY_KERAS"] = "1"
 import logging
 import requests
-import json
+import threading
 
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
+from celery.worker.control import control_command
 from typing import List, Optional, Dict, Any
 
-import torch
-from PIL import Image
-# PIL의 decompression bomb 보호 기능 비활성화 (대용량 이미지 처리 허용)
-Image.MAX_IMAGE_PIXELS = None
-from transformers import MobileViTFeatureExtractor, MobileViTForImageClassification, pipeline
-from PIL import Image
-
-import predict_one_image
+import metrics
+from analyzer import DEFAULT_CANDIDATE_LABELS, Analyzer
+from derivatives import upload_derivatives
+from pipeline import AnalysisJob, StagedPipeline
 
 # 환경 변수 로드
 from dotenv import load_dotenv
@@ -53,86 +51,93 @@ app.conf.update(
     task_track_started=True,
     task_time_limit=300,  # 5분 타임아웃
     worker_prefetch_multiplier=1,
-    worker_max_tasks_per_child=50,
+    # 모델 로드 비용이 크므로 기본적으로 자식 프로세스를 재시작하지 않음 (필요 시 환경 변수로 설정)
+    worker_max_tasks_per_child=int(os.getenv('WORKER_MAX_TASKS_PER_CHILD', '0')) or None,
     broker_connection_retry_on_startup=True,
 )
 
-# 디바이스 설정
-if torch.cuda.is_available():
-    device = torch.device('cuda')
-    device_id = 0
-elif torch.backends.mps.is_available():
-    device = torch.device('mps')
-    device_id = 0
-else:
-    device = torch.device('cpu')
-    device_id = -1
-
-logger.info(f"Using device: {device}")
-
-# 전역 변수 - 모델
-feature_extractor = None
-model = None
-classifier = None
-feature_maps = {}
-target_layer_name = 'dropout'
+# 전역 변수 - 모델 및 파이프라인
+analyzer = None
+analysis_pipeline = None
+
+# 파이프라인 설정 (환경 변수로 설정 가능)
+PIPELINE_PREFETCH = int(os.getenv('PIPELINE_PREFETCH', '4'))  # 추론 중 미리 다운로드/디코딩할 이미지 수
+PIPELINE_MAX_BATCH = int(os.getenv('PIPELINE_MAX_BATCH', '8'))  # 추론 배치 최대 크기
+PIPELINE_BATCH_WAIT_MS = float(os.getenv('PIPELINE_BATCH_WAIT_MS', '20'))  # 배치를 채우기 위한 최대 대기 시간
+PIPELINE_POST_WORKERS = int(os.getenv('PIPELINE_POST_WORKERS', '2'))  # 결과 전송 thread 수
 
 # 백엔드 API 설정 (환경변수로 설정 가능)
 BACKEND_API_URL = os.getenv('BACKEND_API_URL', 'http://localhost:8000/api/images/{image_id}/analysis-results')
+QUALITY_RESULTS_URL = os.getenv('QUALITY_RESULTS_URL', 'http://localhost:8000/api/images/quality-scores/bulk')
 
 
-# Feature map hook
-def get_features(name):
-    def hook(model, input, output):
-        if isinstance(output, tuple):
-            feature_maps[name] = output[0].detach()
-        else:
-            feature_maps[name] = output.detach()
-    return hook
+_load_lock = threading.Lock()
 
 
 # 모델 초기화 함수
 def load_models():
-    """Worker 시작 시 모델을 로드합니다."""
-    global feature_extractor, model, classifier
+    """Worker 시작 시 모델을 로드하고 분석 파이프라인을 시작합니다."""
+    global analyzer, analysis_pipeline
 
     logger.info("🚀 Loading AI models...")
 
     try:
-        # MobileViT 모델 로드
-        feature_extractor = MobileViTFeatureExtractor.from_pretrained("apple/mobilevit-small")
-        model = MobileViTForImageClassification.from_pretrained("apple/mobilevit-small")
-        model.eval()
-        model.to(device)
-
-        # Feature extraction hook 설정
-        try:
-            target_layer = dict(model.named_modules())[target_layer_name]
-            target_layer.register_forward_hook(get_features(target_layer_name))
-            logger.info("✅ Feature Vector 추출 설정 완료")
-        except KeyError:
-            logger.warning("⚠️ Feature Vector 추출 설정 실패")
-
-        # Zero-shot classification 모델 로드
-        classifier = pipeline(
-            "zero-shot-classification",
-            model="facebook/bart-large-mnli",
-            device=device_id
+        analyzer = Analyzer().load().warmup()
+        metrics.record_model_load(analyzer.load_seconds, analyzer.warmup_seconds)
+        analysis_pipeline = StagedPipeline(
+            analyzer,
+            prefetch=PIPELINE_PREFETCH,
+            max_batch_size=PIPELINE_MAX_BATCH,
+            max_batch_wait=PIPELINE_BATCH_WAIT_MS / 1000,
+            post_workers=PIPELINE_POST_WORKERS,
+        )
+        metrics.start_metrics_server()
+        logger.info(
+            f"Worker ready on {analyzer.device} "
+            f"(model_load_seconds={analyzer.load_seconds:.2f}, model_warmup_seconds={analyzer.warmup_seconds:.2f})"
         )
-
-        logger.info(f"All models loaded successfully on {device}")
 
     except Exception as e:
         logger.error(f"Error loading models: {e}")
         raise
 
 
+def get_pipeline() -> StagedPipeline:
+    """분석 파이프라인을 반환합니다. threads pool에서 동시에 호출되므로 한 번만 로드합니다."""
+    with _load_lock:
+        if analysis_pipeline is None:
+            logger.info("Models not loaded. Loading now...")
+            load_models()
+    return analysis_pipeline
+
+
 # Celery Worker 시작 시 모델 로드
-@app.task(bind=True)
-def worker_init(self):
-    """Worker 초기화 시 모델을 로드합니다."""
-    load_models()
-    return "Models loaded successfully"
+@worker_process_init.connect
+def load_models_on_process_init(**kwargs):
+    """prefork pool: 각 자식 프로세스가 작업을 받기 전에 모델을 로드하고 워밍업합니다."""
+    get_pipeline()
+
+
+@worker_init.connect
+def load_models_on_worker_init(sender=None, **kwargs):
+    """solo/threads pool: 작업을 처리할 worker 프로세스에서 바로 모델을 로드하고 워밍업합니다."""
+    pool_cls = getattr(sender, 'pool_cls', None)
+    pool_name = pool_cls if isinstance(pool_cls, str) else getattr(pool_cls, '__module__', '')
+    if 'prefork' in str(pool_name):
+        # prefork는 부모가 아닌 자식 프로세스에서 로드 (worker_process_init)
+        return
+    get_pipeline()
+
+
+# autoscaler.py가 보내는 원격 명령: 파이프라인 최대 배치 크기 변경
+@control_command(args=[('max_batch_size', int)], signature='<max_batch_size>')
+def set_pipeline_batch(state, max_batch_size):
+    """실행 중인 파이프라인의 최대 배치 크기를 바꿉니다. 모델이 아직 로드되지 않았으면 무시합니다."""
+    if analysis_pipeline is None:
+        return {'ok': False, 'error': 'pipeline not loaded'}
+    analysis_pipeline.max_batch_size = max(1, int(max_batch_size))
+    logger.info(f"Pipeline max batch size set to {analysis_pipeline.max_batch_size}")
+    return {'ok': True, 'max_batch_size': analysis_pipeline.max_batch_size}
 
 
 # 백엔드로 결과 전송
@@ -161,21 +166,16 @@ def send_result_to_backend(result_data: Dict[str, Any], task_id: str = None, ima
             # image_id가 없으면 기본 URL 사용
             api_url = BACKEND_API_URL.replace('/{image_id}', '')
 
-        logger.info(f"📤 Sending result to backend: {api_url}")
-        logger.info(f"📊 Analysis Result Summary:")
-        logger.info(f"   • Tag: {result_data.get('tag_name', 'N/A')} (probability: {result_data.get('probability', 0):.2f}%)")
-        
-        # category_probability가 None일 수 있으므로 안전하게 처리
-        category_prob = result_data.get('category_probability')
-        category_prob_str = f"{category_prob:.2f}%" if category_prob is not None else "N/A"
-        logger.info(f"   • Category: {result_data.get('category', 'N/A')} (probability: {category_prob_str})")
-        
-        quality_score = result_data.get('quality_score')
-        quality_str = f"{quality_score:.4f}" if quality_score is not None else "N/A"
-        logger.info(f"   • Quality Score: {quality_str}")
-        
-        logger.info(f"   • Feature Vector size: {len(result_data.get('feature_vector', []))}")
-        logger.debug(f"🔍 Full result data: {json.dumps(result_data, indent=2)}")
+        # 작업마다 실행되는 경로이므로 요약 로그는 DEBUG에서만 만듦 (단계별 시간은 metrics.py)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"Sending result to {api_url}: tag={result_data.get('tag_name')} "
+                f"probability={result_data.get('probability')} category={result_data.get('category')} "
+                f"category_probability={result_data.get('category_probability')} "
+                f"quality_score={result_data.get('quality_score')} quality_tier={result_data.get('quality_tier')} "
+                f"quality_crops={result_data.get('quality_crops')} "
+                f"feature_vector_size={len(result_data.get('feature_vector', []))}"
+            )
 
         response = requests.post(
             api_url,
@@ -185,8 +185,7 @@ def send_result_to_backend(result_data: Dict[str, Any], task_id: str = None, ima
         )
 
         response.raise_for_status()
-        logger.info(f"✅ Result sent successfully. Response: {response.status_code}")
-        logger.info(f"📥 Backend response: {response.text[:200]}{'...' if len(response.text) > 200 else ''}")
+        logger.debug(f"Result sent to backend: {response.status_code}")
         return True
 
     except requests.exceptions.RequestException as e:
@@ -194,23 +193,59 @@ def send_result_to_backend(result_data: Dict[str, Any], task_id: str = None, ima
         return False
 
 
+# 실패 결과 (ImageAnalysisResult 스키마 형식)
+def build_error_result(error: Exception) -> Dict[str, Any]:
+    return {
+        'tag_name': 'error',
+        'probability': 0.0,
+        'category': 'Unknown',
+        'category_probability': None,
+        'quality_score': None,
+        'quality_crops': 0,
+        'quality_tier': None,
+        'feature_vector': [],
+        'error': str(error)
+    }
+
+
+def _post_result(result: Dict[str, Any], job: AnalysisJob) -> None:
+    if job.derivatives:
+        with metrics.stage_timer('derivative_upload'):
+            result['derivatives'] = upload_derivatives(job.derivatives)
+        job.derivatives = None
+    send_result_to_backend(result, task_id=job.task_id, image_id=job.image_id)
+
+
+def _post_error(error: Exception, job: AnalysisJob) -> None:
+    logger.error(f"[Task {job.task_id}] Error analyzing image: {error}")
+    send_result_to_backend(build_error_result(error), task_id=job.task_id, image_id=job.image_id)
+
+
 # 이미지 분석 Celery Task
 @app.task(bind=True, name='app.tasks.analyze_image_task')
 def analyze_image_task(
     self,
     image_url: str,
-    candidate_labels: Optional[List[str]] = ['Landscape', 'Animal', 'City', 'People', 'Food'],
+    candidate_labels: Optional[List[str]] = DEFAULT_CANDIDATE_LABELS,
     image_id: Optional[str] = None,
-    user_id: Optional[str] = None
+    user_id: Optional[str] = None,
+    with_quality: bool = True,
+    enqueued_at: Optional[float] = None,
+    derivatives: Optional[List[Dict[str, Any]]] = None
 ) -> Dict[str, Any]:
     """
     Redis 큐로부터 이미지 분석 작업을 수신하고 처리합니다.
+    작업은 worker 내부의 단계별 파이프라인에 제출되며, 다운로드/디코딩은 다른 작업의 추론과 겹쳐 실행되고
+    백엔드로의 결과 전송은 비동기로 이루어집니다. (--pool=threads 로 실행)
 
     Args:
         image_url: 분석할 이미지의 S3 URL
         candidate_labels: (선택) 계층적 분류를 위한 후보 레이블 목록
         image_id: (선택) 이미지 식별자
         user_id: (선택) 사용자 식별자
+        with_quality: (선택) False이면 품질 평가 생략 (백엔드 지연 품질 평가 모드)
+        enqueued_at: (선택) 백엔드가 작업을 전송한 시각 (epoch 초, queue_wait metric)
+        derivatives: (선택) 만들어 업로드할 축소본 [{'name', 'max_size', 'format', 'url'}] (derivatives.py)
 
     Returns:
         Dict: 분석 결과
@@ -219,128 +254,84 @@ def analyze_image_task(
             - category: 추천 상위 태그
             - category_probability: 추천 태그 확률 (%)
             - quality_score: 이미지 품질 점수 (0-1)
+            - quality_crops: 품질 평가에 사용한 crop 수
+            - quality_tier: 품질 점수를 만든 단계 (tier0 | maniqa)
             - feature_vector: 추출된 feature vector (1x640, list type)
+            - phash: 근접 중복 검색용 64-bit dHash (16자리 hex, phash.py)
+        백엔드로 전송하는 결과에는 업로드한 축소본 크기 derivatives({name: {'width', 'height', 'size'}})가 추가됩니다.
     """
-    try:
-        # 모델이 로드되지 않았다면 로드
-        if model is None or classifier is None:
-            logger.info("Models not loaded. Loading now...")
-            load_models()
+    pipeline = get_pipeline()
+
+    logger.debug(f"[Task {self.request.id}] Analyzing image: {image_url} (image_id={image_id}, user_id={user_id})")
+
+    # 큐 메시지 하나당 한 번 기록
+    metrics.observe_queue_wait(enqueued_at)
+    job = AnalysisJob(
+        image_url=image_url,
+        candidate_labels=candidate_labels,
+        with_quality=with_quality,
+        image_id=image_id,
+        task_id=self.request.id,
+        derivative_specs=derivatives,
+        on_result=_post_result,
+        on_error=_post_error,
+    )
+    # 추론이 끝나면 반환하고, 백엔드 전송은 파이프라인의 전송 단계에서 처리
+    result = pipeline.submit(job).result(timeout=app.conf.task_time_limit)
+
+    logger.debug(f"[Task {self.request.id}] Analysis complete: {result['tag_name']} ({result['probability']:.2f}%)")
+    return result
+
+
+# 지연 품질 평가 Celery Task
+@app.task(bind=True, name='app.tasks.score_quality_task')
+def score_quality_task(self, items: List[Dict[str, Any]], enqueued_at: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    백엔드가 필요한 이미지(유사 그룹 구성원 등)에 대해서만 요청한 품질 평가를 배치로 처리하고,
+    결과를 한 번의 요청으로 백엔드(QUALITY_RESULTS_URL)에 전송합니다.
 
-        logger.info(f"[Task {self.request.id}] Analyzing image: {image_url}")
-        if image_id:
-            logger.info(f"Image ID: {image_id}")
-        if user_id:
-            logger.info(f"User ID: {user_id}")
+    Args:
+        items: [{'image_id': ..., 'image_url': ...}, ...]
+        enqueued_at: (선택) 백엔드가 작업을 전송한 시각 (epoch 초, queue_wait metric)
+
+    Returns:
+        List[Dict]: 이미지별 {'image_id', 'quality_score', 'quality_crops', 'quality_tier', 'error'}
+    """
+    pipeline = get_pipeline()
+    logger.info(f"[Task {self.request.id}] Scoring quality for {len(items)} images")
+
+    # 여러 이미지를 담은 메시지도 queue_wait는 한 번만 기록 (이미지 수만큼 세면 autoscaler가 보는 분포가 왜곡됨)
+    metrics.observe_queue_wait(enqueued_at)
+    jobs = [
+        AnalysisJob(
+            image_url=item['image_url'], image_id=item['image_id'], task_id=self.request.id,
+            quality_only=True,
+        )
+        for item in items
+    ]
+    futures = [pipeline.submit(job) for job in jobs]
 
-        # 이미지 다운로드
+    results = []
+    for job, future in zip(jobs, futures):
         try:
-            response = requests.get(image_url, verify=False, timeout=30)
-            response.raise_for_status()
-            from io import BytesIO
-            image = Image.open(BytesIO(response.content)).convert('RGB')
-            logger.info(f"✅ Image downloaded successfully: {len(response.content)} bytes")
+            result = future.result(timeout=app.conf.task_time_limit)
+            results.append({'image_id': job.image_id, **result, 'error': None})
         except Exception as e:
-            error_msg = f"Failed to load image: {str(e)}"
-            logger.error(error_msg)
-            raise Exception(error_msg)
-
-        # 이미지 전처리 및 태깅
-        inputs = feature_extractor(images=image, return_tensors="pt").to(device)
-
-        with torch.no_grad():
-            # 태그 예측
-            outputs = model(**inputs)
-            logits = outputs.logits
-
-            # 품질 점수 계산
-            try:
-                quality_score = predict_one_image.main(image)
-                if torch.is_tensor(quality_score):
-                    quality_score = quality_score.item()
-            except Exception as e:
-                logger.warning(f"Quality score calculation failed: {e}")
-                quality_score = None
-
-        # Top prediction 추출 (K값 변경을 통해 추천 태그 개수 변경 가능)
-        top_probability, top_class_index = torch.topk(logits.softmax(dim=1) * 100, k=1)
-
-        class_name = model.config.id2label[top_class_index[0][0].item()]
-        # comma로 구분된 경우 첫 번째 태그만 추출
-        class_name = class_name.split(',')[0].strip()
-        probability = top_probability[0][0].item()
-
-        # Feature vector 추출
-        feature_vector = None
-        if target_layer_name in feature_maps:
-            extracted_features = feature_maps[target_layer_name]
-            feature_vector = extracted_features.cpu().numpy().tolist()
-            logger.info(f"Feature vector size: {extracted_features.size()}")
-
-        # 계층적 분류
-        recommended_high_tag = None
-        recommended_high_tag_prob = None
-
-        if candidate_labels and len(candidate_labels) > 0:
-            try:
-                hierar = classifier(class_name, candidate_labels, multi_label=True)
-                recommended_high_tag = hierar['labels'][0]
-                recommended_high_tag_prob = hierar['scores'][0] * 100
-                logger.info(f"Recommended tag: {recommended_high_tag} ({recommended_high_tag_prob:.2f}%)")
-            except Exception as e:
-                logger.warning(f"Hierarchical classification failed: {e}")
-
-        # 백엔드 API 형식에 맞춰 결과 생성 (ImageAnalysisResult 스키마)
-        result = {
-            'tag_name': class_name,
-            'probability': round(probability, 2),  # 태그 예측 확률 (%)
-            'category': recommended_high_tag if recommended_high_tag else 'Unknown',
-            'category_probability': round(recommended_high_tag_prob, 2) if recommended_high_tag_prob else None,
-            'quality_score': round(quality_score, 4) if quality_score else None,
-            'feature_vector': feature_vector[0] if feature_vector else []  # 첫 번째 배치의 임베딩
-        }
-
-        # 추가 메타데이터 (로깅용)
-        result_metadata = {
-            'probability_percent': round(probability, 2),
-            'category_probability': round(recommended_high_tag_prob, 2) if recommended_high_tag_prob else None,
-            'quality_score': round(quality_score, 4) if quality_score else None,
-            'image_url': image_url,
-        }
-
-        if image_id:
-            result_metadata['image_id'] = image_id
-        if user_id:
-            result_metadata['user_id'] = user_id
-
-        logger.info(f"[Task {self.request.id}] Analysis complete: {class_name} ({probability:.2f}%)")
+            logger.error(f"[Task {self.request.id}] Quality scoring failed for image {job.image_id}: {e}")
+            results.append({
+                'image_id': job.image_id, 'quality_score': None, 'quality_crops': 0, 'quality_tier': None, 'error': str(e)
+            })
 
-        # 백엔드로 결과 전송
-        send_success = send_result_to_backend(result, task_id=self.request.id, image_id=image_id)
-        result['sent_to_backend'] = send_success
-
-        return result
-
-    except Exception as e:
-        logger.error(f"[Task {self.request.id}] Error analyzing image: {e}")
-
-        # 에러 정보를 백엔드로 전송 (ImageAnalysisResult 스키마 형식)
-        error_result = {
-            'tag_name': 'error',
-            'probability': 0.0,
-            'category': 'Unknown',
-            'category_probability': None,
-            'quality_score': None,
-            'feature_vector': []
-        }
-
-        send_result_to_backend(error_result, task_id=self.request.id, image_id=image_id)
-
-        raise
+    try:
+        response = requests.post(QUALITY_RESULTS_URL, json={'results': results}, timeout=30)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"[Task {self.request.id}] Failed to send quality scores to backend: {e}")
+    return results
 
 
 if __name__ == "__main__":
     # Worker 실행 방법:
-    # celery -A server worker --loglevel=info --concurrency=1
+    # celery -A server_redis worker --loglevel=info --pool=threads --concurrency=4
     logger.info("Starting Vizota AI Celery Worker...")
-    logger.info("Run with: celery -A server worker --loglevel=info --concurrency=1")
+    logger.info("Run with: celery -A server_redis worker --loglevel=info --pool=threads --concurrency=4")
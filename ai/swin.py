@@ -3,7 +3,6 @@ import torch.nn as nn
 import torch.nn.functional as F
 import torch.utils.checkpoint as checkpoint
 from timm.models.layers import DropPath, to_2tuple, trunc_normal_
-from einops import rearrange
 
 class Mlp(nn.Module):
     def __init__(self, in_features, hidden_features=None, out_features=None, act_layer=nn.GELU, drop=0.):
@@ -50,7 +49,8 @@ def window_reverse(windows, window_size, H, W):
     Returns:
         x: (B, H, W, C)
     """
-    B = int(windows.shape[0] / (H * W / window_size / window_size))
+    # 정수 나눗셈으로 계산해야 trace/export 시 배치 크기가 상수로 고정되지 않음
+    B = windows.shape[0] // ((H // window_size) * (W // window_size))
     x = windows.view(B, H // window_size, W // window_size, window_size, window_size, -1)
     x = x.permute(0, 1, 3, 2, 4, 5).contiguous().view(B, H, W, -1)
     return x
@@ -104,12 +104,37 @@ class WindowAttention(nn.Module):
         trunc_normal_(self.relative_position_bias_table, std=.02)
         self.softmax = nn.Softmax(dim=-1)
 
+        # 추론용: relative position bias (+ shift mask)를 미리 계산해 둔 attention bias
+        self.register_buffer("frozen_bias", None, persistent=False)
+
+    def relative_position_bias(self):
+        relative_position_bias = self.relative_position_bias_table[self.relative_position_index.view(-1)].view(
+            self.window_size[0] * self.window_size[1], self.window_size[0] * self.window_size[1], -1)  # Wh*Ww,Wh*Ww,nH
+        return relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
+
+    @torch.no_grad()
+    def freeze(self, mask=None):
+        """
+        eval 모드에서 상수인 relative position bias와 shift mask를 합쳐 한 번만 계산합니다.
+        이후 forward는 fused scaled-dot-product attention 경로를 사용합니다.
+
+        Args:
+            mask: 이 attention을 호출하는 block의 (0/-inf) mask (num_windows, Wh*Ww, Wh*Ww) 또는 None
+        """
+        bias = self.relative_position_bias().unsqueeze(0)  # 1, nH, N, N
+        if mask is not None:
+            bias = bias + mask.unsqueeze(1)  # nW, nH, N, N
+        self.frozen_bias = bias
+
     def forward(self, x, mask=None):
         """
         Args:
             x: input features with shape of (num_windows*B, N, C)
             mask: (0/-inf) mask with shape of (num_windows, Wh*Ww, Wh*Ww) or None
         """
+        if self.frozen_bias is not None and not self.training:
+            return self.forward_fused(x)
+
         B_, N, C = x.shape
         qkv = self.qkv(x).reshape(B_, N, 3, self.num_heads, C // self.num_heads).permute(2, 0, 3, 1, 4)
         q, k, v = qkv[0], qkv[1], qkv[2]  # make torchscript happy (cannot use tensor as tuple)
@@ -117,9 +142,7 @@ class WindowAttention(nn.Module):
         q = q * self.scale
         attn = (q @ k.transpose(-2, -1))
 
-        relative_position_bias = self.relative_position_bias_table[self.relative_position_index.view(-1)].view(
-            self.window_size[0] * self.window_size[1], self.window_size[0] * self.window_size[1], -1)  # Wh*Ww,Wh*Ww,nH
-        relative_position_bias = relative_position_bias.permute(2, 0, 1).contiguous()  # nH, Wh*Ww, Wh*Ww
+        relative_position_bias = self.relative_position_bias()
         attn = attn + relative_position_bias.unsqueeze(0)
 
         if mask is not None:
@@ -137,6 +160,19 @@ class WindowAttention(nn.Module):
         x = self.proj_drop(x)
         return x
 
+    def forward_fused(self, x):
+        """freeze()된 bias로 scaled_dot_product_attention을 실행합니다. (eval 전용, mask는 bias에 포함됨)"""
+        B_, N, C = x.shape
+        nW = self.frozen_bias.shape[0]
+        qkv = self.qkv(x).reshape(B_ // nW, nW, N, 3, self.num_heads, C // self.num_heads).permute(3, 0, 1, 4, 2, 5)
+        q, k, v = qkv[0], qkv[1], qkv[2]  # B, nW, nH, N, head_dim
+
+        x = F.scaled_dot_product_attention(q, k, v, attn_mask=self.frozen_bias, scale=self.scale)
+        x = x.transpose(2, 3).reshape(B_, N, C)
+        x = self.proj(x)
+        x = self.proj_drop(x)
+        return x
+
     def extra_repr(self) -> str:
         return f'dim={self.dim}, window_size={self.window_size}, num_heads={self.num_heads}'
 
@@ -263,6 +299,9 @@ class SwinBlock(nn.Module):
 
         return x
 
+    def prepare_for_inference(self):
+        self.attn.freeze(self.attn_mask)
+
     def extra_repr(self) -> str:
         return f"dim={self.dim}, input_resolution={self.input_resolution}, num_heads={self.num_heads}, " \
                f"window_size={self.window_size}, shift_size={self.shift_size}, mlp_ratio={self.mlp_ratio}"
@@ -337,9 +376,9 @@ class BasicLayer(nn.Module):
                 x = checkpoint.checkpoint(blk, x)
             else:
                 x = blk(x)
-        x = rearrange(x, 'b (h w) c -> b c h w', h=self.input_resolution[0], w=self.input_resolution[1])
+        x = x.transpose(1, 2).unflatten(2, self.input_resolution)  # b (h w) c -> b c h w
         x = F.relu(self.conv(x))
-        x = rearrange(x, 'b c h w -> b (h w) c')
+        x = x.flatten(2).transpose(1, 2)  # b c h w -> b (h w) c
         return x
 
     def extra_repr(self) -> str:
@@ -395,10 +434,10 @@ class SwinTransformer(nn.Module):
 
     def forward(self, x):
         x = self.dropout(x)
-        x = rearrange(x, 'b c h w -> b (h w) c')
+        x = x.flatten(2).transpose(1, 2)  # b c h w -> b (h w) c
         for layer in self.layers:
             _x = x
             x = layer(x)
             x = self.scale * x + _x
-        x = rearrange(x, 'b (h w) c -> b c h w', h=self.patches_resolution[0], w=self.patches_resolution[1])
+        x = x.transpose(1, 2).unflatten(2, self.patches_resolution)  # b (h w) c -> b c h w
         return x
\ No newline at end of file
@@ -1,10 +1,25 @@
 # app/aws.py
-import boto3
 from config.config import settings
 
-session = boto3.Session(profile_name=settings.AWS_PROFILE)
-s3_client = session.client("s3", region_name=settings.AWS_REGION)
+s3_client = None
+
 
 def get_s3_client():
     """FastAPI Dependency to get a boto3 S3 client."""
+    # 로컬 저장소(STORAGE_BACKEND=local)로 실행할 때는 AWS 프로필 없이도 import 되도록 처음 사용할 때 생성
+    global s3_client
+    if s3_client is None:
+        import boto3
+        from botocore.config import Config
+        session = boto3.Session(profile_name=settings.AWS_PROFILE or None)
+        if settings.S3_ENDPOINT_URL:
+            # MinIO 등 S3 호환 저장소 (로컬 테스트): virtual-host 대신 path-style 주소 사용
+            s3_client = session.client(
+                "s3",
+                region_name=settings.AWS_REGION,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+            )
+        else:
+            s3_client = session.client("s3", region_name=settings.AWS_REGION)
     return s3_client
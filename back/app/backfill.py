@@ -0,0 +1,141 @@
+# app/backfill.py
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.image import AIProcessingStatus
+from app.repositories.ai_processing_queue import AIProcessingQueueRepository
+from app.services.analysis import AnalysisService
+from config.config import settings
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STALE_STATUSES = [AIProcessingStatus.PENDING, AIProcessingStatus.PROCESSING, AIProcessingStatus.FAILED]
+
+
+def backfill_stale_analyses(
+    statuses: Optional[List[AIProcessingStatus]] = None,
+    stale_after_minutes: int = settings.BACKFILL_STALE_AFTER_MINUTES,
+    batch_size: int = settings.BACKFILL_BATCH_SIZE,
+    rate_per_second: float = settings.BACKFILL_RATE_PER_SECOND,
+    max_attempts: int = settings.BACKFILL_MAX_ATTEMPTS,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+) -> int:
+    """
+    분석이 완료되지 않은 이미지(PENDING/PROCESSING/FAILED)를 찾아 AI 분석 작업을 다시 전송합니다.
+    이미지 ID 기준 keyset 페이지네이션으로 청크 단위 조회하며, 초당 전송 수를 제한합니다.
+    This function is intended to be run as a cron job.
+
+    Returns:
+        int: 재전송한 작업 수
+    """
+    statuses = statuses or STALE_STATUSES
+    logger.info(f"Starting job: backfill stale AI analyses (statuses={[s.value for s in statuses]}).")
+    db: Session = SessionLocal()
+    repository = AIProcessingQueueRepository(db)
+    service = AnalysisService(repository)
+
+    interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=stale_after_minutes)
+    last_id = 0
+    dispatched = 0
+
+    try:
+        while limit is None or dispatched < limit:
+            chunk = repository.find_stale_images(
+                statuses, cutoff, after_id=last_id, limit=batch_size, max_attempts=max_attempts
+            )
+            if not chunk:
+                break
+
+            for image in chunk:
+                if limit is not None and dispatched >= limit:
+                    break
+                last_id = image.id
+                if dry_run:
+                    logger.info(f"[dry-run] Would re-enqueue image {image.id} ({image.ai_processing_status.value})")
+                    dispatched += 1
+                    continue
+
+                started = time.monotonic()
+                try:
+                    payload = service.dispatch(image)
+                    if payload is None:
+                        logger.error("Dispatch is not possible in this configuration. Aborting job.")
+                        db.rollback()
+                        return dispatched
+                    # 상태를 커밋한 뒤 전송 (전송이 실패하면 다음 백필에서 다시 대상이 됨)
+                    db.commit()
+                    service.send(payload)
+                    dispatched += 1
+                except Exception as e:
+                    logger.error(f"Failed to re-enqueue image {image.id}: {e}")
+                    db.rollback()
+
+                # 초당 전송 수 제한
+                elapsed = time.monotonic() - started
+                if interval > elapsed:
+                    time.sleep(interval - elapsed)
+
+            logger.info(f"Backfill progress: {dispatched} re-enqueued, last image ID {last_id}.")
+    finally:
+        db.close()
+        logger.info(f"Finished job: backfill stale AI analyses ({dispatched} re-enqueued).")
+
+    return dispatched
+
+
+def report_latency(since_hours: Optional[float] = None) -> dict:
+    """업로드부터 분석 완료까지의 지연 시간 백분위수를 출력합니다."""
+    db: Session = SessionLocal()
+    try:
+        since = datetime.now(timezone.utc) - timedelta(hours=since_hours) if since_hours else None
+        stats = AnalysisService(AIProcessingQueueRepository(db)).get_latency_stats(since=since)
+    finally:
+        db.close()
+
+    logger.info(f"Completed analyses: {stats['count']}")
+    for name in ("upload_to_analyzed", "dispatch_to_analyzed"):
+        values = ", ".join(
+            f"p{int(p * 100)}={v:.2f}s" if v is not None else f"p{int(p * 100)}=N/A"
+            for p, v in stats[name].items()
+        )
+        logger.info(f"{name}: {values}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-enqueue stale AI analyses and report pipeline latency.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="stale 이미지를 다시 분석 큐에 넣습니다.")
+    run_parser.add_argument("--status", action="append", choices=[s.value for s in STALE_STATUSES])
+    run_parser.add_argument("--stale-after-minutes", type=int, default=settings.BACKFILL_STALE_AFTER_MINUTES)
+    run_parser.add_argument("--batch-size", type=int, default=settings.BACKFILL_BATCH_SIZE)
+    run_parser.add_argument("--rate", type=float, default=settings.BACKFILL_RATE_PER_SECOND)
+    run_parser.add_argument("--max-attempts", type=int, default=settings.BACKFILL_MAX_ATTEMPTS)
+    run_parser.add_argument("--limit", type=int, default=None)
+    run_parser.add_argument("--dry-run", action="store_true")
+
+    latency_parser = subparsers.add_parser("latency", help="업로드-분석 완료 지연 시간 백분위수를 출력합니다.")
+    latency_parser.add_argument("--since-hours", type=float, default=None)
+
+    args = parser.parse_args()
+    if args.command == "latency":
+        report_latency(since_hours=args.since_hours)
+    else:
+        backfill_stale_analyses(
+            statuses=[AIProcessingStatus(s) for s in args.status] if getattr(args, "status", None) else None,
+            stale_after_minutes=getattr(args, "stale_after_minutes", settings.BACKFILL_STALE_AFTER_MINUTES),
+            batch_size=getattr(args, "batch_size", settings.BACKFILL_BATCH_SIZE),
+            rate_per_second=getattr(args, "rate", settings.BACKFILL_RATE_PER_SECOND),
+            max_attempts=getattr(args, "max_attempts", settings.BACKFILL_MAX_ATTEMPTS),
+            limit=getattr(args, "limit", None),
+            dry_run=getattr(args, "dry_run", False),
+        )
@@ -1,12 +1,14 @@
 # app/cron.py
 import logging
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from botocore.exceptions import ClientError
+import redis
 
 from app.database import SessionLocal
 from app.models.image import Image
-from app.aws import get_s3_client
+from app.hash_filter import get_hash_filter
+from app.storage import MultipartStorage, StorageError, derivative_keys, get_storage
 from config.config import settings
 
 logging.basicConfig(level=logging.INFO)
@@ -19,11 +21,11 @@ def permanently_delete_old_trashed_images():
     """
     logger.info("Starting job: permanently delete old trashed images.")
     db: Session = SessionLocal()
-    s3_client = get_s3_client()
     
-    if not settings.S3_BUCKET_NAME:
+    if settings.STORAGE_BACKEND == "s3" and not settings.S3_BUCKET_NAME:
         logger.error("S3_BUCKET_NAME is not configured. Aborting job.")
         return
+    storage = get_storage()
 
     try:
         cutoff_date = datetime.now(timezone.utc) - timedelta(days=30)
@@ -39,29 +41,95 @@ def permanently_delete_old_trashed_images():
 
         logger.info(f"Found {len(old_trashed_images)} old trashed images to delete.")
 
+        # 1. Delete from storage (원본 + 축소본, S3는 delete_objects로 1000개씩 묶어서 삭제)
+        keys = [key for image in old_trashed_images for key in [image.url] + derivative_keys(image)]
+        failed_keys = set(storage.delete_many(keys))
+
+        deleted_per_user = Counter()
         for image in old_trashed_images:
-            logger.info(f"Processing image ID: {image.id}, URL: {image.url}")
+            if failed_keys.intersection([image.url] + derivative_keys(image)):
+                # 저장소 삭제 실패일 경우 DB에서 삭제하지 않음
+                logger.error(f"Skipping image {image.id}: could not delete {image.url} from storage.")
+                continue
             try:
-                # 1. Delete from S3
-                s3_client.delete_object(Bucket=settings.S3_BUCKET_NAME, Key=image.url)
-                logger.info(f"Successfully deleted image {image.id} from S3.")
-
                 # 2. Delete from DB
                 db.delete(image)
                 db.commit()
-                logger.info(f"Successfully deleted image {image.id} from database.")
-
-            except ClientError as e:
-                logger.error(f"Error deleting image {image.id} from S3: {e}")
-                # S3 삭제 실패일 경우 DB에서 삭제하지 않음
-                db.rollback()
+                deleted_per_user[image.user_id] += 1
+                logger.info(f"Successfully deleted image {image.id} from storage and database.")
             except Exception as e:
                 logger.error(f"An unexpected error occurred while processing image {image.id}: {e}")
                 db.rollback()
 
+        # 3. 사용자별 hash filter에 삭제 수 기록 (일정 비율을 넘으면 다음 조회 때 다시 생성)
+        try:
+            hash_filter = get_hash_filter()
+            for user_id, count in deleted_per_user.items():
+                hash_filter.record_deletions(user_id, count)
+        except redis.RedisError as e:
+            logger.warning(f"Could not update hash filters: {e}")
+
     finally:
         db.close()
         logger.info("Finished job: permanently delete old trashed images.")
 
+def abort_abandoned_multipart_uploads():
+    """
+    Aborts multipart uploads that were not completed within MULTIPART_ABANDONED_AFTER_HOURS.
+    업로드된 조각은 저장소 요금이 계속 나가므로 취소하고, 업로드가 끝나지 않은 이미지 레코드도 삭제합니다.
+    """
+    logger.info("Starting job: abort abandoned multipart uploads.")
+    storage = get_storage()
+    if not isinstance(storage, MultipartStorage):
+        logger.info("Configured storage does not support multipart uploads. Skipping job.")
+        return
+
+    db: Session = SessionLocal()
+    cutoff_date = datetime.now(timezone.utc) - timedelta(hours=settings.MULTIPART_ABANDONED_AFTER_HOURS)
+    try:
+        # 1. DB에 기록된 미완료 업로드
+        abandoned_images = db.query(Image).filter(
+            Image.multipart_upload_id.isnot(None),
+            Image.uploaded_at < cutoff_date
+        ).all()
+        aborted = set()
+        for image in abandoned_images:
+            try:
+                storage.abort_multipart(image.url, image.multipart_upload_id)
+                aborted.add(image.multipart_upload_id)
+                db.delete(image)
+                db.commit()
+                logger.info(f"Aborted multipart upload for image {image.id}.")
+            except StorageError as e:
+                logger.error(f"Error aborting multipart upload for image {image.id}: {e}")
+                db.rollback()
+
+        # 2. DB 레코드 없이 남은 업로드 (레코드 생성 전 실패 등)
+        try:
+            orphans = [
+                (key, upload_id) for key, upload_id in storage.list_multipart(cutoff_date)
+                if upload_id not in aborted
+            ]
+        except StorageError as e:
+            logger.error(f"Error listing multipart uploads: {e}")
+            orphans = []
+        known = {
+            row.multipart_upload_id for row in db.query(Image.multipart_upload_id).filter(
+                Image.multipart_upload_id.in_([upload_id for _, upload_id in orphans])
+            )
+        } if orphans else set()
+        for key, upload_id in orphans:
+            if upload_id in known:
+                continue
+            try:
+                storage.abort_multipart(key, upload_id)
+                logger.info(f"Aborted orphaned multipart upload {key}.")
+            except StorageError as e:
+                logger.error(f"Error aborting orphaned multipart upload {key}: {e}")
+    finally:
+        db.close()
+        logger.info("Finished job: abort abandoned multipart uploads.")
+
 if __name__ == "__main__":
     permanently_delete_old_trashed_images()
+    abort_abandoned_multipart_uploads()
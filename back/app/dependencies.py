@@ -10,12 +10,14 @@ from app.repositories.tag import TagRepository
 from app.repositories.category import CategoryRepository
 from app.repositories.similar_group_repository import SimilarGroupRepository
 from app.repositories.album import AlbumRepository
+from app.repositories.ai_processing_queue import AIProcessingQueueRepository
 from app.services.image import ImageService
 from app.services.user import UserService
 from app.services.tag import TagService
 from app.services.category import CategoryService
 from app.services.similar_group_service import SimilarGroupService
 from app.services.album import AlbumService
+from app.services.analysis import AnalysisService
 from app.schemas.token import TokenData
 from config.config import settings
 from app.security import ALGORITHM
@@ -34,12 +36,21 @@ def get_tag_repository(db: Session = Depends(get_db)) -> TagRepository:
 def get_album_repository(db: Session = Depends(get_db)) -> AlbumRepository:
     return AlbumRepository(db)
 
+def get_ai_processing_queue_repository(db: Session = Depends(get_db)) -> AIProcessingQueueRepository:
+    return AIProcessingQueueRepository(db)
+
+def get_analysis_service(
+    queue_repository: AIProcessingQueueRepository = Depends(get_ai_processing_queue_repository),
+) -> AnalysisService:
+    return AnalysisService(queue_repository)
+
 def get_image_service(
     image_repository: ImageRepository = Depends(get_image_repository),
     category_repository: CategoryRepository = Depends(get_category_repository),
     tag_repository: TagRepository = Depends(get_tag_repository),
+    analysis_service: AnalysisService = Depends(get_analysis_service),
 ) -> ImageService:
-    return ImageService(image_repository, category_repository, tag_repository)
+    return ImageService(image_repository, category_repository, tag_repository, analysis_service)
 
 
 def get_user_repository(db: Session = Depends(get_db)) -> UserRepository:
@@ -72,8 +83,9 @@ def get_similar_group_repository(db: Session = Depends(get_db)) -> SimilarGroupR
 def get_similar_group_service(
     similar_group_repository: SimilarGroupRepository = Depends(get_similar_group_repository),
     image_repository: ImageRepository = Depends(get_image_repository),
+    analysis_service: AnalysisService = Depends(get_analysis_service),
 ) -> SimilarGroupService:
-    return SimilarGroupService(similar_group_repository, image_repository)
+    return SimilarGroupService(similar_group_repository, image_repository, analysis_service)
 
 
 def get_album_service(
@@ -0,0 +1,161 @@
+# app/hash_filter.py
+import hashlib
+import logging
+import math
+from typing import Callable, Iterable, List, Optional, Set
+
+import redis
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 원자적으로 bit를 추가하는 Lua script (filter가 없으면 추가하지 않음 → 다음 조회 시 DB에서 다시 생성)
+# ARGV: k, h1, h2, h1, h2, ... (bit 위치 = (h1 + i * h2) mod m, double hashing)
+_ADD_SCRIPT = """
+local size = redis.call('STRLEN', KEYS[1])
+if size == 0 then return 0 end
+local m = size * 8
+local k = tonumber(ARGV[1])
+for j = 2, #ARGV, 2 do
+    local h1 = tonumber(ARGV[j])
+    local h2 = tonumber(ARGV[j + 1])
+    for i = 0, k - 1 do
+        redis.call('SETBIT', KEYS[1], (h1 + i * h2) % m, 1)
+    end
+end
+return 1
+"""
+
+
+def _hash_pair(value: str) -> tuple:
+    digest = hashlib.sha256(value.encode()).digest()
+    h1 = int.from_bytes(digest[:4], 'big')
+    # h2가 0이면 모든 위치가 같아지므로 홀수로 만듦
+    h2 = int.from_bytes(digest[4:8], 'big') | 1
+    return h1, h2
+
+
+class HashFilter:
+    """
+    사용자별 이미지 hash Bloom filter (Redis bitmap).
+    초기 동기화 시 수만 개의 hash를 DB 인덱스를 훑지 않고 걸러내며, filter가 "있음"으로 답한 hash만 DB에서 확인합니다.
+
+        - 추가: 업로드 요청으로 이미지 행을 만들 때, 휴지통에서 복원할 때 (Lua script로 원자적 SETBIT)
+        - 삭제: Bloom filter는 bit를 지울 수 없으므로 영구 삭제 수를 세고,
+                HASH_FILTER_REBUILD_RATIO를 넘으면 다음 조회 때 DB에서 다시 생성
+        - 조회: bitmap 전체를 GET 한 번으로 받아 메모리에서 검사
+    filter가 없거나 만료되면 조회 시 DB의 hash 목록으로 다시 생성합니다. 생성 중 추가된 hash가 빠지더라도
+    업로드 요청(/upload/request)의 중복 검사가 다시 걸러내므로 같은 이미지가 두 번 저장되지는 않습니다.
+    크기는 생성 시점 hash 수의 2배(최소 HASH_FILTER_CAPACITY)로 정하며, 만료(HASH_FILTER_TTL_SECONDS)마다
+    다시 생성되므로 라이브러리가 커져도 오탐률이 유지됩니다.
+    """
+
+    def __init__(self, client: redis.Redis, capacity: int, error_rate: float, ttl_seconds: int):
+        self.client = client
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.ttl_seconds = ttl_seconds
+        self._add = client.register_script(_ADD_SCRIPT)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"hash_filter:{user_id}"
+
+    @staticmethod
+    def _deleted_key(user_id: int) -> str:
+        return f"hash_filter:{user_id}:deleted"
+
+    @property
+    def num_hashes(self) -> int:
+        return max(1, round(-math.log2(self.error_rate)))
+
+    def _num_bytes(self, count: int) -> int:
+        # 현재 hash 수의 2배와 capacity 중 큰 값에 맞춰 크기를 정해 오탐률을 유지
+        n = max(self.capacity, 2 * count)
+        bits = math.ceil(-n * math.log(self.error_rate) / math.log(2) ** 2)
+        return math.ceil(bits / 8)
+
+    def _positions(self, value: str, m: int) -> List[int]:
+        h1, h2 = _hash_pair(value)
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, user_id: int, hashes: Iterable[str]) -> None:
+        args = [self.num_hashes]
+        for value in hashes:
+            args.extend(_hash_pair(value))
+        if len(args) > 1:
+            self._add(keys=[self._key(user_id)], args=args)
+
+    def record_deletions(self, user_id: int, count: int = 1) -> None:
+        pipe = self.client.pipeline()
+        pipe.incrby(self._deleted_key(user_id), count)
+        pipe.expire(self._deleted_key(user_id), self.ttl_seconds)
+        pipe.execute()
+
+    def rebuild(self, user_id: int, hashes: List[str]) -> bytes:
+        """DB의 hash 목록으로 filter를 다시 만들고 결과 bitmap을 반환합니다."""
+        bitmap = bytearray(self._num_bytes(len(hashes)))
+        m = len(bitmap) * 8
+        for value in hashes:
+            for position in self._positions(value, m):
+                # Redis bitmap과 같은 bit 순서 (byte 내 최상위 bit가 offset 0)
+                bitmap[position >> 3] |= 0x80 >> (position & 7)
+
+        key = self._key(user_id)
+        tmp_key = f"{key}:rebuild"
+        pipe = self.client.pipeline()
+        # 임시 key에 만든 뒤 RENAME으로 교체 (크기가 다른 이전 bitmap과 섞이지 않도록 통째로 바꿈)
+        pipe.set(tmp_key, bytes(bitmap))
+        pipe.rename(tmp_key, key)
+        pipe.delete(self._deleted_key(user_id))
+        pipe.expire(key, self.ttl_seconds)
+        pipe.get(key)
+        return pipe.execute()[-1]
+
+    def _load(self, user_id: int, load_hashes: Callable[[], List[str]]) -> bytes:
+        key = self._key(user_id)
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.get(self._deleted_key(user_id))
+        bitmap, deleted = pipe.execute()
+
+        stale = bitmap is not None and int(deleted or 0) > settings.HASH_FILTER_REBUILD_RATIO * self.capacity
+        if stale:
+            # 삭제된 hash의 bit를 비우기 위해 새로 생성
+            self.client.delete(key)
+        if bitmap is None or stale:
+            hashes = load_hashes()
+            logger.info(f"Rebuilding hash filter for user {user_id} ({len(hashes)} hashes)")
+            bitmap = self.rebuild(user_id, hashes)
+        return bitmap
+
+    def might_contain(self, user_id: int, hashes: List[str], load_hashes: Callable[[], List[str]]) -> Set[str]:
+        """
+        filter에 있을 수 있는 hash 집합을 반환합니다. (없다고 답한 hash는 확실히 없음)
+
+        Args:
+            load_hashes: filter를 다시 만들 때 사용할 사용자의 hash 목록 조회 함수
+        """
+        bitmap = self._load(user_id, load_hashes)
+        m = len(bitmap) * 8
+        return {
+            value for value in hashes
+            if all(bitmap[p >> 3] & (0x80 >> (p & 7)) for p in self._positions(value, m))
+        }
+
+
+_hash_filter: Optional[HashFilter] = None
+
+
+def get_hash_filter() -> HashFilter:
+    """FastAPI Dependency to get the per-user hash Bloom filter."""
+    global _hash_filter
+    if _hash_filter is None:
+        _hash_filter = HashFilter(
+            redis.Redis.from_url(settings.REDIS_URL),
+            capacity=settings.HASH_FILTER_CAPACITY,
+            error_rate=settings.HASH_FILTER_ERROR_RATE,
+            ttl_seconds=settings.HASH_FILTER_TTL_SECONDS,
+        )
+    return _hash_filter
@@ -3,9 +3,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from app.database import Base, engine
 from app.models import album, association, image, tag, user, category
-from app.routers import users, images, auth, category, tag, similar_group, album # Added album
+from app.routers import users, images, auth, category, tag, similar_group, album, storage # Added album
 from app.celery_worker import celery_app
 from app.initial_data import seed_data # Import seed_data
+from app.schema_upgrade import upgrade_schema
 
 
 @asynccontextmanager
@@ -13,6 +14,8 @@ async def lifespan(app: FastAPI):
     # Startup
     print("db table creating..")
     Base.metadata.create_all(bind=engine)
+    # create_all은 기존 테이블을 바꾸지 않으므로 추가된 컬럼/인덱스는 별도 DDL로 반영
+    upgrade_schema(engine)
     print("db table created!")
 
     # 테이블 생성 후 초기 데이터 삽입
@@ -62,4 +65,5 @@ app.include_router(images.router, prefix="/api/images", tags=["images"])
 app.include_router(category.router, prefix="/api/categories", tags=["categories"])
 app.include_router(tag.router, prefix="/api/tags", tags=["tags"])
 app.include_router(similar_group.router, prefix="/api/similar-groups", tags=["similar-groups"])
-app.include_router(album.router, prefix="/api/albums", tags=["albums"])
\ No newline at end of file
+app.include_router(album.router, prefix="/api/albums", tags=["albums"])
+app.include_router(storage.router, prefix="/api/storage", tags=["storage"])
\ No newline at end of file
@@ -1,5 +1,5 @@
 # back/app/models/image.py
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Enum, Float, Boolean
+from sqlalchemy import Column, Integer, SmallInteger, String, TIMESTAMP, ForeignKey, Enum, Float, Boolean, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -26,12 +26,30 @@ class Image(Base):
     ai_embedding = Column(String) # pgvector의 VECTOR 타입에 해당
     score = Column(Float, nullable=True)
     exif = Column(JSONB, nullable=True)
+    derivatives = Column(JSONB, nullable=True)  # 축소본 {name: {key, width, height, size}}
+    # 근접 중복 검색용 64-bit dHash (16자리 hex)와 8-bit 조각 8개
+    # 거리 r 검색은 조각을 r + 1개 묶음으로 나누고, 묶음 하나가 통째로 같은 후보를 조각 인덱스로 찾음 (multi-index hashing)
+    phash = Column(String(16), nullable=True)
+    phash_0 = Column(SmallInteger, nullable=True)
+    phash_1 = Column(SmallInteger, nullable=True)
+    phash_2 = Column(SmallInteger, nullable=True)
+    phash_3 = Column(SmallInteger, nullable=True)
+    phash_4 = Column(SmallInteger, nullable=True)
+    phash_5 = Column(SmallInteger, nullable=True)
+    phash_6 = Column(SmallInteger, nullable=True)
+    phash_7 = Column(SmallInteger, nullable=True)
     ai_processing_status = Column(Enum(AIProcessingStatus), default=AIProcessingStatus.PENDING)
+    multipart_upload_id = Column(String, nullable=True)  # 진행 중인 분할 업로드 (완료/취소 시 None)
+    quality_requested_at = Column(TIMESTAMP(timezone=True), nullable=True)  # 지연 품질 평가 요청 시각 (결과 도착 시 None)
 
     owner = relationship("User", back_populates="images")
     tags = relationship("ImageTag", back_populates="image")
     albums = relationship("AlbumImage", back_populates="image")
 
+    __table_args__ = tuple(
+        Index(f"ix_images_user_phash_{i}", "user_id", f"phash_{i}") for i in range(8)
+    )
+
 class AIProcessingQueue(Base):
     __tablename__ = "ai_processing_queue"
 
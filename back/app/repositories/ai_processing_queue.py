@@ -0,0 +1,96 @@
+# app/repositories/ai_processing_queue.py
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, List, Optional
+
+from app.models.image import Image, AIProcessingQueue, AIProcessingStatus
+
+
+class AIProcessingQueueRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create(self, image_id: int, status: AIProcessingStatus, started_at: Optional[datetime] = None) -> AIProcessingQueue:
+        """분석 작업 레코드를 생성합니다."""
+        entry = AIProcessingQueue(image_id=image_id, status=status, started_at=started_at)
+        self.db.add(entry)
+        self.db.flush()
+        return entry
+
+    def find_latest_by_image(self, image_id: int) -> AIProcessingQueue | None:
+        """이미지의 가장 최근 분석 작업 레코드를 찾습니다."""
+        return self.db.query(AIProcessingQueue).filter(
+            AIProcessingQueue.image_id == image_id
+        ).order_by(AIProcessingQueue.id.desc()).first()
+
+    def update(self, entry: AIProcessingQueue, **kwargs) -> AIProcessingQueue:
+        """분석 작업 레코드를 업데이트합니다."""
+        for key, value in kwargs.items():
+            setattr(entry, key, value)
+        return entry
+
+    def find_stale_images(
+        self,
+        statuses: List[AIProcessingStatus],
+        cutoff: datetime,
+        after_id: int = 0,
+        limit: int = 500,
+        max_attempts: Optional[int] = None,
+    ) -> List[Image]:
+        """
+        재분석이 필요한 이미지를 keyset 페이지네이션으로 찾습니다.
+
+        마지막 디스패치 시각(없으면 업로드 시각)이 cutoff 이전인 업로드 완료 이미지만 대상으로 합니다.
+        """
+        attempts = self.db.query(
+            AIProcessingQueue.image_id.label("image_id"),
+            func.max(AIProcessingQueue.started_at).label("last_started_at"),
+            func.count(AIProcessingQueue.id).label("attempts"),
+        ).group_by(AIProcessingQueue.image_id).subquery()
+
+        query = self.db.query(Image).outerjoin(
+            attempts, attempts.c.image_id == Image.id
+        ).filter(
+            Image.id > after_id,
+            Image.is_saved.is_(True),
+            Image.deleted_at.is_(None),
+            Image.ai_processing_status.in_(statuses),
+            func.coalesce(attempts.c.last_started_at, Image.uploaded_at) < cutoff,
+        )
+        if max_attempts is not None:
+            query = query.filter(func.coalesce(attempts.c.attempts, 0) < max_attempts)
+
+        return query.order_by(Image.id).limit(limit).all()
+
+    def get_latency_percentiles(self, percentiles: List[float], since: Optional[datetime] = None) -> Dict:
+        """
+        완료된 분석 작업의 지연 시간 백분위수(초)를 계산합니다.
+
+        - upload_to_analyzed: 이미지 생성(업로드 요청) 시각부터 분석 완료까지
+        - dispatch_to_analyzed: 큐 디스패치 시각부터 분석 완료까지
+        """
+        upload_latency = func.extract("epoch", AIProcessingQueue.completed_at - Image.uploaded_at)
+        dispatch_latency = func.extract("epoch", AIProcessingQueue.completed_at - AIProcessingQueue.started_at)
+
+        columns = [func.count(AIProcessingQueue.id)]
+        for p in percentiles:
+            columns.append(func.percentile_cont(p).within_group(upload_latency))
+        for p in percentiles:
+            columns.append(func.percentile_cont(p).within_group(dispatch_latency))
+
+        query = self.db.query(*columns).select_from(AIProcessingQueue).join(Image, Image.id == AIProcessingQueue.image_id).filter(
+            AIProcessingQueue.status == AIProcessingStatus.COMPLETED,
+            AIProcessingQueue.completed_at.isnot(None),
+            AIProcessingQueue.started_at.isnot(None),
+        )
+        if since is not None:
+            query = query.filter(AIProcessingQueue.completed_at >= since)
+
+        row = query.one()
+        n = len(percentiles)
+        return {
+            "count": row[0],
+            "upload_to_analyzed": dict(zip(percentiles, row[1:1 + n])),
+            "dispatch_to_analyzed": dict(zip(percentiles, row[1 + n:1 + 2 * n])),
+        }
@@ -1,9 +1,35 @@
 # app/repositories/image.py
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import Session
 from app.models.image import Image
 from app.models.association import ImageTag
 from app.models.tag import Tag
-from typing import List
+from typing import Dict, List, Tuple
+
+# phash(64 bit)를 나누는 8-bit 조각 수 (images.phash_0..7)
+# 거리 r로 검색할 때는 조각을 연속한 r + 1개 묶음으로 나누며, 거리 r 이하의 두 hash는 묶음 중 하나가
+# 반드시 통째로 같음 (비둘기집 원리). 따라서 누락 없이 찾을 수 있는 최대 거리는 PHASH_CHUNKS - 1
+PHASH_CHUNKS = 8
+
+
+def split_phash(phash: str) -> List[int]:
+    """16자리 hex phash를 8-bit 조각 8개로 나눕니다."""
+    value = int(phash, 16)
+    return [(value >> (8 * (PHASH_CHUNKS - 1 - i))) & 0xFF for i in range(PHASH_CHUNKS)]
+
+
+def phash_groups(max_distance: int) -> List[List[int]]:
+    """거리 max_distance 검색에 쓰는 조각 묶음 (조각 index를 max_distance + 1개의 연속한 묶음으로 고르게 나눔)"""
+    if not 0 <= max_distance < PHASH_CHUNKS:
+        raise ValueError(f"PHASH_MAX_DISTANCE must be between 0 and {PHASH_CHUNKS - 1} (got {max_distance})")
+    count = max_distance + 1
+    bounds = [round(i * PHASH_CHUNKS / count) for i in range(count + 1)]
+    return [list(range(bounds[i], bounds[i + 1])) for i in range(count)]
+
+
+def hamming_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count('1')
+
 
 class ImageRepository:
     def __init__(self, db: Session):
@@ -37,6 +63,83 @@ class ImageRepository:
         """해시로 이미지를 찾습니다."""
         return self.db.query(Image).filter(Image.hash == image_hash, Image.deleted_at.is_(None)).first()
 
+    def find_hashes_by_user(self, user_id: int) -> List[str]:
+        """사용자의 소프트 삭제되지 않은 이미지 hash 목록 (hash filter 생성용)"""
+        rows = self.db.query(Image.hash).filter(
+            Image.user_id == user_id,
+            Image.hash.isnot(None),
+            Image.deleted_at.is_(None)
+        ).all()
+        return [row.hash for row in rows]
+
+    def find_ids_by_hashes(self, user_id: int, hashes: List[str], chunk_size: int = 1000) -> Dict[str, int]:
+        """hash 목록 중 사용자가 가진 이미지의 {hash: image_id}를 chunk_size개씩 나눠 조회합니다."""
+        found = {}
+        for start in range(0, len(hashes), chunk_size):
+            rows = self.db.query(Image.hash, Image.id).filter(
+                Image.user_id == user_id,
+                Image.hash.in_(hashes[start:start + chunk_size]),
+                Image.deleted_at.is_(None)
+            ).all()
+            found.update({row.hash: row.id for row in rows})
+        return found
+
+    def set_phash(self, image: Image, phash: str) -> None:
+        """phash와 검색용 조각 컬럼을 함께 설정합니다."""
+        image.phash = phash.lower()
+        for i, chunk in enumerate(split_phash(phash)):
+            setattr(image, f"phash_{i}", chunk)
+
+    def find_near_duplicates(
+        self, user_id: int, phashes: List[str], max_distance: int, chunk_size: int = 500
+    ) -> Dict[str, Tuple[int, int]]:
+        """
+        phash 목록 각각에 대해 사용자의 저장된 이미지 중 Hamming 거리가 max_distance 이하인 가장 가까운 이미지를 찾습니다.
+        조각 묶음(phash_groups)이 하나라도 같은 후보를 chunk_size개의 phash마다 한 번의 쿼리로 찾은 뒤 거리를 확인합니다.
+
+        Returns:
+            Dict[str, Tuple[int, int]]: {phash(소문자): (image_id, distance)} (근접 중복이 있는 phash만)
+        """
+        groups = phash_groups(max_distance)
+        queries = list(dict.fromkeys(phash.lower() for phash in phashes))
+        found = {}
+        for start in range(0, len(queries), chunk_size):
+            batch = queries[start:start + chunk_size]
+            chunks = {phash: split_phash(phash) for phash in batch}
+
+            conditions = []
+            for group in groups:
+                columns = [getattr(Image, f"phash_{i}") for i in group]
+                values = list({tuple(c[i] for i in group) for c in chunks.values()})
+                if len(columns) == 1:
+                    conditions.append(columns[0].in_([value[0] for value in values]))
+                else:
+                    conditions.append(tuple_(*columns).in_(values))
+            candidates = self.db.query(Image.id, Image.phash).filter(
+                Image.user_id == user_id,
+                Image.is_saved.is_(True),
+                Image.deleted_at.is_(None),
+                or_(*conditions),
+            ).all()
+
+            # 묶음 값 → 후보 (phash마다 같은 묶음을 가진 후보만 거리 계산)
+            index: Dict[Tuple[int, Tuple[int, ...]], List[Tuple[int, str]]] = {}
+            for row in candidates:
+                row_chunks = split_phash(row.phash)
+                for g, group in enumerate(groups):
+                    index.setdefault((g, tuple(row_chunks[i] for i in group)), []).append((row.id, row.phash))
+
+            for phash, c in chunks.items():
+                matches = {
+                    (hamming_distance(other, phash), image_id)
+                    for g, group in enumerate(groups)
+                    for image_id, other in index.get((g, tuple(c[i] for i in group)), [])
+                }
+                distance, image_id = min(matches, default=(max_distance + 1, None))
+                if distance <= max_distance:
+                    found[phash] = (image_id, distance)
+        return found
+
     def find_all_by_user(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Image]:
         """사용자의 모든 이미지를 찾습니다 (소프트 삭제된 이미지 제외)."""
         return self.db.query(Image).filter(Image.user_id == user_id, Image.deleted_at.is_(None)).offset(skip).limit(limit).all()
@@ -73,6 +73,12 @@ class SimilarGroupRepository:
         """사용자의 모든 유사 그룹을 가져옵니다."""
         return self.db.query(SimilarGroup).filter(SimilarGroup.user_id == user_id).all()
 
+    def get_groups_containing_images(self, image_ids: List[int]) -> List[SimilarGroup]:
+        """주어진 이미지 중 하나 이상을 포함하는 유사 그룹을 가져옵니다."""
+        return self.db.query(SimilarGroup).join(SimilarGroupImage).filter(
+            SimilarGroupImage.image_id.in_(image_ids)
+        ).distinct().all()
+
     def get_group_by_id(self, group_id: int, user_id: int) -> SimilarGroup:
         """ID로 특정 유사 그룹을 가져옵니다."""
         return self.db.query(SimilarGroup).filter(
@@ -3,44 +3,141 @@ from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.dependencies import get_db, get_image_service, get_current_user
-from app.aws import get_s3_client
+from app.dependencies import get_db, get_image_service, get_current_user, get_similar_group_service
+from app.hash_filter import HashFilter, get_hash_filter
+from app.storage import ObjectStorage, get_storage
 from app.schemas.image import (
     ImageUploadRequest,
     ImageUploadResponse,
+    HashCheckRequest,
+    HashCheckResponse,
+    MultipartUploadInitRequest,
+    MultipartUploadInitResponse,
+    MultipartPartsRequest,
+    MultipartPartsResponse,
+    MultipartUploadCompleteRequest,
     UploadCompleteRequest,
     UploadCompleteResponse,
     ImageViewableResponse,
     ImageResponse,
     ImageAnalysisResult,
     ImageDetailResponse,
+    ImageAnalysisBulkRequest,
+    ImageAnalysisBulkResponse,
+    ImageQualityScoreBulkRequest,
 )
 from app.schemas.tag import ImageTagRequest, TagResponse
 from app.models.user import User
 from app.services.image import ImageService
-from app.celery_worker import celery_app
-from config.config import settings
+from app.services.similar_group_service import SimilarGroupService
 
 router = APIRouter(tags=["images"])
 
 @router.post("/upload/request", response_model=ImageUploadResponse)
 def request_upload_urls(
     request: ImageUploadRequest,
-    s3_client=Depends(get_s3_client),
+    storage: ObjectStorage = Depends(get_storage),
+    hash_filter: HashFilter = Depends(get_hash_filter),
     image_service: ImageService = Depends(get_image_service),
     current_user: User = Depends(get_current_user),
 ):
     """
     여러 이미지 업로드를 위한 사전 서명된 URL을 생성합니다.
     요청 전에 해시를 비교하여 중복된 이미지는 제외합니다.
+    phash를 함께 보내면 재인코딩/리사이즈된 근접 중복을 near_duplicates로 알려주며,
+    skip_near_duplicates이면 해당 이미지의 업로드 URL은 발급하지 않습니다.
     """
     return image_service.request_upload_urls(
-        s3_client=s3_client,
+        storage=storage,
         images_data=request,
-        user=current_user
+        user=current_user,
+        hash_filter=hash_filter
+    )
+
+
+@router.post("/upload/multipart/initiate", response_model=MultipartUploadInitResponse)
+def initiate_multipart_upload(
+    request: MultipartUploadInitRequest,
+    storage: ObjectStorage = Depends(get_storage),
+    hash_filter: HashFilter = Depends(get_hash_filter),
+    image_service: ImageService = Depends(get_image_service),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    큰 원본 파일(HEIC/RAW 등)의 분할 업로드를 시작합니다.
+    서버가 정한 part_size로 파일을 나눠 조각별 URL에 병렬로 PUT하고, 응답의 ETag를 모아 complete를 호출합니다.
+    이미 있는 hash이면 409와 existing_image_id를 반환합니다.
+    """
+    return image_service.initiate_multipart_upload(
+        storage=storage, request=request, user=current_user, hash_filter=hash_filter
+    )
+
+
+@router.post("/upload/multipart/{image_id}/parts", response_model=MultipartPartsResponse)
+def presign_multipart_parts(
+    image_id: int,
+    request: MultipartPartsRequest,
+    storage: ObjectStorage = Depends(get_storage),
+    image_service: ImageService = Depends(get_image_service),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    분할 업로드의 조각 URL을 발급합니다. (initiate에 포함되지 않은 조각, 실패한 조각 재업로드)
+    """
+    return image_service.presign_multipart_parts(
+        storage=storage, image_id=image_id, part_numbers=request.part_numbers, user=current_user
+    )
+
+
+@router.post("/upload/multipart/{image_id}/complete", response_model=UploadCompleteResponse)
+def complete_multipart_upload(
+    image_id: int,
+    request: MultipartUploadCompleteRequest,
+    storage: ObjectStorage = Depends(get_storage),
+    image_service: ImageService = Depends(get_image_service),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    업로드된 조각을 하나의 객체로 합치고, /upload/complete와 같이 저장 완료 처리 후 AI 분석을 요청합니다.
+    """
+    updated_image = image_service.complete_multipart_upload(
+        storage=storage, image_id=image_id, request=request, user=current_user
+    )
+    return UploadCompleteResponse(
+        image_id=updated_image.id,
+        status="completed",
+        hash=updated_image.hash
     )
 
 
+@router.delete("/upload/multipart/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_multipart_upload(
+    image_id: int,
+    storage: ObjectStorage = Depends(get_storage),
+    image_service: ImageService = Depends(get_image_service),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    분할 업로드를 취소하고 업로드된 조각을 삭제합니다.
+    """
+    image_service.abort_multipart_upload(storage=storage, image_id=image_id, user=current_user)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post("/hashes/check", response_model=HashCheckResponse)
+def check_hashes(
+    request: HashCheckRequest,
+    hash_filter: HashFilter = Depends(get_hash_filter),
+    image_service: ImageService = Depends(get_image_service),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    이미 업로드된 hash를 한 번에 확인합니다 (기기 초기 동기화용, 읽기 전용).
+    요청당 최대 HASH_CHECK_MAX_HASHES개이며, 이미 있는 hash의 image_id만 반환합니다.
+    """
+    return image_service.check_hashes(hash_filter=hash_filter, hashes=request.hashes, user=current_user)
+
+
 @router.post("/upload/complete", response_model=UploadCompleteResponse)
 def notify_upload_complete(
     request: UploadCompleteRequest,
@@ -48,28 +145,13 @@ def notify_upload_complete(
     current_user: User = Depends(get_current_user),
 ):
     """
-    이미지 업로드가 완료되었음을 서버에 알리고 처리를 시작합니다.
+    이미지 업로드가 완료되었음을 서버에 알리고 AI 분석 작업을 전송합니다.
     """
     updated_image = image_service.notify_upload_complete(
         image_id=request.image_id,
         metadata=request.metadata,
         user=current_user
     )
-
-    if settings.CLOUDFRONT_DOMAIN:
-        full_image_url = f"https://{settings.CLOUDFRONT_DOMAIN}/{updated_image.url}"
-        # AI 서버의 Celery worker에게 분석 작업 전송
-        celery_app.send_task(
-            'app.tasks.analyze_image_task',
-            kwargs={
-                'image_url': full_image_url,
-                'image_id': updated_image.id
-            }
-        )
-    else:
-        # Handle case where CloudFront is not configured, perhaps log a warning
-        print("CloudFront domain is not configured, skipping AI analysis task.")
-
     return UploadCompleteResponse(
         image_id=updated_image.id,
         status="completed",
@@ -105,15 +187,16 @@ def get_image_detail(
 @router.get("/{image_id}/view", response_model=ImageViewableResponse)
 def get_viewable_image_url(
     image_id: int,
+    storage: ObjectStorage = Depends(get_storage),
     image_service: ImageService = Depends(get_image_service),
     current_user: User = Depends(get_current_user),
 ):
     """
     완료된 이미지에 대한 공개적으로 볼 수 있는 URL을 가져옵니다.
-    URL은 CloudFront를 통해 제공됩니다.
+    URL은 CloudFront(S3) 또는 서명된 로컬 저장소 URL로 제공됩니다.
+    갤러리 그리드/화면 보기에는 원본 대신 derivatives의 축소본(grid, screen, full) URL을 사용합니다.
     """
-    url = image_service.get_viewable_url(image_id=image_id, user=current_user)
-    return ImageViewableResponse(image_id=image_id, url=url)
+    return image_service.get_viewable_urls(storage=storage, image_id=image_id, user=current_user)
 
 @router.get("/{image_id}/tags", response_model=List[TagResponse])
 def get_image_tags(
@@ -182,11 +265,12 @@ def restore_image(
     image_id: int,
     image_service: ImageService = Depends(get_image_service),
     current_user: User = Depends(get_current_user),
+    hash_filter: HashFilter = Depends(get_hash_filter),
 ):
     """
     휴지통에서 이미지를 복원합니다.
     """
-    return image_service.restore_image(image_id=image_id, user=current_user)
+    return image_service.restore_image(image_id=image_id, user=current_user, hash_filter=hash_filter)
 
 @router.post("/{image_id}/analysis-results", status_code=status.HTTP_200_OK)
 def receive_analysis_results(
@@ -206,18 +290,50 @@ def receive_analysis_results(
         tag_probability=results.probability,
         score=results.quality_score,
         ai_embedding=results.feature_vector,
+        failed=results.error is not None or results.tag_name == 'error',
+        derivatives=results.derivatives,
+        phash=results.phash,
     )
     return {"message": "Analysis results received and processed successfully."}
 
+@router.post("/analysis-results/bulk", response_model=ImageAnalysisBulkResponse)
+def receive_analysis_results_bulk(
+    request: ImageAnalysisBulkRequest,
+    image_service: ImageService = Depends(get_image_service),
+    db: Session = Depends(get_db),
+):
+    """
+    오프라인 일괄 분석(bulk_analyze.py) 결과를 한 번에 받아 이미지 정보를 업데이트합니다.
+    """
+    return image_service.update_image_analysis_results_bulk(db=db, items=request.results)
+
+@router.post("/quality-scores/bulk", response_model=ImageAnalysisBulkResponse)
+def receive_quality_scores_bulk(
+    request: ImageQualityScoreBulkRequest,
+    image_service: ImageService = Depends(get_image_service),
+    similar_group_service: SimilarGroupService = Depends(get_similar_group_service),
+    db: Session = Depends(get_db),
+):
+    """
+    AI 서버로부터 지연 품질 평가 결과를 받아 이미지 점수를 저장하고, 해당 이미지가 속한 유사 그룹의 대표 이미지를 다시 선정합니다.
+    """
+    response = image_service.update_quality_scores_bulk(db=db, items=request.results)
+    scored_ids = [item.image_id for item in request.results if item.quality_score is not None]
+    similar_group_service.refresh_best_images(scored_ids)
+    return response
+
 @router.delete("/trash/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 def permanently_delete_image(
     image_id: int,
-    s3_client=Depends(get_s3_client),
+    storage: ObjectStorage = Depends(get_storage),
+    hash_filter: HashFilter = Depends(get_hash_filter),
     image_service: ImageService = Depends(get_image_service),
     current_user: User = Depends(get_current_user),
 ):
     """
-    휴지통과 S3에서 이미지를 영구적으로 삭제합니다.
+    휴지통과 저장소(S3)에서 이미지를 영구적으로 삭제합니다.
     """
-    image_service.permanently_delete_image(s3_client=s3_client, image_id=image_id, user=current_user)
+    image_service.permanently_delete_image(
+        storage=storage, image_id=image_id, user=current_user, hash_filter=hash_filter
+    )
     return Response(status_code=status.HTTP_204_NO_CONTENT)
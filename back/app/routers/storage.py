@@ -0,0 +1,59 @@
+# app/routers/storage.py
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+import os
+
+from app.storage import LocalStorage, ObjectStorage, StorageError, get_storage
+
+router = APIRouter(tags=["storage"])
+
+
+def _local_storage(storage: ObjectStorage = Depends(get_storage)) -> LocalStorage:
+    # S3를 사용할 때는 클라이언트가 S3/CloudFront에 직접 접근하므로 이 라우터는 사용하지 않음
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Local storage is not enabled.")
+    return storage
+
+
+def _verify(storage: LocalStorage, method: str, key: str, expires: int, signature: str) -> None:
+    if not storage.verify(method, key, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid or expired signature.")
+
+
+@router.put("/{key:path}", status_code=status.HTTP_200_OK)
+async def put_object(
+    key: str,
+    expires: int,
+    signature: str,
+    request: Request,
+    storage: LocalStorage = Depends(_local_storage),
+):
+    """
+    LocalStorage.presign_put()으로 발급한 URL로 객체를 업로드합니다. (S3 presigned PUT과 같은 방식)
+    """
+    _verify(storage, "PUT", key, expires, signature)
+    try:
+        storage.put(key, await request.body(), content_type=request.headers.get("content-type"))
+    except StorageError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    return Response(status_code=status.HTTP_200_OK)
+
+
+@router.get("/{key:path}")
+def get_object(
+    key: str,
+    expires: int,
+    signature: str,
+    storage: LocalStorage = Depends(_local_storage),
+):
+    """
+    LocalStorage.presign_get()으로 발급한 URL로 객체를 내려받습니다.
+    """
+    _verify(storage, "GET", key, expires, signature)
+    try:
+        path = storage.path(key)
+    except StorageError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Object not found.")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Object not found.")
+    return FileResponse(path)
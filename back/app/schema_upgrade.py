@@ -0,0 +1,68 @@
+# app/schema_upgrade.py
+"""
+기존 테이블에 추가된 컬럼/인덱스를 반영하는 DDL.
+Base.metadata.create_all()은 없는 테이블만 만들고 기존 테이블은 바꾸지 않으므로,
+이미 배포된 DB는 이 DDL로 컬럼을 추가합니다. 모든 문장은 IF NOT EXISTS로 여러 번 실행해도 안전합니다.
+
+서버 시작 시(main.py lifespan) create_all 다음에 자동으로 실행되며, 직접 실행할 수도 있습니다.
+    python -m app.schema_upgrade          # DB에 적용
+    python -m app.schema_upgrade --sql    # 적용할 SQL만 출력
+"""
+import argparse
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# (설명, SQL) - 새 컬럼을 추가할 때 이 목록 끝에 추가
+UPGRADES: List[Tuple[str, str]] = [
+    (
+        "images.quality_requested_at (지연 품질 평가 요청 시각)",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS quality_requested_at TIMESTAMP WITH TIME ZONE",
+    ),
+    (
+        "images.derivatives (갤러리용 축소본)",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS derivatives JSONB",
+    ),
+    (
+        "images.phash, phash_0..7 (근접 중복 검색용 dHash와 8-bit 조각)",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS phash VARCHAR(16), "
+        + ", ".join(f"ADD COLUMN IF NOT EXISTS phash_{i} SMALLINT" for i in range(8)),
+    ),
+] + [
+    (
+        f"ix_images_user_phash_{i} (phash 조각 인덱스)",
+        f"CREATE INDEX IF NOT EXISTS ix_images_user_phash_{i} ON images (user_id, phash_{i})",
+    )
+    for i in range(8)
+] + [
+    (
+        "images.multipart_upload_id (진행 중인 분할 업로드)",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS multipart_upload_id VARCHAR",
+    ),
+]
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """UPGRADES의 DDL을 하나의 트랜잭션으로 적용합니다."""
+    with engine.begin() as connection:
+        for description, statement in UPGRADES:
+            logger.info(f"Schema upgrade: {description}")
+            connection.execute(text(statement))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Apply additive schema changes to an existing database.")
+    parser.add_argument("--sql", action="store_true", help="DB에 적용하지 않고 SQL만 출력")
+    args = parser.parse_args()
+
+    if args.sql:
+        for description, statement in UPGRADES:
+            print(f"-- {description}\n{statement};")
+    else:
+        from app.database import engine
+        upgrade_schema(engine)
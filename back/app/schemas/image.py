@@ -12,9 +12,21 @@ from app.models.image import AIProcessingStatus
 class ImageHashPayload(BaseModel):
     client_id: str
     hash: str
+    phash: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{16}$")  # 64-bit dHash (선택, 근접 중복 검사)
+    # 저장 key의 확장자 결정에 사용 (없으면 .jpg)
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
 
 class ImageUploadRequest(BaseModel):
     images: List[ImageHashPayload]
+    # True이면 근접 중복으로 판단된 이미지는 업로드 URL을 발급하지 않음
+    skip_near_duplicates: bool = False
+
+class HashCheckRequest(BaseModel):
+    hashes: List[str]
+
+class HashCheckResponse(BaseModel):
+    existing: Dict[str, int]  # 이미 있는 hash → image_id (없는 hash는 포함하지 않음)
 
 class UploadInstruction(BaseModel):
     client_id: str
@@ -25,9 +37,42 @@ class DuplicateInfo(BaseModel):
     client_id: str
     existing_image_id: int
 
+class NearDuplicateInfo(BaseModel):
+    client_id: str
+    existing_image_id: int
+    distance: int  # phash Hamming 거리
+
 class ImageUploadResponse(BaseModel):
     uploads: List[UploadInstruction]
     duplicates: List[DuplicateInfo]
+    near_duplicates: List[NearDuplicateInfo] = []
+
+class MultipartUploadInitRequest(ImageHashPayload):
+    file_size: int = Field(gt=0)
+    part_size: Optional[int] = None  # 희망 조각 크기 (서버가 S3 제한에 맞게 조정)
+
+class PartUploadInstruction(BaseModel):
+    part_number: int
+    presigned_url: str
+
+class MultipartUploadInitResponse(BaseModel):
+    client_id: str
+    image_id: int
+    upload_id: str
+    part_size: int
+    part_count: int
+    parts: List[PartUploadInstruction]  # 앞에서부터 최대 MULTIPART_PRESIGN_BATCH개, 나머지는 /parts로 요청
+
+class MultipartPartsRequest(BaseModel):
+    part_numbers: List[int]
+
+class MultipartPartsResponse(BaseModel):
+    image_id: int
+    parts: List[PartUploadInstruction]
+
+class CompletedPart(BaseModel):
+    part_number: int = Field(ge=1, le=10000)
+    etag: str
 
 class ImageMetadata(BaseModel):
     width: int
@@ -44,6 +89,11 @@ class UploadCompleteRequest(BaseModel):
     metadata: ImageMetadata
 
 
+class MultipartUploadCompleteRequest(BaseModel):
+    parts: List[CompletedPart]
+    metadata: ImageMetadata
+
+
 class UploadCompleteResponse(BaseModel):
     image_id: int
     status: str
@@ -53,6 +103,13 @@ class UploadCompleteResponse(BaseModel):
 class ImageViewableResponse(BaseModel):
     image_id: int
     url: str
+    derivatives: Dict[str, str] = {}  # 축소본 조회 URL {grid, screen, full}
+
+
+class DerivativeInfo(BaseModel):
+    width: int
+    height: int
+    size: int
 
 
 class ImageAnalysisResult(BaseModel):
@@ -63,12 +120,35 @@ class ImageAnalysisResult(BaseModel):
     quality_score: Optional[float] = Field(None, ge=0, le=1)
     feature_vector: Optional[List[float]] = None
     image_url: Optional[str] = None
+    derivatives: Optional[Dict[str, DerivativeInfo]] = None
+    phash: Optional[str] = None
+    error: Optional[str] = None
+
+class ImageAnalysisBulkItem(ImageAnalysisResult):
+    image_id: int
+
+class ImageAnalysisBulkRequest(BaseModel):
+    results: List[ImageAnalysisBulkItem]
+
+class ImageAnalysisBulkResponse(BaseModel):
+    processed: int
+    not_found: List[int]
+
+class ImageQualityScoreItem(BaseModel):
+    image_id: int
+    quality_score: Optional[float] = Field(None, ge=0, le=1)
+    quality_crops: Optional[int] = None
+    error: Optional[str] = None
+
+class ImageQualityScoreBulkRequest(BaseModel):
+    results: List[ImageQualityScoreItem]
 
 class ImageResponse(BaseModel):
     image_id: int = Field(alias='id')
     url: Optional[str]
     uploaded_at: datetime
     ai_processing_status: AIProcessingStatus
+    derivatives: Optional[Dict[str, Any]] = None  # 축소본 {name: {key, width, height, size}}
 
     class Config:
         from_attributes = True
@@ -83,6 +163,7 @@ class ImageDetailResponse(BaseModel):
     ai_processing_status: AIProcessingStatus
     score: Optional[float]
     exif: Optional[Dict[str, Any]]
+    derivatives: Optional[Dict[str, Any]] = None
     tags: List[Any] = []  # Will be populated with TagResponse objects
 
     class Config:
@@ -0,0 +1,142 @@
+# app/services/analysis.py
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.celery_worker import celery_app
+from app.models.image import Image, AIProcessingStatus
+from app.repositories.ai_processing_queue import AIProcessingQueueRepository
+from app.storage import StorageError, derivative_key, get_storage
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+ANALYZE_IMAGE_TASK = 'app.tasks.analyze_image_task'
+SCORE_QUALITY_TASK = 'app.tasks.score_quality_task'
+
+
+class AnalysisService:
+    def __init__(self, queue_repository: AIProcessingQueueRepository):
+        self.queue_repository = queue_repository
+
+    def dispatch(self, image: Image) -> Optional[Dict]:
+        """
+        분석 작업의 상태 전이(PROCESSING)를 기록하고 전송할 작업 인자를 반환합니다.
+        호출자는 커밋한 뒤 send()로 작업을 전송해야 합니다. 커밋 전에 전송하면 빠른 worker의 결과가
+        먼저 기록된 뒤 커밋으로 다시 PROCESSING이 되어 결과 없는 큐 레코드가 남습니다.
+
+        Returns:
+            Optional[Dict]: 작업 인자 (전송할 수 없는 설정이면 None)
+        """
+        image_url = self._image_url(image)
+        if image_url is None:
+            logger.warning("CloudFront domain is not configured, skipping AI analysis task.")
+            return None
+
+        payload = {
+            'image_url': image_url,
+            'image_id': image.id,
+            # 지연 평가 모드에서는 품질 점수가 필요한 이미지만 나중에 별도로 평가
+            'with_quality': not settings.LAZY_QUALITY_SCORING,
+            'derivatives': self._derivative_specs(image),
+        }
+
+        now = datetime.now(timezone.utc)
+        previous = self.queue_repository.find_latest_by_image(image.id)
+        if previous is not None and previous.completed_at is None:
+            # 결과 없이 남아 있는 이전 작업은 재전송 시점에 실패로 마감
+            self.queue_repository.update(previous, status=AIProcessingStatus.FAILED, completed_at=now)
+        self.queue_repository.create(image_id=image.id, status=AIProcessingStatus.PROCESSING, started_at=now)
+        image.ai_processing_status = AIProcessingStatus.PROCESSING
+        return payload
+
+    @staticmethod
+    def send(payload: Dict) -> None:
+        """dispatch()가 반환한 작업을 커밋 후 AI 서버의 Celery worker에게 전송합니다."""
+        celery_app.send_task(
+            ANALYZE_IMAGE_TASK,
+            # enqueued_at: AI worker가 큐 대기 시간(queue_wait)을 측정하는 데 사용
+            kwargs={**payload, 'enqueued_at': time.time()}
+        )
+
+    def request_quality_scores(self, images: List[Image]) -> List[Dict]:
+        """
+        품질 점수가 없는 이미지에 요청 시각(quality_requested_at)을 기록하고
+        QUALITY_SCORING_BATCH_SIZE개씩 묶은 품질 평가 작업 인자를 반환합니다.
+        이미 요청해 결과를 기다리는 이미지는 QUALITY_SCORING_TIMEOUT_MINUTES가 지날 때까지 다시 요청하지 않습니다.
+        호출자는 커밋한 뒤 send_quality_scores()로 전송해야 합니다. 결과는 AI 서버가 /api/images/quality-scores/bulk 로 전송합니다.
+
+        Returns:
+            List[Dict]: 작업 인자 목록 (전송할 수 없는 설정이면 빈 목록)
+        """
+        now = datetime.now(timezone.utc)
+        retry_before = now - timedelta(minutes=settings.QUALITY_SCORING_TIMEOUT_MINUTES)
+        pending = [
+            image for image in images
+            if image.score is None and image.url
+            and (image.quality_requested_at is None or image.quality_requested_at < retry_before)
+        ]
+        if pending and self._image_url(pending[0]) is None:
+            logger.warning("CloudFront domain is not configured, skipping quality scoring task.")
+            return []
+
+        for image in pending:
+            image.quality_requested_at = now
+        batch_size = settings.QUALITY_SCORING_BATCH_SIZE
+        return [
+            {
+                'items': [
+                    {'image_id': image.id, 'image_url': self._image_url(image)}
+                    for image in pending[start:start + batch_size]
+                ],
+            }
+            for start in range(0, len(pending), batch_size)
+        ]
+
+    @staticmethod
+    def send_quality_scores(payloads: List[Dict]) -> None:
+        """request_quality_scores()가 반환한 작업을 커밋 후 전송합니다."""
+        for payload in payloads:
+            celery_app.send_task(SCORE_QUALITY_TASK, kwargs={**payload, 'enqueued_at': time.time()})
+        if payloads:
+            logger.info(f"Requested quality scoring for {sum(len(p['items']) for p in payloads)} images")
+
+    @staticmethod
+    def _image_url(image: Image) -> Optional[str]:
+        """AI worker가 읽을 URL (S3: CloudFront URL, 로컬 저장소: file:// 또는 서명된 URL)"""
+        return get_storage().worker_url(image.url)
+
+    @staticmethod
+    def _derivative_specs(image: Image) -> List[Dict]:
+        """AI worker가 만들어 업로드할 축소본 목록 (DERIVATIVE_SIZES, 원본 key 옆에 저장)"""
+        specs = []
+        storage = get_storage()
+        for entry in filter(None, (part.strip() for part in settings.DERIVATIVE_SIZES.split(','))):
+            name, _, max_size = entry.partition(':')
+            key = derivative_key(image.url, name, settings.DERIVATIVE_FORMAT)
+            try:
+                url = storage.presign_put(key, expires_in=settings.DERIVATIVE_UPLOAD_EXPIRES_SECONDS)
+            except StorageError as e:
+                logger.error(f"Error generating derivative upload URL for image {image.id}: {e}")
+                return []
+            specs.append({'name': name, 'max_size': int(max_size), 'format': settings.DERIVATIVE_FORMAT, 'url': url})
+        return specs
+
+    def record_result(self, image: Image, failed: bool = False) -> None:
+        """분석 결과 수신 시 이미지와 큐 레코드의 상태를 COMPLETED 또는 FAILED로 전이합니다."""
+        status = AIProcessingStatus.FAILED if failed else AIProcessingStatus.COMPLETED
+        now = datetime.now(timezone.utc)
+
+        entry = self.queue_repository.find_latest_by_image(image.id)
+        if entry is None or entry.completed_at is not None:
+            # 디스패치 기록 없이 도착한 결과 (이전 버전에서 전송된 작업 등)
+            entry = self.queue_repository.create(image_id=image.id, status=status)
+        self.queue_repository.update(entry, status=status, completed_at=now)
+        image.ai_processing_status = status
+
+    def get_latency_stats(
+        self, percentiles: Optional[List[float]] = None, since: Optional[datetime] = None
+    ) -> Dict:
+        """업로드부터 분석 완료까지의 지연 시간 백분위수를 반환합니다."""
+        return self.queue_repository.get_latency_percentiles(percentiles or [0.5, 0.9, 0.95, 0.99], since=since)
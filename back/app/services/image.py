@@ -2,11 +2,16 @@
 import uuid
 import logging
 import json
+import math
+import mimetypes
+import os
+import re
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from botocore.exceptions import ClientError
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+import redis
 
 from app.repositories.image import ImageRepository
 from app.schemas.image import (
@@ -14,34 +19,107 @@ from app.schemas.image import (
     ImageUploadResponse,
     UploadInstruction,
     DuplicateInfo,
+    NearDuplicateInfo,
     ImageResponse,
     ImageMetadata,
-    ImageDetailResponse
+    ImageDetailResponse,
+    ImageViewableResponse,
+    ImageAnalysisBulkItem,
+    ImageAnalysisBulkResponse,
+    ImageQualityScoreItem,
+    DerivativeInfo,
+    HashCheckResponse,
+    MultipartUploadInitRequest,
+    MultipartUploadInitResponse,
+    MultipartUploadCompleteRequest,
+    MultipartPartsResponse,
+    PartUploadInstruction,
 )
 from app.models.user import User
 from app.models.image import Image, AIProcessingStatus
 from app.repositories.category import CategoryRepository
 from app.repositories.tag import TagRepository
+from app.services.analysis import AnalysisService
+from app.hash_filter import HashFilter
+from app.storage import MultipartStorage, ObjectStorage, StorageError, derivative_key, derivative_keys
 from config.config import settings
 
 from app.models.tag import Tag
 
 logger = logging.getLogger(__name__)
 
+# S3 분할 업로드 제한 (마지막 조각을 제외한 최소 크기, 최대 크기, 최대 조각 수)
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+S3_MAX_PART_SIZE = 5 * 1024 ** 3
+S3_MAX_PARTS = 10000
+
+
+def build_object_key(user_id: int, filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
+    """원본 저장 key. 확장자는 파일 이름, content type 순으로 정하고 알 수 없으면 .jpg"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,5}", ext):
+        ext = (mimetypes.guess_extension(content_type) if content_type else None) or ".jpg"
+    return f"images/{user_id}/{uuid.uuid4()}{ext}"
+
+
+def negotiate_part_size(file_size: int, requested: Optional[int] = None) -> tuple:
+    """희망 조각 크기를 S3 제한(5MB ~ 5GB, 최대 10000개)에 맞게 조정해 (part_size, part_count)를 반환합니다."""
+    part_size = min(max(requested or settings.MULTIPART_PART_SIZE, S3_MIN_PART_SIZE), S3_MAX_PART_SIZE)
+    part_size = max(part_size, math.ceil(file_size / S3_MAX_PARTS))
+    return part_size, math.ceil(file_size / part_size)
+
+
 class ImageService:
-    def __init__(self, repository: ImageRepository, category_repository: CategoryRepository, tag_repository: TagRepository):
+    def __init__(self, repository: ImageRepository, category_repository: CategoryRepository, tag_repository: TagRepository, analysis_service: AnalysisService):
         self.repository = repository
         self.category_repository = category_repository
         self.tag_repository = tag_repository
+        self.analysis_service = analysis_service
+
+    def check_hashes(self, *, hash_filter: HashFilter, hashes: List[str], user: User) -> HashCheckResponse:
+        """
+        사용자가 이미 가진 hash를 찾습니다. (초기 동기화용, 행이나 업로드 URL을 만들지 않음)
+        Bloom filter가 "있을 수 있음"으로 답한 hash만 DB에서 확인하며, Redis를 쓸 수 없으면 모두 DB에서 확인합니다.
+        """
+        if len(hashes) > settings.HASH_CHECK_MAX_HASHES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many hashes (max {settings.HASH_CHECK_MAX_HASHES} per request)."
+            )
+
+        unique_hashes = list(dict.fromkeys(hashes))
+        try:
+            candidates = hash_filter.might_contain(
+                user.id, unique_hashes, lambda: self.repository.find_hashes_by_user(user.id)
+            )
+            candidates = [h for h in unique_hashes if h in candidates]
+        except redis.RedisError as e:
+            logger.warning(f"Hash filter unavailable, checking all hashes in database: {e}")
+            candidates = unique_hashes
+
+        existing = self.repository.find_ids_by_hashes(user.id, candidates)
+        logger.info(
+            f"Hash check for user {user.id}: {len(unique_hashes)} hashes, "
+            f"{len(candidates)} filter positives, {len(existing)} existing"
+        )
+        return HashCheckResponse(existing=existing)
 
     def request_upload_urls(
-        self, *, s3_client, images_data: ImageUploadRequest, user: User
+        self, *, storage: ObjectStorage, images_data: ImageUploadRequest, user: User,
+        hash_filter: Optional[HashFilter] = None,
     ) -> ImageUploadResponse:
-        if not settings.S3_BUCKET_NAME:
+        if settings.STORAGE_BACKEND == "s3" and not settings.S3_BUCKET_NAME:
             raise HTTPException(status_code=500, detail="S3 bucket name is not configured.")
 
         uploads = []
         duplicates = []
+        near_duplicates = []
+        created_hashes = []
+
+        # 요청 전체의 근접 중복을 한 번에 조회
+        near_matches = self.repository.find_near_duplicates(
+            user.id, [img.phash for img in images_data.images if img.phash], settings.PHASH_MAX_DISTANCE
+        )
 
         try:
             for img_data in images_data.images:
@@ -52,26 +130,169 @@ class ImageService:
                         existing_image_id=existing_image.id
                     ))
                 else:
-                    object_key = f"images/{user.id}/{uuid.uuid4()}.jpg"
+                    if img_data.phash:
+                        # 재인코딩/리사이즈된 사본 (업로드 전에 앱이 사용자에게 확인할 수 있도록 표시)
+                        match = near_matches.get(img_data.phash.lower())
+                        if match:
+                            existing_image_id, distance = match
+                            near_duplicates.append(NearDuplicateInfo(
+                                client_id=img_data.client_id,
+                                existing_image_id=existing_image_id,
+                                distance=distance
+                            ))
+                            if images_data.skip_near_duplicates:
+                                continue
+
+                    object_key = build_object_key(user.id, img_data.filename, img_data.content_type)
                     new_image = self.repository.create(user_id=user.id, url=object_key, hash=img_data.hash, is_saved=False)
+                    if img_data.phash:
+                        self.repository.set_phash(new_image, img_data.phash)
                     
-                    url = s3_client.generate_presigned_url(
-                        'put_object',
-                        Params={'Bucket': settings.S3_BUCKET_NAME, 'Key': object_key},
-                        ExpiresIn=3600
-                    )
+                    url = storage.presign_put(object_key, expires_in=3600)
                     uploads.append(UploadInstruction(
                         client_id=img_data.client_id,
                         image_id=new_image.id,
                         presigned_url=url
                     ))
+                    created_hashes.append(img_data.hash)
             self.repository.db.commit()
-        except ClientError as e:
+        except StorageError as e:
             logger.error(f"Error generating presigned URL: {e}")
             self.repository.db.rollback()
             raise HTTPException(status_code=500, detail="Could not generate upload URL.")
 
-        return ImageUploadResponse(uploads=uploads, duplicates=duplicates)
+        if hash_filter is not None and created_hashes:
+            try:
+                hash_filter.add(user.id, created_hashes)
+            except redis.RedisError as e:
+                logger.warning(f"Could not update hash filter for user {user.id}: {e}")
+
+        return ImageUploadResponse(uploads=uploads, duplicates=duplicates, near_duplicates=near_duplicates)
+
+    def initiate_multipart_upload(
+        self, *, storage: ObjectStorage, request: MultipartUploadInitRequest, user: User,
+        hash_filter: Optional[HashFilter] = None,
+    ) -> MultipartUploadInitResponse:
+        """
+        큰 원본 파일의 분할 업로드를 시작합니다.
+        조각 크기를 정하고 앞쪽 조각의 업로드 URL을 발급하며, 나머지 조각(또는 실패한 조각)은 presign_multipart_parts로 발급합니다.
+        """
+        if not isinstance(storage, MultipartStorage):
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Multipart upload is not supported by the configured storage."
+            )
+        if request.file_size > settings.MULTIPART_MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File is too large (max {settings.MULTIPART_MAX_FILE_SIZE} bytes)."
+            )
+
+        existing_image = self.repository.find_by_hash(request.hash)
+        if existing_image:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Image already exists.", "existing_image_id": existing_image.id}
+            )
+
+        part_size, part_count = negotiate_part_size(request.file_size, request.part_size)
+        object_key = build_object_key(user.id, request.filename, request.content_type)
+        try:
+            upload_id = storage.create_multipart(object_key, request.content_type)
+            new_image = self.repository.create(
+                user_id=user.id, url=object_key, hash=request.hash, size=request.file_size,
+                is_saved=False, multipart_upload_id=upload_id
+            )
+            if request.phash:
+                self.repository.set_phash(new_image, request.phash)
+            parts = self._presign_parts(storage, new_image, range(1, min(part_count, settings.MULTIPART_PRESIGN_BATCH) + 1))
+            self.repository.db.commit()
+        except StorageError as e:
+            logger.error(f"Error initiating multipart upload: {e}")
+            self.repository.db.rollback()
+            raise HTTPException(status_code=500, detail="Could not initiate multipart upload.")
+
+        if hash_filter is not None:
+            try:
+                hash_filter.add(user.id, [request.hash])
+            except redis.RedisError as e:
+                logger.warning(f"Could not update hash filter for user {user.id}: {e}")
+
+        return MultipartUploadInitResponse(
+            client_id=request.client_id,
+            image_id=new_image.id,
+            upload_id=upload_id,
+            part_size=part_size,
+            part_count=part_count,
+            parts=parts,
+        )
+
+    def presign_multipart_parts(
+        self, *, storage: ObjectStorage, image_id: int, part_numbers: List[int], user: User
+    ) -> MultipartPartsResponse:
+        """진행 중인 분할 업로드의 조각 업로드 URL을 발급합니다. (남은 조각, 실패한 조각 재업로드)"""
+        image = self._find_multipart_image(image_id, user)
+        if len(part_numbers) > settings.MULTIPART_PRESIGN_BATCH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many parts (max {settings.MULTIPART_PRESIGN_BATCH} per request)."
+            )
+        if any(not 1 <= number <= S3_MAX_PARTS for number in part_numbers):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid part number.")
+        try:
+            parts = self._presign_parts(storage, image, part_numbers)
+        except StorageError as e:
+            logger.error(f"Error generating part upload URL: {e}")
+            raise HTTPException(status_code=500, detail="Could not generate upload URL.")
+        return MultipartPartsResponse(image_id=image.id, parts=parts)
+
+    def complete_multipart_upload(
+        self, *, storage: ObjectStorage, image_id: int, request: MultipartUploadCompleteRequest, user: User
+    ) -> Image:
+        """업로드된 조각을 합친 뒤 notify_upload_complete와 같이 저장 완료 처리하고 AI 분석을 요청합니다."""
+        image = self._find_multipart_image(image_id, user)
+        try:
+            storage.complete_multipart(
+                image.url, image.multipart_upload_id, [(part.part_number, part.etag) for part in request.parts]
+            )
+        except StorageError as e:
+            # 조각이 빠졌거나 ETag가 다르면 업로드는 유지되므로 해당 조각만 다시 올린 뒤 재시도 가능
+            logger.error(f"Error completing multipart upload for image {image_id}: {e}")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not complete multipart upload.")
+
+        self.repository.update(image, multipart_upload_id=None)
+        if request.metadata.file_size is None:
+            request.metadata.file_size = image.size
+        return self.notify_upload_complete(image_id=image_id, metadata=request.metadata, user=user)
+
+    def abort_multipart_upload(self, *, storage: ObjectStorage, image_id: int, user: User) -> None:
+        """분할 업로드를 취소하고 업로드된 조각과 이미지 레코드를 삭제합니다."""
+        image = self._find_multipart_image(image_id, user)
+        try:
+            storage.abort_multipart(image.url, image.multipart_upload_id)
+        except StorageError as e:
+            logger.error(f"Error aborting multipart upload for image {image_id}: {e}")
+            raise HTTPException(status_code=500, detail="Could not abort multipart upload.")
+        self.repository.delete_permanently(image)
+        self.repository.db.commit()
+
+    def _find_multipart_image(self, image_id: int, user: User) -> Image:
+        image = self.repository.find_by_id(image_id, user.id)
+        if not image:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found.")
+        if image.multipart_upload_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No multipart upload in progress.")
+        return image
+
+    @staticmethod
+    def _presign_parts(storage: ObjectStorage, image: Image, part_numbers) -> List[PartUploadInstruction]:
+        return [
+            PartUploadInstruction(
+                part_number=number,
+                presigned_url=storage.presign_part(image.url, image.multipart_upload_id, number, expires_in=3600)
+            )
+            for number in part_numbers
+        ]
 
     def notify_upload_complete(
         self, *, image_id: int, metadata: ImageMetadata, user: User
@@ -82,6 +303,8 @@ class ImageService:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found.")
         if image.is_saved:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image already processed.")
+        if image.multipart_upload_id is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Multipart upload is not complete.")
 
         update_data = {
             "size": metadata.file_size,
@@ -89,17 +312,16 @@ class ImageService:
             "exif": metadata.model_dump()
         }
         updated_image = self.repository.update(image, **update_data)
+        # AI 서버에 분석 작업 전송 (PENDING -> PROCESSING), 상태를 커밋한 뒤 전송
+        payload = self.analysis_service.dispatch(updated_image)
         self.repository.db.commit()
+        if payload is not None:
+            self.analysis_service.send(payload)
         self.repository.db.refresh(updated_image)
         return updated_image
 
-    def get_viewable_url(self, *, image_id: int, user: User) -> str:
-        if not settings.CLOUDFRONT_DOMAIN:
-            raise HTTPException(
-                status_code=status.HTTP_501_NOT_IMPLEMENTED,
-                detail="CloudFront domain is not configured."
-            )
-
+    def get_viewable_urls(self, *, storage: ObjectStorage, image_id: int, user: User) -> ImageViewableResponse:
+        """원본과 축소본(grid, screen, full)의 조회 URL을 반환합니다. 축소본이 아직 없으면 원본만 반환합니다."""
         image = self.repository.find_by_id(image_id, user.id)
 
         if not image:
@@ -108,7 +330,14 @@ class ImageService:
         if not image.is_saved:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image processing is not complete.")
 
-        return f"https://{settings.CLOUDFRONT_DOMAIN}/{image.url}"
+        url = storage.view_url(image.url)
+        if url is None:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="CloudFront domain is not configured."
+            )
+        derivatives = {name: storage.view_url(info['key']) for name, info in (image.derivatives or {}).items()}
+        return ImageViewableResponse(image_id=image.id, url=url, derivatives=derivatives)
 
     def soft_delete_image(self, *, image_id: int, user: User) -> None:
         image = self.repository.find_by_id(image_id, user.id)
@@ -122,7 +351,7 @@ class ImageService:
         images = self.repository.find_trashed_by_user(user.id)
         return [ImageResponse.from_orm(img) for img in images]
 
-    def restore_image(self, *, image_id: int, user: User) -> ImageResponse:
+    def restore_image(self, *, image_id: int, user: User, hash_filter: Optional[HashFilter] = None) -> ImageResponse:
         image = self.repository.find_by_id_including_trashed(image_id, user.id)
         if not image:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found.")
@@ -132,9 +361,18 @@ class ImageService:
         self.repository.update(image, deleted_at=None)
         self.repository.db.commit()
         self.repository.db.refresh(image)
+
+        # 휴지통에 있는 동안 filter가 다시 생성되었으면 hash가 빠져 있으므로 다시 추가
+        if hash_filter is not None and image.hash:
+            try:
+                hash_filter.add(user.id, [image.hash])
+            except redis.RedisError as e:
+                logger.warning(f"Could not update hash filter for user {user.id}: {e}")
         return ImageResponse.from_orm(image)
 
-    def permanently_delete_image(self, *, s3_client, image_id: int, user: User) -> None:
+    def permanently_delete_image(
+        self, *, storage: ObjectStorage, image_id: int, user: User, hash_filter: Optional[HashFilter] = None
+    ) -> None:
         image = self.repository.find_by_id_including_trashed(image_id, user.id)
         if not image:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found.")
@@ -142,15 +380,19 @@ class ImageService:
         if image.deleted_at is None:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image is not in trash. Soft delete it first.")
 
-        try:
-            s3_client.delete_object(Bucket=settings.S3_BUCKET_NAME, Key=image.url)
-        except ClientError as e:
-            logger.error(f"Error deleting image from S3: {e}")
+        # 원본과 축소본을 함께 삭제
+        if storage.delete_many([image.url] + derivative_keys(image)):
             raise HTTPException(status_code=500, detail="Could not delete image from cloud storage.")
 
         self.repository.delete_permanently(image)
         self.repository.db.commit()
 
+        if hash_filter is not None:
+            try:
+                hash_filter.record_deletions(user.id)
+            except redis.RedisError as e:
+                logger.warning(f"Could not update hash filter for user {user.id}: {e}")
+
     def get_all_images_by_user(self, *, user: User, skip: int = 0, limit: int = 100) -> List[ImageResponse]:
         images = self.repository.find_all_by_user(user.id, skip=skip, limit=limit)
         return [ImageResponse.from_orm(img) for img in images]
@@ -164,6 +406,9 @@ class ImageService:
         tag_probability: float,
         score: Optional[float],
         ai_embedding: Optional[List[float]],
+        failed: bool = False,
+        derivatives: Optional[Dict[str, DerivativeInfo]] = None,
+        phash: Optional[str] = None,
     ) -> Image:
         """
         AI 분석 결과를 이미지에 저장합니다.
@@ -175,12 +420,23 @@ class ImageService:
             tag_probability: 태그 예측 확률 (%)
             score: 이미지 품질 점수 (0-1)
             ai_embedding: 이미지 feature vector
+            failed: AI 서버에서 분석이 실패했는지 여부
+            derivatives: AI 서버가 업로드한 축소본 크기 {name: DerivativeInfo}
+            phash: AI 서버가 계산한 dHash (앱이 보낸 값보다 우선)
         """
         # 파라미터로 받은 db 세션 사용 (중요!)
         image = db.query(Image).filter(Image.id == image_id).first()
         if not image:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Image not found.")
 
+        if failed:
+            # 분석 실패는 FAILED로 기록하고 백필 대상이 되도록 결과는 저장하지 않음
+            logger.warning(f"Image {image_id}: AI 분석 실패 보고 수신")
+            self.analysis_service.record_result(image, failed=True)
+            db.commit()
+            db.refresh(image)
+            return image
+
         # 임계값 확인: tag_probability가 임계값 이상일 때만 태그 저장
         if tag_category and tag_probability >= settings.TAG_CONFIDENCE_THRESHOLD:
             from app.models.category import Category
@@ -229,12 +485,66 @@ class ImageService:
             image.ai_embedding = json.dumps(ai_embedding)
         if score is not None:
             image.score = score
-        image.ai_processing_status = AIProcessingStatus.COMPLETED
+        if phash:
+            self.repository.set_phash(image, phash)
+        if derivatives:
+            image.derivatives = {
+                **(image.derivatives or {}),
+                **{
+                    name: {'key': derivative_key(image.url, name, settings.DERIVATIVE_FORMAT), **info.model_dump()}
+                    for name, info in derivatives.items()
+                },
+            }
+        self.analysis_service.record_result(image)
 
         db.commit()
         db.refresh(image)
         return image
 
+    def update_image_analysis_results_bulk(self, db: Session, items: List[ImageAnalysisBulkItem]) -> ImageAnalysisBulkResponse:
+        """오프라인 일괄 분석 결과를 한 번에 저장합니다. 존재하지 않는 이미지는 건너뜁니다."""
+        processed = 0
+        not_found = []
+        for item in items:
+            try:
+                self.update_image_analysis_results(
+                    db=db,
+                    image_id=item.image_id,
+                    tag_name=item.tag_name,
+                    tag_category=item.category,
+                    tag_probability=item.probability,
+                    score=item.quality_score,
+                    ai_embedding=item.feature_vector,
+                    failed=item.error is not None or item.tag_name == 'error',
+                    derivatives=item.derivatives,
+                    phash=item.phash,
+                )
+                processed += 1
+            except HTTPException as e:
+                if e.status_code != status.HTTP_404_NOT_FOUND:
+                    raise
+                not_found.append(item.image_id)
+        return ImageAnalysisBulkResponse(processed=processed, not_found=not_found)
+
+    def update_quality_scores_bulk(self, db: Session, items: List[ImageQualityScoreItem]) -> ImageAnalysisBulkResponse:
+        """지연 품질 평가 결과를 이미지 점수로 저장합니다. 점수가 없는(실패한) 항목은 그대로 둡니다."""
+        processed = 0
+        not_found = []
+        for item in items:
+            image = self.repository.find_by_id_for_analysis(item.image_id)
+            if image is None:
+                not_found.append(item.image_id)
+                continue
+            # 결과가 도착했으므로 요청 표시를 지움 (실패한 이미지는 다음 그룹 생성 때 다시 요청)
+            image.quality_requested_at = None
+            if item.quality_score is None:
+                logger.warning(f"Image {item.image_id}: 품질 평가 실패 ({item.error})")
+                continue
+            image.score = item.quality_score
+            processed += 1
+        db.commit()
+        return ImageAnalysisBulkResponse(processed=processed, not_found=not_found)
+
     def add_tags_to_image(self, image_id: int, user_id: int, tag_names: List[str]):
         image = self.repository.find_by_id(image_id, user_id)
         if not image:
@@ -8,13 +8,16 @@ from typing import List
 from app.models import SimilarGroup, Image
 from app.repositories.similar_group_repository import SimilarGroupRepository
 from app.repositories.image import ImageRepository
+from app.services.analysis import AnalysisService
+from config.config import settings
 
 logger = logging.getLogger(__name__)
 
 class SimilarGroupService:
-    def __init__(self, similar_group_repository: SimilarGroupRepository, image_repository: ImageRepository):
+    def __init__(self, similar_group_repository: SimilarGroupRepository, image_repository: ImageRepository, analysis_service: AnalysisService):
         self.repository = similar_group_repository
         self.image_repository = image_repository
+        self.analysis_service = analysis_service
 
     def create_similar_groups(self, user_id: int, eps: float = 0.15, min_samples: int = 2) -> List[SimilarGroup]:
         """
@@ -92,6 +95,7 @@ class SimilarGroupService:
         self.repository.delete_groups_by_user_id(user_id)
 
         created_groups = []
+        grouped_images = []
         unique_labels = set(labels)
         for label in unique_labels:
             if label == -1:
@@ -103,8 +107,10 @@ class SimilarGroupService:
             if not cluster_images:
                 continue
 
+            grouped_images.extend(cluster_images)
+
             # 점수가 가장 높은 이미지를 best_image로 선정
-            best_image = max(cluster_images, key=lambda img: img.score or 0)
+            best_image = self._select_best_image(cluster_images)
             
             cluster_image_ids = [img.id for img in cluster_images]
             
@@ -119,14 +125,41 @@ class SimilarGroupService:
             setattr(new_group, 'image_count', len(cluster_image_ids))
             created_groups.append(new_group)
 
+        quality_payloads = []
+        if settings.LAZY_QUALITY_SCORING:
+            # 그룹에 속한 이미지만 품질 평가. 결과가 도착하면 refresh_best_images()로 best_image를 다시 선정
+            quality_payloads = self.analysis_service.request_quality_scores(grouped_images)
+
         self.repository.commit()
-        
+        self.analysis_service.send_quality_scores(quality_payloads)
+
         # DB에서 id같은 정보를 다시 로드하기 위해
         for group in created_groups:
             self.repository.db.refresh(group)
 
         return created_groups
 
+    @staticmethod
+    def _select_best_image(images: List[Image]) -> Image:
+        return max(images, key=lambda img: img.score or 0)
+
+    def refresh_best_images(self, image_ids: List[int]) -> int:
+        """점수가 갱신된 이미지가 속한 그룹의 best_image를 다시 선정합니다. 변경된 그룹 수를 반환합니다."""
+        if not image_ids:
+            return 0
+
+        changed = 0
+        for group in self.repository.get_groups_containing_images(image_ids):
+            members = [member.image for member in group.images if member.image.deleted_at is None]
+            if not members:
+                continue
+            best_image = self._select_best_image(members)
+            if group.best_image_id != best_image.id:
+                group.best_image_id = best_image.id
+                changed += 1
+        self.repository.commit()
+        return changed
+
     def get_images_for_group(self, group_id: int, user_id: int) -> List[Image]:
         """특정 그룹에 속한 이미지 목록을 가져옵니다."""
         return self.repository.get_images_for_group(group_id, user_id)
@@ -0,0 +1,301 @@
+# app/storage.py
+import hashlib
+import hmac
+import logging
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StorageError(Exception):
+    """객체 저장소 작업 실패 (S3 ClientError 등을 감싸서 전달)"""
+
+
+class ObjectStorage(ABC):
+    """
+    이미지 원본을 보관하는 객체 저장소 인터페이스.
+    STORAGE_BACKEND 설정에 따라 S3Storage 또는 LocalStorage를 사용합니다.
+    """
+
+    @abstractmethod
+    def presign_put(self, key: str, expires_in: int = 3600) -> str:
+        """클라이언트가 key에 직접 업로드할 수 있는 서명된 PUT URL"""
+
+    @abstractmethod
+    def presign_get(self, key: str, expires_in: int = 3600) -> str:
+        """key를 내려받을 수 있는 서명된 GET URL"""
+
+    @abstractmethod
+    def view_url(self, key: str) -> Optional[str]:
+        """앱에 제공할 조회 URL. 설정이 없어 제공할 수 없으면 None"""
+
+    @abstractmethod
+    def worker_url(self, key: str) -> Optional[str]:
+        """AI worker가 이미지를 읽을 URL. 설정이 없어 제공할 수 없으면 None"""
+
+    @abstractmethod
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        """data를 key에 저장합니다."""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """key의 내용을 읽습니다."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """key를 삭제합니다."""
+
+    def delete_many(self, keys: Iterable[str]) -> List[str]:
+        """
+        여러 객체를 삭제합니다.
+
+        Returns:
+            List[str]: 삭제에 실패한 key 목록
+        """
+        failed = []
+        for key in keys:
+            try:
+                self.delete(key)
+            except StorageError as e:
+                logger.error(f"Error deleting {key} from storage: {e}")
+                failed.append(key)
+        return failed
+
+
+class MultipartStorage(ABC):
+    """
+    분할 업로드를 지원하는 저장소 인터페이스 (S3Storage).
+    호출자는 isinstance(storage, MultipartStorage)로 지원 여부를 확인합니다.
+    """
+
+    @abstractmethod
+    def create_multipart(self, key: str, content_type: Optional[str] = None) -> str:
+        """분할 업로드를 시작하고 upload_id를 반환합니다."""
+
+    @abstractmethod
+    def presign_part(self, key: str, upload_id: str, part_number: int, expires_in: int = 3600) -> str:
+        """part_number번째 조각을 업로드할 서명된 PUT URL"""
+
+    @abstractmethod
+    def complete_multipart(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        """업로드된 조각 [(part_number, etag), ...]을 하나의 객체로 합칩니다."""
+
+    @abstractmethod
+    def abort_multipart(self, key: str, upload_id: str) -> None:
+        """분할 업로드를 취소하고 업로드된 조각을 삭제합니다."""
+
+    @abstractmethod
+    def list_multipart(self, initiated_before: datetime) -> List[Tuple[str, str]]:
+        """initiated_before 이전에 시작해 아직 끝나지 않은 분할 업로드 [(key, upload_id), ...]"""
+
+
+class S3Storage(ObjectStorage, MultipartStorage):
+    # delete_objects 한 번에 보낼 수 있는 최대 key 수
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(self, client, bucket: str, cloudfront_domain: Optional[str] = None):
+        self.client = client
+        self.bucket = bucket
+        self.cloudfront_domain = cloudfront_domain
+
+    def _call(self, method: str, **kwargs):
+        from botocore.exceptions import ClientError
+        try:
+            return getattr(self.client, method)(Bucket=self.bucket, **kwargs)
+        except ClientError as e:
+            raise StorageError(str(e)) from e
+
+    def _presign(self, operation: str, key: str, expires_in: int, **params) -> str:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.generate_presigned_url(
+                operation,
+                Params={'Bucket': self.bucket, 'Key': key, **params},
+                ExpiresIn=expires_in
+            )
+        except ClientError as e:
+            raise StorageError(str(e)) from e
+
+    def presign_put(self, key: str, expires_in: int = 3600) -> str:
+        return self._presign('put_object', key, expires_in)
+
+    def presign_get(self, key: str, expires_in: int = 3600) -> str:
+        return self._presign('get_object', key, expires_in)
+
+    def view_url(self, key: str) -> Optional[str]:
+        if not self.cloudfront_domain:
+            return None
+        return f"https://{self.cloudfront_domain}/{key}"
+
+    def worker_url(self, key: str) -> Optional[str]:
+        return self.view_url(key)
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        extra = {'ContentType': content_type} if content_type else {}
+        self._call('put_object', Key=key, Body=data, **extra)
+
+    def get(self, key: str) -> bytes:
+        return self._call('get_object', Key=key)['Body'].read()
+
+    def delete(self, key: str) -> None:
+        self._call('delete_object', Key=key)
+
+    def delete_many(self, keys: Iterable[str]) -> List[str]:
+        keys = list(keys)
+        failed = []
+        for start in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            chunk = keys[start:start + self.DELETE_BATCH_SIZE]
+            try:
+                response = self._call('delete_objects', Delete={'Objects': [{'Key': k} for k in chunk], 'Quiet': True})
+            except StorageError as e:
+                logger.error(f"Error deleting {len(chunk)} objects from S3: {e}")
+                failed.extend(chunk)
+                continue
+            for error in response.get('Errors', []):
+                logger.error(f"Error deleting {error.get('Key')} from S3: {error.get('Message')}")
+                failed.append(error.get('Key'))
+        return failed
+
+    def create_multipart(self, key: str, content_type: Optional[str] = None) -> str:
+        extra = {'ContentType': content_type} if content_type else {}
+        return self._call('create_multipart_upload', Key=key, **extra)['UploadId']
+
+    def presign_part(self, key: str, upload_id: str, part_number: int, expires_in: int = 3600) -> str:
+        return self._presign('upload_part', key, expires_in, UploadId=upload_id, PartNumber=part_number)
+
+    def complete_multipart(self, key: str, upload_id: str, parts: List[Tuple[int, str]]) -> None:
+        self._call(
+            'complete_multipart_upload',
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': etag} for number, etag in sorted(parts)]},
+        )
+
+    def abort_multipart(self, key: str, upload_id: str) -> None:
+        self._call('abort_multipart_upload', Key=key, UploadId=upload_id)
+
+    def list_multipart(self, initiated_before: datetime) -> List[Tuple[str, str]]:
+        from botocore.exceptions import ClientError
+        uploads = []
+        try:
+            for page in self.client.get_paginator('list_multipart_uploads').paginate(Bucket=self.bucket):
+                for upload in page.get('Uploads', []):
+                    if upload['Initiated'] < initiated_before:
+                        uploads.append((upload['Key'], upload['UploadId']))
+        except ClientError as e:
+            raise StorageError(str(e)) from e
+        return uploads
+
+
+class LocalStorage(ObjectStorage):
+    """
+    로컬 디렉토리 저장소 (AWS 없이 실행하는 부하 테스트, AI worker와 같은 호스트에 배포하는 경우).
+    업로드/조회 URL은 /api/storage 라우터를 가리키며 SECRET_KEY로 만든 HMAC 서명과 만료 시각으로 검증합니다.
+    LOCAL_STORAGE_SHARED_FS이면 AI worker에는 file:// URL을 넘겨 네트워크 없이 파일을 mmap으로 읽게 합니다.
+    """
+
+    def __init__(self, root: str, base_url: str, secret_key: str, shared_fs: bool = True):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+        self.secret_key = secret_key.encode()
+        self.shared_fs = shared_fs
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise StorageError(f"Invalid key: {key}")
+        return path
+
+    def sign(self, method: str, key: str, expires: int) -> str:
+        message = f"{method}\n{key}\n{expires}".encode()
+        return hmac.new(self.secret_key, message, hashlib.sha256).hexdigest()
+
+    def verify(self, method: str, key: str, expires: int, signature: str) -> bool:
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self.sign(method, key, expires), signature)
+
+    def _signed_url(self, method: str, key: str, expires_in: int) -> str:
+        expires = int(time.time()) + expires_in
+        query = urlencode({'expires': expires, 'signature': self.sign(method, key, expires)})
+        return f"{self.base_url}/api/storage/{quote(key)}?{query}"
+
+    def presign_put(self, key: str, expires_in: int = 3600) -> str:
+        return self._signed_url('PUT', key, expires_in)
+
+    def presign_get(self, key: str, expires_in: int = 3600) -> str:
+        return self._signed_url('GET', key, expires_in)
+
+    def view_url(self, key: str) -> Optional[str]:
+        return self.presign_get(key)
+
+    def worker_url(self, key: str) -> Optional[str]:
+        if self.shared_fs:
+            return f"file://{quote(self.path(key))}"
+        return self.presign_get(key)
+
+    def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 같은 디렉토리에 쓴 뒤 교체해서 읽는 쪽이 쓰다 만 파일을 보지 않도록 함
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self.path(key), 'rb') as f:
+                return f.read()
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            raise StorageError(str(e)) from e
+
+
+def derivative_key(key: str, name: str, fmt: str) -> str:
+    """원본 key 옆에 저장하는 축소본 key (images/1/abc.jpg -> images/1/abc_grid.webp)"""
+    return f"{os.path.splitext(key)[0]}_{name}.{fmt}"
+
+
+def derivative_keys(image) -> List[str]:
+    """이미지에 저장된 축소본 key 목록"""
+    return [info['key'] for info in (image.derivatives or {}).values()]
+
+
+_storage: Optional[ObjectStorage] = None
+
+
+def get_storage() -> ObjectStorage:
+    """FastAPI Dependency to get the configured object storage."""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == 'local':
+            _storage = LocalStorage(
+                settings.LOCAL_STORAGE_DIR,
+                settings.GENERAL_SERVER_URL,
+                settings.SECRET_KEY,
+                shared_fs=settings.LOCAL_STORAGE_SHARED_FS,
+            )
+        else:
+            from app.aws import get_s3_client
+            _storage = S3Storage(get_s3_client(), settings.S3_BUCKET_NAME, settings.CLOUDFRONT_DOMAIN)
+    return _storage
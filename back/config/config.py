@@ -1,5 +1,6 @@
 # config/config.py
 import os
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -21,11 +22,60 @@ class Settings(BaseSettings):
     AWS_REGION: str = os.getenv("AWS_REGION", "ap-northeast-2")
     S3_BUCKET_NAME: str = os.getenv("S3_BUCKET_NAME", "vizota-bucket")
     CLOUDFRONT_DOMAIN: str | None = os.getenv("CLOUDFRONT_DOMAIN")
+    S3_ENDPOINT_URL: str | None = os.getenv("S3_ENDPOINT_URL")  # S3 호환 저장소 주소 (예: 로컬 MinIO http://localhost:9000)
     GENERAL_SERVER_URL: str = os.getenv("GENERAL_SERVER_URL", "http://localhost:8000")
 
+    # Object Storage Settings
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "s3")  # s3 | local (AWS 없이 실행하는 부하 테스트, 단일 호스트 배포)
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "./storage")
+    LOCAL_STORAGE_SHARED_FS: bool = os.getenv("LOCAL_STORAGE_SHARED_FS", "True").lower() == "true"  # AI worker가 같은 파일시스템을 보면 file:// URL 전달
+
+    # Image Derivative Settings (AI worker가 분석 중 만드는 갤러리용 축소본)
+    DERIVATIVE_SIZES: str = os.getenv("DERIVATIVE_SIZES", "grid:256,screen:1280,full:2560")  # name:긴 변 최대 px, 비우면 생성 안 함
+    DERIVATIVE_FORMAT: str = os.getenv("DERIVATIVE_FORMAT", "webp")  # webp | jpeg
+    DERIVATIVE_UPLOAD_EXPIRES_SECONDS: int = int(os.getenv("DERIVATIVE_UPLOAD_EXPIRES_SECONDS", "21600"))  # 큐 대기 중 만료되지 않도록 여유 있게
+
+    # Multipart Upload Settings (큰 원본 파일의 분할 업로드)
+    MULTIPART_PART_SIZE: int = int(os.getenv("MULTIPART_PART_SIZE", str(8 * 1024 * 1024)))  # 기본 조각 크기 (bytes)
+    MULTIPART_MAX_FILE_SIZE: int = int(os.getenv("MULTIPART_MAX_FILE_SIZE", str(5 * 1024 ** 3)))  # 허용 최대 파일 크기
+    MULTIPART_PRESIGN_BATCH: int = int(os.getenv("MULTIPART_PRESIGN_BATCH", "100"))  # 요청 하나에 발급하는 최대 조각 URL 수
+    MULTIPART_ABANDONED_AFTER_HOURS: int = int(os.getenv("MULTIPART_ABANDONED_AFTER_HOURS", "24"))  # 완료되지 않은 업로드 정리 기준
+
+    # Redis
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Bulk Hash Check Settings (초기 동기화용 사용자별 Bloom filter)
+    HASH_CHECK_MAX_HASHES: int = int(os.getenv("HASH_CHECK_MAX_HASHES", "20000"))  # 요청 하나에 보낼 수 있는 최대 hash 수
+    HASH_FILTER_CAPACITY: int = int(os.getenv("HASH_FILTER_CAPACITY", "100000"))  # 사용자당 최소 예상 이미지 수
+    HASH_FILTER_ERROR_RATE: float = float(os.getenv("HASH_FILTER_ERROR_RATE", "0.01"))  # 오탐률 (DB에서 확인하는 비율)
+    HASH_FILTER_TTL_SECONDS: int = int(os.getenv("HASH_FILTER_TTL_SECONDS", "86400"))  # 만료 후 조회 시 DB에서 다시 생성
+    HASH_FILTER_REBUILD_RATIO: float = float(os.getenv("HASH_FILTER_REBUILD_RATIO", "0.1"))  # capacity 대비 삭제 수가 넘으면 다시 생성
+
+    # Near-Duplicate Detection Settings
+    PHASH_MAX_DISTANCE: int = int(os.getenv("PHASH_MAX_DISTANCE", "6"))  # 근접 중복으로 볼 phash 최대 Hamming 거리 (0~7)
+
     # AI Analysis Settings
     TAG_CONFIDENCE_THRESHOLD: float = float(os.getenv("TAG_CONFIDENCE_THRESHOLD", "30.0"))  # 태그 저장 최소 신뢰도 (%)
 
+    # AI Re-analysis Backfill Settings
+    BACKFILL_STALE_AFTER_MINUTES: int = int(os.getenv("BACKFILL_STALE_AFTER_MINUTES", "30"))  # 이 시간 이상 멈춘 작업을 재전송
+    BACKFILL_BATCH_SIZE: int = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+    BACKFILL_RATE_PER_SECOND: float = float(os.getenv("BACKFILL_RATE_PER_SECOND", "5.0"))  # 초당 최대 재전송 작업 수
+    BACKFILL_MAX_ATTEMPTS: int = int(os.getenv("BACKFILL_MAX_ATTEMPTS", "5"))  # 이미지당 최대 디스패치 횟수
+
+    # Lazy Quality Scoring Settings
+    LAZY_QUALITY_SCORING: bool = os.getenv("LAZY_QUALITY_SCORING", "False").lower() == "true"  # 업로드 분석에서 품질 평가를 생략하고 유사 그룹 이미지만 평가
+    QUALITY_SCORING_BATCH_SIZE: int = int(os.getenv("QUALITY_SCORING_BATCH_SIZE", "32"))  # 품질 평가 작업 하나에 담는 이미지 수
+    QUALITY_SCORING_TIMEOUT_MINUTES: int = int(os.getenv("QUALITY_SCORING_TIMEOUT_MINUTES", "30"))  # 결과 없이 이 시간이 지나면 다시 요청
+
+    @field_validator("PHASH_MAX_DISTANCE")
+    @classmethod
+    def check_phash_max_distance(cls, value: int) -> int:
+        # images.phash_0..7 (8-bit 조각 8개) 인덱스로 누락 없이 찾을 수 있는 최대 거리는 7
+        if not 0 <= value <= 7:
+            raise ValueError(f"PHASH_MAX_DISTANCE must be between 0 and 7 (got {value})")
+        return value
+
     class Config:
         env_file = ".env"
         extra = "allow"  # Allow extra environment variables